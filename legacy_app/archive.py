@@ -0,0 +1,98 @@
+"""Moves old completed tasks out of tasks into tasks_archive.
+
+Everything that runs often (listing, picking, search, the GUI) reads only
+tasks, so its cost follows the working set rather than the years of
+finished work behind it. TaskStore.iter_tasks(), search() and reopen_task()
+reach archived tasks too when asked.
+
+The archive is a table in the same file rather than an attached database:
+a move is then one atomic transaction, and backups and sync keep working
+on a single file.
+"""
+import json
+import time
+
+import metrics
+from task_store import BATCH_PAUSE_S, DELETE_IDS, now_ms
+
+ARCHIVE_AFTER_DAYS = 30
+ARCHIVE_BATCH = 5000
+DAY_MS = 24 * 60 * 60 * 1000
+INCREMENTAL = 2
+
+# Walks tasks in id order from the last batch; tasks completed before
+# timestamps were recorded count as old.
+ARCHIVABLE = '''SELECT id FROM tasks WHERE id > ? AND completed != 0 AND IFNULL(completed_at, 0) < ?
+ORDER BY id LIMIT ?'''
+COPY_TO_ARCHIVE = '''INSERT INTO tasks_archive (id, description, completed, created_at, completed_at, priority, archived_at)
+SELECT id, description, completed, created_at, completed_at, priority, ? FROM tasks
+WHERE id IN (SELECT value FROM json_each(?))'''
+CHANGE_VERSIONS = '''SELECT changed_at, replica, task_id FROM task_changes
+WHERE task_id IN (SELECT value FROM json_each(?))'''
+# Moving is not an edit: the delete trigger gives each task a new change
+# row, which GUIs see as the task leaving the list, but its version for
+# sync stays the one it had.
+RESTORE_VERSION = 'UPDATE task_changes SET changed_at = ?, replica = ? WHERE task_id = ?'
+# FTS5 keeps a deleted row in its index until segments are merged, so
+# after a large move the live index would still be the size of the
+# history, and slower to search than before. Merging both indexes fixes
+# that and frees the pages the history used.
+OPTIMIZE_FTS = [
+    "INSERT INTO tasks_fts (tasks_fts) VALUES ('optimize')",
+    "INSERT INTO tasks_archive_fts (tasks_archive_fts) VALUES ('optimize')",
+]
+
+
+@metrics.timed('archive_completed')
+def archive_completed(store, days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH, now=None):
+    """Archive tasks completed more than days ago; return how many moved.
+
+    Each batch is its own short transaction, with a pause after it, so
+    other writers are never held up for the whole run.
+    """
+    now = now or now_ms()
+    cutoff = now - days * DAY_MS
+    after = moved = 0
+    while True:
+        with store.transaction() as conn:
+            ids = [row[0] for row in conn.execute(ARCHIVABLE, (after, cutoff, batch_size))]
+            if not ids:
+                break
+            key = json.dumps(ids)
+            versions = conn.execute(CHANGE_VERSIONS, (key,)).fetchall()
+            conn.execute(COPY_TO_ARCHIVE, (now, key))
+            conn.execute(DELETE_IDS, (key,))
+            conn.executemany(RESTORE_VERSION, versions)
+        moved += len(ids)
+        after = ids[-1]
+        if len(ids) < batch_size:
+            break
+        time.sleep(BATCH_PAUSE_S)
+    if moved:
+        for statement in OPTIMIZE_FTS:
+            with store.transaction() as conn:
+                conn.execute(statement)
+    return moved
+
+
+@metrics.timed('release_space')
+def release_space(store, full=False):
+    """Return free pages to the file system; return (pages freed, whether it ran a full VACUUM).
+
+    Databases created before incremental auto-vacuum was turned on need
+    one full VACUUM (full=True) to switch over; after that, freeing pages
+    costs only the pages freed.
+    """
+    conn = store.connection()
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != INCREMENTAL:
+        if not full:
+            return 0, False
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        before = conn.execute('PRAGMA page_count').fetchone()[0]
+        conn.execute('VACUUM')
+        return before - conn.execute('PRAGMA page_count').fetchone()[0], True
+    free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    # execute() steps the pragma once, which frees a single page;
+    # executescript() runs it to completion.
+    conn.executescript('PRAGMA incremental_vacuum')
+    return free, False
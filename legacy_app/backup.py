@@ -0,0 +1,464 @@
+"""Backups in the mobile app's JSON format (lib/services/backup_service.dart).
+
+export_backup() writes the document a task at a time straight from one
+query, and restore_backup() reads it with an incremental parser that only
+ever holds one task, so both run in flat memory however many tasks there
+are. A restore is one transaction: the tasks are validated into a staging
+table first, then applied with a few set-based statements, and any error
+rolls the whole restore back.
+
+The legacy schema has no notes or time estimates; exports write them
+empty and restores ignore them. totalTimeSpent maps to the work time
+recorded for a task. Tags, tagIds and dependencyTaskId are carried as the
+app does. The app keeps one prerequisite per task, so a task waiting for
+several also gets dependencyTaskIds listing all of them, which the app
+ignores and restore_backup() reads.
+"""
+import collections
+import json
+import re
+import sys
+from datetime import datetime
+
+import metrics
+from task_store import MAX_TAG_NAME, now_ms
+
+BACKUP_VERSION = 1
+# Timestamp bounds the mobile app accepts (2000-01-01 to 2100-01-01).
+MIN_TIMESTAMP = 946684800000
+MAX_TIMESTAMP = 4102444800000
+# Limits of the mobile app's importer; larger backups are still valid JSON
+# for us, but the app will refuse them.
+MOBILE_MAX_TASKS = 1000
+MOBILE_MAX_DESCRIPTION = 31
+
+CHUNK_SIZE = 1 << 16
+# One task is a few hundred bytes; anything this large is a broken file.
+MAX_VALUE_CHARS = 1 << 20
+STAGE_BATCH = 5000
+
+EXPORT_TAGS = 'SELECT id, name, color, created_at FROM tags ORDER BY id'
+# Live tasks, then archived ones (which keep their tags and edges).
+EXPORT_TASKS = '''SELECT t.id, t.description, t.completed, t.created_at, t.completed_at, s.work_ms,
+    (SELECT group_concat(tag_id) FROM task_tags WHERE task_id = t.id),
+    (SELECT group_concat(depends_on) FROM task_deps WHERE task_id = t.id)
+FROM tasks t LEFT JOIN stats_task s ON s.task_id = t.id
+UNION ALL
+SELECT a.id, a.description, a.completed, a.created_at, a.completed_at, s.work_ms,
+    (SELECT group_concat(tag_id) FROM task_tags WHERE task_id = a.id),
+    (SELECT group_concat(depends_on) FROM task_deps WHERE task_id = a.id)
+FROM tasks_archive a LEFT JOIN stats_task s ON s.task_id = a.id'''
+
+CREATE_STAGE = [
+    '''CREATE TEMP TABLE IF NOT EXISTS backup_tasks (
+        id INTEGER NOT NULL,
+        description TEXT NOT NULL,
+        completed INTEGER NOT NULL,
+        created_at INTEGER NOT NULL,
+        completed_at INTEGER,
+        work_ms INTEGER NOT NULL
+    )''',
+    '''CREATE TEMP TABLE IF NOT EXISTS backup_tags (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        color INTEGER NOT NULL,
+        created_at INTEGER NOT NULL
+    )''',
+    'CREATE TEMP TABLE IF NOT EXISTS backup_task_tags (task_id INTEGER NOT NULL, tag_id INTEGER NOT NULL)',
+    'CREATE TEMP TABLE IF NOT EXISTS backup_deps (task_id INTEGER NOT NULL, depends_on INTEGER NOT NULL)',
+    # Backup task id -> id of the task restored from it.
+    'CREATE TEMP TABLE IF NOT EXISTS backup_ids (old_id INTEGER PRIMARY KEY, new_id INTEGER NOT NULL)',
+]
+STAGE_TABLES = ('backup_tasks', 'backup_tags', 'backup_task_tags', 'backup_deps', 'backup_ids')
+CLEAR_STAGE = [f'DELETE FROM temp.{table}' for table in STAGE_TABLES]
+DROP_STAGE = [f'DROP TABLE IF EXISTS temp.{table}' for table in STAGE_TABLES]
+STAGE_TASK = 'INSERT INTO temp.backup_tasks VALUES (?, ?, ?, ?, ?, ?)'
+# The first tag with an id wins, as when the app inserts them.
+STAGE_TAG = 'INSERT OR IGNORE INTO temp.backup_tags VALUES (?, ?, ?, ?)'
+STAGE_TASK_TAG = 'INSERT INTO temp.backup_task_tags VALUES (?, ?)'
+STAGE_DEPENDENCY = 'INSERT INTO temp.backup_deps VALUES (?, ?)'
+# Tags and edges go first, while every task is still there, so the
+# per-task triggers find nothing left to do; emptying task_pool then turns
+# the pool triggers into no-ops for the delete. Sync uids and command keys
+# name the old tasks by id; the restored tasks reuse those ids, so they go
+# too, or a push would send a restored task as some peer's task.
+CLEAR_TASKS = ['DELETE FROM task_tags', 'DELETE FROM tags', 'DELETE FROM task_deps', 'DELETE FROM task_pool',
+               'DELETE FROM tasks', 'DELETE FROM tasks_archive', 'DELETE FROM stats_task',
+               'DELETE FROM sync_tasks', 'DELETE FROM command_keys']
+RESTORE_TAGS = '''INSERT OR IGNORE INTO tags (id, name, color, created_at)
+SELECT id, name, color, created_at FROM temp.backup_tags ORDER BY id'''
+RESTORE_IDS = 'INSERT OR IGNORE INTO temp.backup_ids SELECT id, id FROM temp.backup_tasks'
+RESTORE_TASKS = '''INSERT OR IGNORE INTO tasks (id, description, completed, created_at, completed_at)
+SELECT id, description, completed, created_at, completed_at FROM temp.backup_tasks ORDER BY id'''
+RESTORE_WORK = '''INSERT OR IGNORE INTO stats_task (task_id, work_ms)
+SELECT id, work_ms FROM temp.backup_tasks WHERE work_ms > 0'''
+# Merging skips tasks that already exist (same description and creation
+# time, as the app does) and gives the rest new ids.
+MERGE_TASKS = '''INSERT INTO tasks (description, completed, created_at, completed_at)
+SELECT b.description, b.completed, b.created_at, b.completed_at FROM temp.backup_tasks b
+WHERE NOT EXISTS (SELECT 1 FROM tasks t WHERE t.created_at = b.created_at AND t.description = b.description)
+AND NOT EXISTS (SELECT 1 FROM tasks_archive a WHERE a.created_at = b.created_at AND a.description = b.description)
+ORDER BY b.id'''
+MERGE_WORK = '''INSERT OR IGNORE INTO stats_task (task_id, work_ms)
+SELECT t.id, b.work_ms FROM temp.backup_tasks b
+JOIN tasks t ON t.created_at = b.created_at AND t.description = b.description
+WHERE t.id > ? AND b.work_ms > 0'''
+# Tags already present by name are reused rather than added.
+MERGE_TAGS = '''INSERT OR IGNORE INTO tags (name, color, created_at)
+SELECT name, color, created_at FROM temp.backup_tags ORDER BY id'''
+MERGE_IDS = '''INSERT OR IGNORE INTO temp.backup_ids
+SELECT b.id, MIN(t.id) FROM temp.backup_tasks b
+JOIN tasks t ON t.created_at = b.created_at AND t.description = b.description
+WHERE t.id > ? GROUP BY b.id'''
+# Only tasks restored by this run get tags and edges, and only to tags in
+# the backup and tasks restored with them, as in the app.
+RESTORE_TASK_TAGS = '''INSERT OR IGNORE INTO task_tags (task_id, tag_id)
+SELECT m.new_id, g.id FROM temp.backup_task_tags bt
+JOIN temp.backup_ids m ON m.old_id = bt.task_id
+JOIN temp.backup_tags b ON b.id = bt.tag_id
+JOIN tags g ON g.name = b.name'''
+RESTORED_DEPS = '''SELECT a.new_id AS task_id, b.new_id AS depends_on FROM temp.backup_deps d
+JOIN temp.backup_ids a ON a.old_id = d.task_id
+JOIN temp.backup_ids b ON b.old_id = d.depends_on'''
+RESTORE_DEPS = f'INSERT OR IGNORE INTO task_deps (task_id, depends_on) {RESTORED_DEPS}'
+# Edges that all point to earlier tasks cannot form a cycle, which settles
+# nearly every backup without loading its edges.
+FORWARD_DEP = f'SELECT 1 FROM ({RESTORED_DEPS}) WHERE depends_on >= task_id LIMIT 1'
+BACKUP_ID = 'SELECT MIN(old_id) FROM temp.backup_ids WHERE new_id = ?'
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+@metrics.timed('export_backup')
+def export_backup(store, out, now=None, err=sys.stderr):
+    """Write every task and tag to out as a backup document and return how many tasks were written."""
+    now = now or now_ms()
+    conn = store.connection()
+    # Tags and tasks are read by two statements; one read transaction
+    # keeps them a consistent snapshot.
+    snapshot = not conn.in_transaction
+    if snapshot:
+        conn.execute('BEGIN')
+    try:
+        out.write('{\n  "version": %d,\n  "exportedAt": %s,\n  "tags": ['
+                  % (BACKUP_VERSION, json.dumps(datetime.fromtimestamp(now / 1000).isoformat())))
+        tags = conn.execute(EXPORT_TAGS).fetchall()
+        out.write(','.join('\n    ' + json.dumps({
+            'id': tag_id,
+            'name': name,
+            'color': color,
+            'createdAt': created_at,
+        }, ensure_ascii=False) for tag_id, name, color, created_at in tags))
+        out.write('\n  ],\n  "tasks": [' if tags else '],\n  "tasks": [')
+        count = too_long = several = 0
+        lines = []
+        for task_id, description, completed, created_at, completed_at, work_ms, tag_ids, prerequisites in \
+                conn.execute(EXPORT_TASKS):
+            # Rows from before timestamps were recorded get the export time.
+            created_at = created_at or completed_at or now
+            prerequisites = sorted(map(int, prerequisites.split(','))) if prerequisites else []
+            task = {
+                'id': task_id,
+                'description': description,
+                'completed': bool(completed),
+                'createdAt': created_at,
+                'completedAt': completed_at,
+                'timeEstimate': None,
+                'dependencyTaskId': prerequisites[0] if prerequisites else None,
+                'totalTimeSpent': (work_ms or 0) // 1000,
+                'notes': None,
+                'tagIds': sorted(map(int, tag_ids.split(','))) if tag_ids else [],
+            }
+            if len(prerequisites) > 1:
+                task['dependencyTaskIds'] = prerequisites
+                several += 1
+            lines.append(('\n    ' if count == 0 else ',\n    ') + json.dumps(task, ensure_ascii=False))
+            count += 1
+            too_long += len(description) > MOBILE_MAX_DESCRIPTION
+            if len(lines) >= 1000:
+                out.write(''.join(lines))
+                lines = []
+        out.write(''.join(lines) + ('\n  ]\n}\n' if count else ']\n}\n'))
+        out.flush()
+    finally:
+        if snapshot:
+            conn.execute('COMMIT')
+    if count > MOBILE_MAX_TASKS or too_long:
+        print(f'Note: the mobile app only restores up to {MOBILE_MAX_TASKS} tasks of at most '
+              f'{MOBILE_MAX_DESCRIPTION} characters ({count} tasks, {too_long} longer).', file=err)
+    if several:
+        print(f'Note: the mobile app keeps one prerequisite per task; {several} tasks wait for '
+              f'more than one and the app will keep only the first.', file=err)
+    return count
+
+
+class JsonReader:
+    """Reads one JSON value at a time from a text stream, refilling a small buffer."""
+
+    decoder = json.JSONDecoder()
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.offset = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.offset += self.pos
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def error(self, message, pos=None):
+        return ValueError(f'{message} at character {self.offset + (self.pos if pos is None else pos)}')
+
+    def peek(self):
+        """Return the next non-blank character without consuming it ('' at the end)."""
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise self.error(f"expected '{char}'")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number ending right at the buffer edge may continue.
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise self.error(f'invalid JSON ({e.msg})', e.pos) from None
+            if len(self.buf) - self.pos > MAX_VALUE_CHARS:
+                raise self.error('value too large')
+            self._fill()
+
+    def items(self):
+        """Yield the elements of the array that starts here."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise self.error("expected ',' or ']'", self.pos - 1)
+
+
+def read_backup(stream):
+    """Yield (key, value) for each top-level field of a backup document.
+
+    The tasks and tags arrays are not loaded: each yields (key, []) and then
+    (key + '[]', element) per element as it is parsed.
+    """
+    reader = JsonReader(stream)
+    reader.expect('{')
+    if reader.peek() == '}':
+        reader.pos += 1
+    else:
+        while True:
+            key = reader.value()
+            if not isinstance(key, str):
+                raise reader.error('expected a field name')
+            reader.expect(':')
+            if key in ('tasks', 'tags') and reader.peek() == '[':
+                yield key, []
+                for item in reader.items():
+                    yield key + '[]', item
+            else:
+                yield key, reader.value()
+            char = reader.peek()
+            reader.pos += 1
+            if char == '}':
+                break
+            if char != ',':
+                raise reader.error("expected ',' or '}'", reader.pos - 1)
+    if reader.peek():
+        raise reader.error('unexpected data after the backup')
+
+
+def is_int(value):
+    return type(value) is int
+
+
+def timestamp_ok(value):
+    return is_int(value) and MIN_TIMESTAMP <= value <= MAX_TIMESTAMP
+
+
+def check_task(task, index):
+    """Return (id, description, completed, created_at, completed_at, work_ms), or raise ValueError.
+
+    The same checks as the mobile app, except that its size limits are not
+    enforced here.
+    """
+    if not isinstance(task, dict):
+        raise ValueError(f'Invalid task at index {index}')
+    if not is_int(task.get('id')):
+        raise ValueError(f'Task {index}: missing or invalid id')
+    description = task.get('description')
+    if not isinstance(description, str) or not description:
+        raise ValueError(f'Task {index}: missing or invalid description')
+    if not isinstance(task.get('completed'), bool):
+        raise ValueError(f'Task {index}: missing or invalid completed')
+    if not timestamp_ok(task.get('createdAt')):
+        raise ValueError(f'Task {index}: missing or invalid createdAt')
+    completed_at = task.get('completedAt')
+    if completed_at is not None and not timestamp_ok(completed_at):
+        raise ValueError(f'Task {index}: invalid completedAt')
+    for field in ('timeEstimate', 'totalTimeSpent', 'dependencyTaskId'):
+        if task.get(field) is not None and not is_int(task[field]):
+            raise ValueError(f'Task {index}: invalid {field}')
+    for field in ('tagIds', 'dependencyTaskIds'):
+        if task.get(field) is not None and not (
+                isinstance(task[field], list) and all(is_int(value) for value in task[field])):
+            raise ValueError(f'Task {index}: invalid {field}')
+    if task.get('notes') is not None and not isinstance(task['notes'], str):
+        raise ValueError(f'Task {index}: invalid notes')
+    return (task['id'], description, int(task['completed']), task['createdAt'], completed_at,
+            max(task.get('totalTimeSpent') or 0, 0) * 1000)
+
+
+def check_tag(tag, index):
+    """Return (id, name, color, created_at), or raise ValueError, as the mobile app checks tags."""
+    if not isinstance(tag, dict):
+        raise ValueError(f'Invalid tag at index {index}')
+    if not is_int(tag.get('id')):
+        raise ValueError(f'Tag {index}: missing or invalid id')
+    name = tag.get('name')
+    if not isinstance(name, str):
+        raise ValueError(f'Tag {index}: missing or invalid name')
+    if not 1 <= len(name) <= MAX_TAG_NAME:
+        raise ValueError(f'Tag {index}: name must be 1-{MAX_TAG_NAME} characters')
+    if not is_int(tag.get('color')):
+        raise ValueError(f'Tag {index}: missing or invalid color')
+    if not timestamp_ok(tag.get('createdAt')):
+        raise ValueError(f'Tag {index}: missing or invalid createdAt')
+    return tag['id'], name, tag['color'], tag['createdAt']
+
+
+def prerequisites(task):
+    """Ids a checked backup task waits for: dependencyTaskIds when present, else dependencyTaskId."""
+    if task.get('dependencyTaskIds') is not None:
+        return task['dependencyTaskIds']
+    return [] if task.get('dependencyTaskId') is None else [task['dependencyTaskId']]
+
+
+def find_cycle(edges):
+    """Return a task on a cycle of (task, prerequisite) edges, or None if there is none."""
+    waiting = collections.defaultdict(list)
+    blockers = collections.Counter()
+    for task_id, prerequisite in edges:
+        waiting[prerequisite].append(task_id)
+        blockers[task_id] += 1
+    # Peel off tasks with nothing left to wait for; what remains is on or
+    # behind a cycle.
+    ready = [task_id for task_id in waiting if not blockers[task_id]]
+    while ready:
+        for task_id in waiting.pop(ready.pop(), ()):
+            blockers[task_id] -= 1
+            if not blockers[task_id]:
+                ready.append(task_id)
+    return min((task_id for task_id, count in blockers.items() if count), default=None)
+
+
+def _flush(conn, batches):
+    for statement, rows in batches.items():
+        conn.executemany(statement, rows)
+        rows.clear()
+
+
+def _stage(conn, fields):
+    """Validate tasks and tags into the staging tables; return (version, tasks staged, tags staged)."""
+    version = None
+    seen = set()
+    staged = tags = 0
+    batches = {STAGE_TASK: [], STAGE_TAG: [], STAGE_TASK_TAG: [], STAGE_DEPENDENCY: []}
+    for key, value in fields:
+        if key == 'version':
+            if not is_int(value) or value > BACKUP_VERSION:
+                raise ValueError('Backup file is from a newer version')
+            version = value
+        elif key in ('tasks', 'tags'):
+            seen.add(key)
+        elif key == 'tasks[]':
+            row = check_task(value, staged)
+            batches[STAGE_TASK].append(row)
+            batches[STAGE_TASK_TAG].extend((row[0], tag_id) for tag_id in value.get('tagIds') or ())
+            batches[STAGE_DEPENDENCY].extend((row[0], task_id) for task_id in prerequisites(value))
+            staged += 1
+            if len(batches[STAGE_TASK]) >= STAGE_BATCH:
+                _flush(conn, batches)
+        elif key == 'tags[]':
+            batches[STAGE_TAG].append(check_tag(value, tags))
+            tags += 1
+    _flush(conn, batches)
+    if version is None or 'tasks' not in seen:
+        raise ValueError('Invalid backup file format')
+    return version, staged, tags
+
+
+def _restore_dependencies(conn):
+    """Add the staged edges between restored tasks; raise ValueError if they form a cycle."""
+    if conn.execute(FORWARD_DEP).fetchone():
+        task_id = find_cycle(conn.execute(RESTORED_DEPS))
+        if task_id is not None:
+            backup_id = conn.execute(BACKUP_ID, (task_id,)).fetchone()[0]
+            raise ValueError(f'Task {backup_id} waits for itself through its dependencies')
+    conn.execute(RESTORE_DEPS)
+
+
+@metrics.timed('restore_backup')
+def restore_backup(store, stream, replace=False):
+    """Restore a backup in one transaction and return (imported, skipped, tags added).
+
+    replace deletes every task, tag and dependency first and keeps the
+    backup's ids; otherwise tasks already present are skipped, the rest get
+    new ids, and tags are matched to existing ones by name. Restored tasks
+    get their tags and the dependencies between them.
+    """
+    conn = store.connection()
+    for statement in CREATE_STAGE:
+        conn.execute(statement)
+    try:
+        with store.transaction():
+            for statement in CLEAR_STAGE:
+                conn.execute(statement)
+            _version, staged, _tags = _stage(conn, read_backup(stream))
+            if replace:
+                for statement in CLEAR_TASKS:
+                    conn.execute(statement)
+                tags = conn.execute(RESTORE_TAGS).rowcount
+                imported = conn.execute(RESTORE_TASKS).rowcount
+                conn.execute(RESTORE_WORK)
+                conn.execute(RESTORE_IDS)
+            else:
+                last_id = conn.execute('SELECT IFNULL(MAX(id), 0) FROM tasks').fetchone()[0]
+                tags = conn.execute(MERGE_TAGS).rowcount
+                imported = conn.execute(MERGE_TASKS).rowcount
+                conn.execute(MERGE_WORK, (last_id,))
+                conn.execute(MERGE_IDS, (last_id,))
+            conn.execute(RESTORE_TASK_TAGS)
+            _restore_dependencies(conn)
+    finally:
+        for statement in DROP_STAGE:
+            conn.execute(statement)
+    return imported, staged - imported, tags
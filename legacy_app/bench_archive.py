@@ -0,0 +1,66 @@
+"""Hot-path latency before and after archiving completed history.
+
+Builds a database where most tasks were completed long ago, times the
+everyday operations, archives, and times them again. Only the working set
+should matter afterwards.
+
+Usage: python bench_archive.py [--size 1000000] [--completed 0.9] [--repeat 50]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from archive import DAY_MS, archive_completed, release_space
+from bench_utils import build_db, summarize, time_call
+from task_store import now_ms
+
+
+def measure(store, repeat):
+    """Return {operation: p50 ms} for the operations users wait on."""
+    operations = {
+        'first page (all)': lambda: list(store.iter_tasks('all', limit=100)),
+        'list incomplete': lambda: sum(1 for _ in store.iter_tasks('incomplete')),
+        'random pick': store.get_random_task,
+        'search': lambda: store.search('garden rel'),
+        'search completed': lambda: store.search('garden rel', status='completed'),
+    }
+    return {name: summarize(time_call(fn, repeat))['p50_ms'] for name, fn in operations.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=1_000_000)
+    parser.add_argument('--completed', type=float, default=0.9, help='share of tasks completed long ago')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench_archive.db')
+        store = build_db(path, args.size, completed_ratio=args.completed)
+        with store.transaction() as conn:
+            conn.execute('UPDATE tasks SET completed_at = ? WHERE completed != 0', (now_ms() - 365 * DAY_MS,))
+        before = measure(store, args.repeat)
+        size_before = os.path.getsize(path)
+
+        start = time.perf_counter()
+        moved = archive_completed(store)
+        archive_s = time.perf_counter() - start
+        start = time.perf_counter()
+        pages, _full = release_space(store, full=True)
+        vacuum_s = time.perf_counter() - start
+        after = measure(store, args.repeat)
+        archived_search = summarize(time_call(lambda: store.search('garden rel', archived=True), args.repeat))
+
+        print(f'{args.size} tasks, {moved} archived in {archive_s:.1f} s'
+              f' ({moved / archive_s:.0f} tasks/s); vacuum {vacuum_s:.1f} s,'
+              f' file {size_before / 1e6:.0f} MB -> {os.path.getsize(path) / 1e6:.0f} MB')
+        print(f'{"p50 ms":<20} {"before":>9} {"after":>9}')
+        for name in before:
+            print(f'{name:<20} {before[name]:9.3f} {after[name]:9.3f}')
+        print(f'{"search (archived)":<20} {"":>9} {archived_search["p50_ms"]:9.3f}')
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Export and restore time and peak Python memory for mobile-format backups.
+
+Peak memory should stay flat as the task count grows: neither direction
+holds more than a batch of tasks at a time. Every 10th task has a tag
+and every 4th waits for the task before it.
+
+Usage: python bench_backup.py [--sizes 10000 100000 1000000]
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+from backup import export_backup, restore_backup
+from bench_utils import build_db
+from task_store import TaskStore
+
+CHECKSUM = '''SELECT COUNT(*), SUM(id), SUM(completed), SUM(LENGTH(description)), SUM(created_at)
+FROM tasks'''
+GRAPH_CHECKSUM = '''SELECT (SELECT COUNT(*) FROM task_tags), (SELECT SUM(task_id * 31 + tag_id) FROM task_tags),
+    (SELECT COUNT(*) FROM task_deps), (SELECT SUM(task_id * 31 + depends_on) FROM task_deps),
+    (SELECT SUM(blockers) FROM tasks), (SELECT COUNT(*) FROM task_pool)'''
+TAGS = 20
+ADD_LINKS = [
+    f'''WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {TAGS})
+    INSERT INTO tags (id, name, color, created_at) SELECT i, 'tag ' || i, 4284246976, 1700000000000 FROM n''',
+    f'INSERT INTO task_tags (task_id, tag_id) SELECT id, id % {TAGS} + 1 FROM tasks WHERE id % 10 = 0',
+    '''INSERT INTO task_deps (task_id, depends_on) SELECT id, id - 1 FROM tasks
+    WHERE id % 4 = 0 AND id - 1 IN (SELECT id FROM tasks)''',
+]
+
+
+def run(fn):
+    """Return (result, seconds, peak bytes traced), timing an untraced run."""
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        fn()
+        return result, seconds, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def fresh_store(path):
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return TaskStore(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            source = build_db(os.path.join(tmp, f'source_{size}.db'), size)
+            with source.transaction() as conn:
+                for statement in ADD_LINKS:
+                    conn.execute(statement)
+            backup = os.path.join(tmp, f'backup_{size}.json')
+            now = int(time.time() * 1000)
+
+            def export():
+                with open(backup, 'w', encoding='utf-8') as out:
+                    return export_backup(source, out, now, err=io.StringIO())
+
+            def restore():
+                target = fresh_store(os.path.join(tmp, f'target_{size}.db'))
+                with open(backup, encoding='utf-8') as stream:
+                    result = restore_backup(target, stream, replace=True)
+                target.close()
+                return result
+
+            count, export_s, export_peak = run(export)
+            (imported, _skipped, _tags), restore_s, restore_peak = run(restore)
+            source.connection().execute(f'UPDATE tasks SET created_at = {now} WHERE created_at IS NULL')
+            target = TaskStore(os.path.join(tmp, f'target_{size}.db'))
+            same = all(source.connection().execute(query).fetchone() == target.connection().execute(query).fetchone()
+                       for query in (CHECKSUM, GRAPH_CHECKSUM))
+            mb = os.path.getsize(backup) / 1e6
+            print(f'{size:>9} tasks  {mb:.1f} MB backup  round trip {"ok" if same and imported == count else "MISMATCH"}')
+            print(f'    export   {export_s:6.2f} s  {count / export_s:9.0f} tasks/s  peak {export_peak / 1e6:5.2f} MB')
+            print(f'    restore  {restore_s:6.2f} s  {imported / restore_s:9.0f} tasks/s  peak {restore_peak / 1e6:5.2f} MB')
+            source.close()
+            target.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+"""Concurrency stress test: writer processes and reader threads on one tasks.db.
+
+Each writer process runs a stream of short write transactions, the way
+separate goaly.py calls and the GUI do: keyed adds, completions and
+deletes of its own tasks, and read-modify-write increments of a shared
+counter. A command that fails with DatabaseBusy is rerun, as a script
+would, up to --attempts times; that is safe because the commands are
+idempotent. Reader threads list, search and pick tasks meanwhile.
+
+--bulk N adds a process importing N tasks per transaction for the whole
+run, like `goaly.py import` (1000 by default), which holds the write lock
+far longer than any single command. It pauses BATCH_PAUSE_S between
+batches as the importer does; --no-pause shows the writers starving.
+
+Afterwards every write a writer saw succeed is checked against the
+database; anything missing or wrong is a lost update.
+
+Usage: python bench_contention.py [--writers 8] [--ops 300] [--readers 2] [--bulk N]
+           [--busy-timeout S] [--retries N] [--no-pause]
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+
+import metrics
+import task_store
+from bench_utils import build_db, percentile
+from task_store import DatabaseBusy, TaskStore
+
+
+def configure(settings):
+    """Apply the task_store settings under test in a spawned process."""
+    for name, value in settings.items():
+        setattr(task_store, name, value)
+    metrics.ENABLED = True
+
+
+def writer(path, index, ops, attempts, settings, prom_file, results):
+    configure(settings)
+    store = TaskStore(path)
+    rng = random.Random(index)
+    own = []
+    added, completed, deleted = {}, set(), set()
+    increments = gave_up = reruns = 0
+    latencies = []
+    started = time.time()
+
+    def increment():
+        with store.transaction() as conn:
+            value = conn.execute('SELECT value FROM stress_counter').fetchone()[0]
+            conn.execute('UPDATE stress_counter SET value = ?', (value + 1,))
+
+    def run(command):
+        """Run a command, rerunning it on DatabaseBusy; return (succeeded, result)."""
+        nonlocal reruns
+        for attempt in range(attempts):
+            try:
+                return True, command()
+            except DatabaseBusy:
+                reruns += attempt < attempts - 1
+        return False, None
+
+    for n in range(ops):
+        roll = rng.random()
+        start = time.perf_counter()
+        if roll < 0.4 or not own:
+            key = f'stress-{index}-{n}'
+            ok, result = run(lambda: store.add_keyed_task(key, f'stress {key}'))
+            if ok:
+                added[key] = result[0]
+                own.append(result[0])
+        elif roll < 0.65:
+            task_id = rng.choice(own)
+            ok, _ = run(lambda: store.complete_task(task_id))
+            if ok:
+                completed.add(task_id)
+        elif roll < 0.8:
+            task_id = rng.choice(own)
+            ok, _ = run(lambda: store.delete_task(task_id))
+            if ok:
+                deleted.add(task_id)
+                own.remove(task_id)
+        else:
+            ok, _ = run(increment)
+            increments += ok
+        latencies.append(time.perf_counter() - start)
+        gave_up += not ok
+    finished = time.time()
+    store.close()
+    metrics.flush(prom_file)
+    results.put({'started': started, 'finished': finished, 'added': added, 'completed': completed, 'deleted': deleted, 'increments': increments,
+                 'gave_up': gave_up, 'reruns': reruns, 'latencies': latencies})
+
+
+def bulk_importer(path, batch, settings, prom_file, stop):
+    configure(settings)
+    store = TaskStore(path)
+    n = 0
+    while not stop.is_set():
+        try:
+            store.add_tasks((f'bulk {n + i}', 0, None, None) for i in range(batch))
+            n += batch
+        except DatabaseBusy:
+            pass
+        time.sleep(task_store.BATCH_PAUSE_S)
+    store.close()
+    metrics.flush(prom_file)
+
+
+def reader(store, stop, latencies, errors):
+    rng = random.Random()
+    operations = (lambda: list(store.iter_tasks('incomplete', limit=50)),
+                  lambda: store.search('write'),
+                  store.get_random_task)
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            rng.choice(operations)()
+        except Exception:
+            errors.append(1)
+        latencies.append(time.perf_counter() - start)
+    store.close()
+
+
+def lost_updates(store, results):
+    """Return descriptions of acknowledged writes the database does not reflect."""
+    conn = store.connection()
+    lost = []
+    increments = 0
+    for result in results:
+        increments += result['increments']
+        for key, task_id in result['added'].items():
+            row = conn.execute('SELECT task_id FROM command_keys WHERE key = ?', (key,)).fetchone()
+            if row is None or row[0] != task_id:
+                lost.append(f'add {key}')
+                continue
+            task = conn.execute('SELECT completed FROM tasks WHERE id = ?', (task_id,)).fetchone()
+            if task_id in result['deleted']:
+                if task is not None:
+                    lost.append(f'delete {task_id}')
+            elif task is None:
+                lost.append(f'add {key} (task {task_id} gone)')
+            elif task_id in result['completed'] and not task[0]:
+                lost.append(f'complete {task_id}')
+    duplicates = conn.execute('''SELECT COUNT(*) FROM (SELECT description FROM tasks
+        WHERE description LIKE 'stress %' GROUP BY description HAVING COUNT(*) > 1)''').fetchone()[0]
+    lost.extend(['duplicate add'] * duplicates)
+    counter = conn.execute('SELECT value FROM stress_counter').fetchone()[0]
+    if counter != increments:
+        lost.append(f'counter {counter} != {increments} increments')
+    return lost
+
+
+def ms(samples, pct):
+    return percentile(sorted(samples), pct) * 1000 if samples else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--ops', type=int, default=300, help='write commands per writer')
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--tasks', type=int, default=10_000, help='tasks in the database at the start')
+    parser.add_argument('--bulk', type=int, default=0, metavar='N',
+                        help='also run an importer adding N tasks per transaction (default: off)')
+    parser.add_argument('--attempts', type=int, default=3, help='times a writer runs a command that stays busy')
+    parser.add_argument('--busy-timeout', type=float, default=task_store.BUSY_TIMEOUT_S, metavar='S')
+    parser.add_argument('--retries', type=int, default=task_store.WRITE_RETRIES)
+    parser.add_argument('--no-pause', action='store_true', help='no pause between bulk batches')
+    args = parser.parse_args()
+    settings = {'BUSY_TIMEOUT_S': args.busy_timeout, 'WRITE_RETRIES': args.retries}
+    if args.no_pause:
+        settings['BATCH_PAUSE_S'] = 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'stress.db')
+        prom_file = os.path.join(tmp, 'stress.prom')
+        store = build_db(path, args.tasks)
+        with store.transaction() as conn:
+            conn.execute('CREATE TABLE stress_counter (value INTEGER NOT NULL)')
+            conn.execute('INSERT INTO stress_counter VALUES (0)')
+        store.close()
+
+        context = multiprocessing.get_context('spawn')
+        results_queue = context.Queue()
+        stop = threading.Event()
+        read_latencies, read_errors = [], []
+        readers = [threading.Thread(target=reader, args=(TaskStore(path, readonly=True), stop,
+                                                          read_latencies, read_errors))
+                   for _ in range(args.readers)]
+        writers = [context.Process(target=writer, args=(path, i, args.ops, args.attempts, settings,
+                                                        prom_file, results_queue))
+                   for i in range(args.writers)]
+        bulk_stop = context.Event()
+        if args.bulk:
+            writers.append(context.Process(target=bulk_importer, args=(path, args.bulk, settings,
+                                                                        prom_file, bulk_stop)))
+        for thread in readers:
+            thread.start()
+        for process in writers:
+            process.start()
+        results = []
+        while len(results) < args.writers:
+            try:
+                results.append(results_queue.get(timeout=1))
+            except queue.Empty:
+                if any(process.exitcode for process in writers):
+                    stop.set()
+                    bulk_stop.set()
+                    raise SystemExit('a writer process failed; see its traceback above')
+        elapsed = max(r['finished'] for r in results) - min(r['started'] for r in results)
+        stop.set()
+        bulk_stop.set()
+        for process in writers:
+            process.join()
+        for thread in readers:
+            thread.join()
+
+        counters, histograms = metrics.load(metrics.state_path(prom_file))
+        busy = sum(value for (name, _), value in counters.items() if name == 'goaly_db_busy_total')
+        waits = next((h for (name, _), h in histograms.items() if name == 'goaly_db_lock_wait_seconds'), None)
+        writes = [s for result in results for s in result['latencies']]
+        lost = lost_updates(TaskStore(path), results)
+
+        print(f'{args.writers} writer processes x {args.ops} commands, {args.readers} reader threads,'
+              + (f' importer of {args.bulk}-task batches,' if args.bulk else '')
+              + f' busy timeout {args.busy_timeout:g} s, {args.retries} retries'
+              + (', no batch pause' if args.no_pause else ''))
+        print(f'  writes   {len(writes) / elapsed:8.0f} commands/s  p50 {ms(writes, 50):7.2f} ms'
+              f'  p99 {ms(writes, 99):7.2f} ms  max {max(writes) * 1000:7.1f} ms')
+        if waits:
+            print(f'  lock wait  p50 <= {metrics.format_ms(metrics.quantile(waits[0], 0.5))} ms'
+                  f'  p99 <= {metrics.format_ms(metrics.quantile(waits[0], 0.99))} ms'
+                  f'  ({busy} busy errors retried inside the store)')
+        print(f'  commands rerun by the caller {sum(r["reruns"] for r in results)},'
+              f' given up {sum(r["gave_up"] for r in results)}')
+        print(f'  reads    {len(read_latencies) / elapsed:8.0f} ops/s       p50 {ms(read_latencies, 50):7.2f} ms'
+              f'  p99 {ms(read_latencies, 99):7.2f} ms  errors {len(read_errors)}')
+        print(f'  lost updates: {len(lost)}' + (f' ({", ".join(lost[:5])})' if lost else ''))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Load-test goaly_daemon: tick latency with many concurrent sessions.
+
+Starts the daemon in-process on a temporary socket and task database,
+opens sessions through the socket protocol with short, staggered phases,
+and reports how late phase changes run relative to their deadlines.
+
+Usage: python bench_daemon.py [--sessions 10000] [--seconds 10] [--clients 8]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from bench_utils import build_db
+from goaly_daemon import SessionManager, start_server
+
+
+async def client(socket_path, requests):
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    for request in requests:
+        writer.write(json.dumps(request).encode() + b'\n')
+    await writer.drain()
+    responses = [json.loads(await reader.readline()) for _ in requests]
+    writer.close()
+    await writer.wait_closed()
+    return responses
+
+
+async def run(args, tmp):
+    store = build_db(os.path.join(tmp, 'tasks.db'), args.tasks)
+    manager = SessionManager(store.get_random_task)
+    socket_path = os.path.join(tmp, 'goaly.sock')
+    server = await start_server(manager, socket_path)
+
+    rng = random.Random(0)
+    requests = [{'cmd': 'start', 'name': f'user{n}',
+                 'work_seconds': rng.uniform(1.0, 3.0), 'break_seconds': rng.uniform(1.0, 2.0)}
+                for n in range(args.sessions)]
+    started = time.perf_counter()
+    batches = [requests[i::args.clients] for i in range(args.clients)]
+    results = await asyncio.gather(*(client(socket_path, batch) for batch in batches))
+    failed = sum(1 for batch in results for response in batch if not response.get('ok'))
+    print(f'started {args.sessions} sessions over {args.clients} connections '
+          f'in {time.perf_counter() - started:.2f}s ({failed} failed)')
+
+    manager.lateness.clear()
+    manager.transitions = 0
+    await asyncio.sleep(args.seconds)
+    summary = (await client(socket_path, [{'cmd': 'status'}]))[0]
+    late = summary['lateness_ms']
+    print(f'{summary["sessions"]} active sessions, {summary["transitions"]} phase changes in {args.seconds}s '
+          f'({summary["transitions"] / args.seconds:,.0f}/s)')
+    print(f'tick lateness: p50 {late["p50"]:.3f} ms  p99 {late["p99"]:.3f} ms  max {late["max"]:.3f} ms')
+
+    # Let the server-side handlers see EOF before the loop shuts down.
+    await asyncio.sleep(0.1)
+    server.close()
+    await server.wait_closed()
+    store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=10_000)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--tasks', type=int, default=10_000, help='tasks in the synthetic database')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(args, tmp))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Dependency graph costs: adding edges, completing tasks, picking and listing ready tasks.
+
+Tasks come in projects of --project tasks, each task waiting for a few
+earlier ones in its project, up to --edges edges. Adding an edge walks
+only what the prerequisite waits for; completing a task updates only the
+tasks waiting for it; picking and listing read the maintained ready set.
+The same questions answered from the graph each time are timed for
+comparison, and a long chain shows the cycle check's worst case.
+
+Usage: python bench_deps.py [--tasks 50000] [--edges 100000] [--project 50] [--chain 10000] [--repeat 200]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from bench_utils import build_db, summarize, time_call
+
+# Ready tasks recomputed from the graph, as without blockers.
+READY_FROM_GRAPH = '''SELECT COUNT(*) FROM tasks t WHERE t.completed = 0 AND NOT EXISTS (
+    SELECT 1 FROM task_deps d JOIN tasks p ON p.id = d.depends_on WHERE d.task_id = t.id AND p.completed = 0)'''
+RANDOM_FROM_GRAPH = '''SELECT id, description FROM tasks t WHERE t.completed = 0 AND NOT EXISTS (
+    SELECT 1 FROM task_deps d JOIN tasks p ON p.id = d.depends_on WHERE d.task_id = t.id AND p.completed = 0)
+ORDER BY RANDOM() LIMIT 1'''
+
+
+def check_ready(conn):
+    """Raise unless blockers and task_pool match the graph exactly."""
+    wrong = conn.execute('''SELECT COUNT(*) FROM tasks t WHERE blockers != (SELECT COUNT(*) FROM task_deps d
+        JOIN tasks p ON p.id = d.depends_on WHERE d.task_id = t.id AND p.completed = 0)''').fetchone()[0]
+    if wrong:
+        raise AssertionError(f'{wrong} tasks have the wrong blockers count')
+    pooled = {row[0] for row in conn.execute('SELECT task_id FROM task_pool')}
+    ready = {row[0] for row in conn.execute('SELECT id FROM tasks WHERE completed = 0 AND blockers = 0')}
+    if pooled != ready:
+        raise AssertionError(f'task_pool out of sync: {len(pooled ^ ready)} ids differ')
+
+
+def project_edges(tasks, edges, project, rng):
+    """Return up to edges distinct (task, prerequisite) pairs within projects of consecutive ids."""
+    waiting = [task_id for task_id in range(1, tasks + 1) if (task_id - 1) % project]
+    per_task = -(-edges // max(1, len(waiting)))
+    pairs = []
+    for task_id in waiting:
+        first = (task_id - 1) // project * project + 1
+        for prerequisite in rng.sample(range(first, task_id), min(per_task, task_id - first)):
+            pairs.append((task_id, prerequisite))
+    return pairs[:edges] if len(pairs) <= edges else rng.sample(pairs, edges)
+
+
+def print_row(name, stats):
+    print(f'  {name:<37} p50 {stats["p50_ms"]:8.3f} ms  p99 {stats["p99_ms"]:8.3f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=50_000)
+    parser.add_argument('--edges', type=int, default=100_000)
+    parser.add_argument('--project', type=int, default=50, help='tasks per project; edges stay inside one')
+    parser.add_argument('--chain', type=int, default=10_000, help='length of the chain for the worst-case cycle check')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = build_db(os.path.join(tmp, 'bench_deps.db'), args.tasks, completed_ratio=0)
+        conn = store.connection()
+
+        samples = []
+        start = time.perf_counter()
+        for task_id, prerequisite in project_edges(args.tasks, args.edges, args.project, rng):
+            began = time.perf_counter()
+            store.add_dependency(task_id, prerequisite)
+            samples.append(time.perf_counter() - began)
+        elapsed = time.perf_counter() - start
+        ready = conn.execute('SELECT COUNT(*) FROM task_pool').fetchone()[0]
+        print(f'{args.tasks} tasks, {len(samples)} edges added in {elapsed:.1f} s'
+              f' ({len(samples) / elapsed:.0f} edges/s), {ready} ready')
+        print_row('add edge (with cycle check)', summarize(samples))
+        check_ready(conn)
+
+        print_row('random ready task', summarize(time_call(store.get_random_task, args.repeat)))
+        print_row('random ready task from the graph', summarize(time_call(
+            lambda: conn.execute(RANDOM_FROM_GRAPH).fetchone(), max(1, args.repeat // 20))))
+        print_row('ready list, first page', summarize(time_call(
+            lambda: list(store.iter_tasks('ready', limit=100)), args.repeat)))
+        print_row('ready list, all', summarize(time_call(
+            lambda: sum(1 for _ in store.iter_tasks('ready')), max(1, args.repeat // 20))))
+        print_row('ready count from the graph', summarize(time_call(
+            lambda: conn.execute(READY_FROM_GRAPH).fetchone(), max(1, args.repeat // 20))))
+
+        # Complete (and reopen, to keep the graph) tasks that others wait for.
+        waited_on = [row[0] for row in conn.execute(
+            'SELECT depends_on FROM task_deps GROUP BY depends_on ORDER BY RANDOM() LIMIT ?', (args.repeat,))]
+        degree = conn.execute('SELECT AVG(n) FROM (SELECT COUNT(*) AS n FROM task_deps GROUP BY depends_on)').fetchone()[0]
+        completes = []
+        for task_id in waited_on:
+            began = time.perf_counter()
+            store.complete_task(task_id)
+            completes.append(time.perf_counter() - began)
+            store.reopen_task(task_id)
+        print_row(f'complete (avg {degree:.1f} dependents)', summarize(completes))
+        check_ready(conn)
+
+        # One task everything in a new project of 1000 waits for.
+        hub = store.add_task('hub')
+        with store.transaction():
+            for n in range(1000):
+                store.add_dependency(store.add_task(f'waits for hub {n}'), hub)
+        print_row('complete + reopen hub (1000 waiting)', summarize(time_call(
+            lambda: (store.complete_task(hub), store.reopen_task(hub)), 20)))
+        check_ready(conn)
+
+        # Worst case for the cycle check: closing a long chain walks all of it.
+        first = store.add_task('chain 0')
+        previous = first
+        with store.transaction():
+            for n in range(1, args.chain):
+                task_id = store.add_task(f'chain {n}')
+                store.add_dependency(task_id, previous)
+                previous = task_id
+
+        def close_chain():
+            try:
+                store.add_dependency(first, previous)
+            except ValueError:
+                return
+            raise AssertionError('cycle not detected')
+        print_row(f'rejected cycle over {args.chain} tasks', summarize(time_call(close_chain, 5)))
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Bytes per task for row tuples, Task objects, a column layout and the weighted selector.
+
+TaskTable below is only measured here, to see what a column layout would
+save if the app ever had to hold every task; nothing in the app uses it.
+
+Usage: python bench_memory.py [--sizes 10000 100000 1000000]
+"""
+import argparse
+import bisect
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from array import array
+
+from bench_utils import build_db
+from task_model import Task
+from task_selector import WeightedSelector
+
+ALL_TASKS = 'SELECT id, description, completed FROM tasks ORDER BY id'
+
+
+class TaskTable:
+    """Tasks in ascending id order, stored column by column.
+
+    ids in an array, completion as one bit, and every description packed
+    into a single UTF-8 buffer with an array of offsets. Rows must be
+    appended in id order (as the store returns them), which keeps find() a
+    binary search over the id column.
+    """
+
+    def __init__(self, rows=()):
+        self.ids = array('q')
+        self._completed = bytearray()
+        self._text = bytearray()
+        self._offsets = array('Q', [0])
+        for task_id, description, completed in rows:
+            self.append(task_id, description, completed)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def append(self, task_id, description, completed=False):
+        if self.ids and task_id <= self.ids[-1]:
+            raise ValueError(f'task {task_id} appended after task {self.ids[-1]}')
+        n = len(self.ids)
+        self.ids.append(task_id)
+        if n % 8 == 0:
+            self._completed.append(0)
+        if completed:
+            self._completed[n >> 3] |= 1 << (n & 7)
+        self._text += description.encode()
+        self._offsets.append(len(self._text))
+
+    def find(self, task_id):
+        """Index of task_id, or -1 if it is not in the table."""
+        i = bisect.bisect_left(self.ids, task_id)
+        return i if i < len(self.ids) and self.ids[i] == task_id else -1
+
+    def description(self, index):
+        return self._text[self._offsets[index]:self._offsets[index + 1]].decode()
+
+    def is_completed(self, index):
+        return bool(self._completed[index >> 3] >> (index & 7) & 1)
+
+    def set_completed(self, index, completed=True):
+        if completed:
+            self._completed[index >> 3] |= 1 << (index & 7)
+        else:
+            self._completed[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+
+    def completed_count(self):
+        return sum(bin(byte).count('1') for byte in self._completed)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.ids)
+        if not 0 <= index < len(self.ids):
+            raise IndexError('task index out of range')
+        return Task(self.ids[index], self.description(index), self.is_completed(index))
+
+    def get(self, task_id):
+        """Return the Task with this id, or None."""
+        index = self.find(task_id)
+        return self[index] if index >= 0 else None
+
+    def __iter__(self):
+        for index in range(len(self.ids)):
+            yield self[index]
+
+    def nbytes(self):
+        """Bytes held by the columns, ignoring their fixed per-object headers."""
+        return (self.ids.itemsize * len(self.ids) + len(self._completed) + len(self._text)
+                + self._offsets.itemsize * len(self._offsets))
+
+
+def allocated(build):
+    """Return (result, bytes still allocated by building it)."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        return result, tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def check_table(table, rows):
+    """Raise if the table does not give back exactly the rows it was built from."""
+    assert len(table) == len(rows)
+    assert [tuple(task) for task in table] == [(i, d, bool(c)) for i, d, c in rows]
+    assert table.completed_count() == sum(1 for row in rows if row[2])
+    rng = random.Random(0)
+    for task_id, description, completed in rng.sample(rows, min(len(rows), 1000)):
+        index = table.find(task_id)
+        assert table.get(task_id) == Task(task_id, description, completed)
+        table.set_completed(index, not completed)
+        assert table.is_completed(index) != bool(completed)
+        table.set_completed(index, completed)
+    assert table.find(rows[-1][0] + 1) == -1
+
+
+def list_selector_state(selector):
+    """The selector's per-task state as it was kept before: lists and an id -> slot dict."""
+    ids = list(selector.ids)
+    weights = list(selector.tree.weights)
+    return ids, {task_id: i for i, task_id in enumerate(ids)}, weights, [0.0] + weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            store = build_db(os.path.join(tmp, f'bench_{size}.db'), size)
+            conn = store.connection()
+            text = conn.execute('SELECT SUM(LENGTH(CAST(description AS BLOB))) FROM tasks').fetchone()[0]
+
+            rows, tuple_bytes = allocated(lambda: conn.execute(ALL_TASKS).fetchall())
+            _objects, object_bytes = allocated(lambda: [Task(*row) for row in rows])
+            del _objects
+            table, table_bytes = allocated(lambda: TaskTable(store.iter_tasks()))
+            # Timed separately: tracing slows every allocation.
+            start = time.perf_counter()
+            TaskTable(store.iter_tasks())
+            build_s = time.perf_counter() - start
+            check_table(table, rows)
+            del rows
+
+            selector = WeightedSelector(store)
+            _, array_bytes = allocated(selector.rebuild)
+            _, list_bytes = allocated(lambda: list_selector_state(selector))
+
+            print(f'{size:>9} tasks  ({text / size:.0f} bytes of text each)')
+            print(f'    row tuples  {tuple_bytes / size:6.0f} B/task')
+            print(f'    Task objects {object_bytes / size:5.0f} B/task on top of the tuples')
+            print(f'    TaskTable   {table_bytes / size:6.0f} B/task (columns {table.nbytes() / size:.0f},'
+                  f' built in {build_s:.2f} s)')
+            incomplete = len(selector.ids)
+            print(f'    selector    {array_bytes / incomplete:6.0f} B/incomplete task with arrays'
+                  f'  |  {list_bytes / incomplete:.0f} with lists and a dict')
+            store.close()
+
+
+if __name__ == '__main__':
+    main()
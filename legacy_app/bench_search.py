@@ -0,0 +1,54 @@
+"""Compare full-text search with a LIKE '%word%' scan.
+
+Usage: python bench_search.py [--sizes 10000 100000 1000000] [--repeat 50]
+"""
+import argparse
+import os
+import tempfile
+
+from bench_selection import churn
+from bench_utils import build_db, summarize, time_call
+from migrations import check_query_plans
+from task_store import HOT_QUERIES, SEARCH_LIMIT
+
+LIKE_SEARCH = 'SELECT id, description, completed FROM tasks WHERE description LIKE ? LIMIT ?'
+# A rare token, a common word, a half-typed prefix and a multi-word query.
+QUERIES = ('#4242', 'garden', 'gro', 'deploy release')
+
+
+def check_index(conn):
+    """Raise if tasks_fts no longer matches the descriptions in tasks."""
+    conn.execute("INSERT INTO tasks_fts (tasks_fts, rank) VALUES ('integrity-check', 1)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = os.path.join(tmp, f'bench_{size}.db')
+            store = build_db(path, size)
+            conn = store.connection()
+            churn(store)
+            conn.execute("UPDATE tasks SET description = 'renamed ' || description WHERE id % 1000 = 0")
+            check_index(conn)
+            for name, plan in check_query_plans(conn, HOT_QUERIES):
+                raise AssertionError(f'{name} does not use its index: {plan}')
+
+            print(f'{size:>9} tasks')
+            for text in QUERIES:
+                like = f'%{text.split()[0]}%'
+                old = summarize(time_call(
+                    lambda: conn.execute(LIKE_SEARCH, (like, SEARCH_LIMIT)).fetchall(), max(1, args.repeat // 10)))
+                new = summarize(time_call(lambda: store.search(text), args.repeat))
+                print(f'  {text!r:>18}  LIKE: p50 {old["p50_ms"]:8.3f} ms'
+                      f'  |  fts: p50 {new["p50_ms"]:7.3f} ms  p99 {new["p99_ms"]:7.3f} ms'
+                      f'  ({len(store.search(text))} rows)')
+            store.close()
+
+
+if __name__ == '__main__':
+    main()
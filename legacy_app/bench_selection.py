@@ -0,0 +1,68 @@
+"""Compare task_pool sampling with the old ORDER BY RANDOM() query.
+
+Usage: python bench_selection.py [--sizes 10000 100000 1000000] [--repeat 200]
+"""
+import argparse
+import os
+import tempfile
+
+from bench_utils import build_db, summarize, time_call
+from migrations import check_query_plans
+from task_store import HOT_QUERIES
+
+ORDER_BY_RANDOM = 'SELECT id, description FROM tasks WHERE completed = 0 ORDER BY RANDOM() LIMIT 1'
+
+
+def check_pool(conn):
+    """Raise if task_pool is not a dense mapping of exactly the ready tasks."""
+    count, top = conn.execute('SELECT COUNT(*), IFNULL(MAX(slot), 0) FROM task_pool').fetchone()
+    if count != top:
+        raise AssertionError(f'task_pool slots not dense: {count} rows, max slot {top}')
+    pooled = {row[0] for row in conn.execute('SELECT task_id FROM task_pool')}
+    ready = {row[0] for row in conn.execute('SELECT id FROM tasks WHERE completed = 0 AND blockers = 0')}
+    if pooled != ready:
+        raise AssertionError(f'task_pool out of sync: {len(pooled ^ ready)} ids differ')
+
+
+def churn(store, rounds=500):
+    """Exercise add/complete/reopen/delete so check_pool sees every trigger fire."""
+    conn = store.connection()
+    for n in range(rounds):
+        task_id = store.add_task(f'churn {n}')
+        victim = store.get_random_task()
+        if n % 3 == 0 and victim:
+            store.complete_task(victim[0])
+        elif n % 3 == 1 and victim:
+            store.delete_task(victim[0])
+        else:
+            store.complete_task(task_id)
+            conn.execute('UPDATE tasks SET completed = 0 WHERE id = ?', (task_id,))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = os.path.join(tmp, f'bench_{size}.db')
+            store = build_db(path, size)
+            conn = store.connection()
+            churn(store)
+            check_pool(conn)
+            conn.execute('ANALYZE')
+            for name, plan in check_query_plans(conn, HOT_QUERIES):
+                raise AssertionError(f'{name} does not use its index: {plan}')
+
+            old = summarize(time_call(lambda: conn.execute(ORDER_BY_RANDOM).fetchone(), args.repeat))
+            new = summarize(time_call(store.get_random_task, args.repeat))
+            print(f'{size:>9} tasks  ORDER BY RANDOM(): p50 {old["p50_ms"]:8.3f} ms  p99 {old["p99_ms"]:8.3f} ms'
+                  f'  |  task_pool: p50 {new["p50_ms"]:7.3f} ms  p99 {new["p99_ms"]:7.3f} ms'
+                  f'  ({old["p50_ms"] / new["p50_ms"]:.0f}x)')
+            store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Measure goaly.py cold-start cost per command.
+
+Runs each command repeatedly in a scratch directory, reports its median
+wall time next to a bare `python -c pass`, and uses `python -X importtime`
+to list the modules whose imports cost the most. Children always write
+bytecode and the first run is discarded, so timings reflect an install
+with compiled modules even if PYTHONDONTWRITEBYTECODE is set.
+
+Usage: python bench_startup.py [--repeat 20] [--top 8] [--tasks 1000]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_utils import build_db
+
+GOALY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'goaly.py')
+# Without cached bytecode every run would include compiling our modules.
+ENV = {name: value for name, value in os.environ.items() if name != 'PYTHONDONTWRITEBYTECODE'}
+COMMANDS = (['help'], ['list'], ['list', '--limit', '20'], ['search', 'garden'],
+            ['add', 'startup benchmark'], ['complete', '1'])
+
+
+def wall_time(argv, cwd, repeat):
+    samples = []
+    for _ in range(repeat + 1):
+        start = time.perf_counter()
+        subprocess.run(argv, cwd=cwd, env=ENV, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples[1:]) * 1000
+
+
+def import_times(argv, cwd):
+    """Return {module: (self_us, cumulative_us)} from one -X importtime run."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', *argv], cwd=cwd, env=ENV,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--top', type=int, default=8, help='slowest imports to show per command')
+    parser.add_argument('--tasks', type=int, default=1000, help='tasks in the scratch database')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build_db(os.path.join(tmp, 'tasks.db'), args.tasks).close()
+        baseline = wall_time([sys.executable, '-c', 'pass'], tmp, args.repeat)
+        interpreter = set(import_times(['-c', 'pass'], tmp))
+        print(f'{"python -c pass":<28} {baseline:7.1f} ms')
+        for command in COMMANDS:
+            total = wall_time([sys.executable, GOALY, *command], tmp, args.repeat)
+            times = import_times([GOALY, *command], tmp)
+            # Only what goaly.py itself pulls in beyond interpreter startup.
+            ours = {name: t for name, t in times.items() if name not in interpreter}
+            imported_ms = sum(self_us for self_us, _ in ours.values()) / 1000
+            print(f'{"goaly.py " + " ".join(command):<28} {total:7.1f} ms'
+                  f'  (+{total - baseline:5.1f} ms over python; imports {imported_ms:5.1f} ms'
+                  f' in {len(ours)} modules)')
+            slowest = sorted(ours.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+            print('    ' + ', '.join(f'{name} {self_us / 1000:.1f}' for name, (self_us, _) in slowest))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+"""Benchmark suite for the task store, the CLI and the Task Manager list.
+
+'run' builds synthetic databases (1k, 100k and 1M tasks by default, fixed
+seed), times each operation both as an in-process TaskStore call and
+through the real goaly.py command line, and writes p50/p99 latency and
+memory for every (size, mode, operation) to a JSON file. 'compare' reads
+two such files and exits non-zero when an operation got slower.
+
+Usage:
+  python bench_suite.py run [--sizes 1000 100000 1000000] [--out bench.json] [--data-dir DIR]
+  python bench_suite.py compare BASELINE.json CURRENT.json [--threshold 1.5]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import closing
+
+from bench_utils import build_db, summarize, time_call
+from task_store import DB_NAME, TaskStore
+
+GOALY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'goaly.py')
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+
+
+def rss_kb():
+    # ru_maxrss is kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def peak_alloc_kb(fn):
+    """Peak Python heap allocated while fn runs once, in KiB."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+
+def prepare(data_dir, size):
+    """Return the path of a pristine database with size tasks, building it once."""
+    path = os.path.join(data_dir, f'tasks_{size}.db')
+    if os.path.exists(path):
+        with closing(sqlite3.connect(path)) as conn:
+            if conn.execute('SELECT COUNT(*) FROM tasks').fetchone()[0] == size:
+                return path
+    started = time.perf_counter()
+    build_db(path, size).close()
+    print(f'  built {size} tasks in {time.perf_counter() - started:.1f}s', file=sys.stderr)
+    return path
+
+
+def working_copy(path, workdir):
+    """Copy a pristine database to workdir/tasks.db so runs never modify it."""
+    os.makedirs(workdir, exist_ok=True)
+    target = os.path.join(workdir, DB_NAME)
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(target + suffix):
+            os.remove(target + suffix)
+    shutil.copyfile(path, target)
+    return target
+
+
+def incomplete_ids(store, count, seed=0):
+    ids = [row[0] for row in store.connection().execute(
+        'SELECT task_id FROM task_pool ORDER BY slot LIMIT ?', (count * 4,))]
+    random.Random(seed).shuffle(ids)
+    return ids[:count]
+
+
+def bench_in_process(db_path, repeat):
+    store = TaskStore(db_path)
+    results = {}
+
+    def measure(name, fn, times):
+        alloc = peak_alloc_kb(fn)
+        results[name] = {**summarize(time_call(fn, times)), 'peak_alloc_kb': alloc}
+
+    measure('add_task', lambda: store.add_task('benchmark task'), repeat)
+    ids = iter(incomplete_ids(store, repeat + 1))
+    measure('complete_task', lambda: store.complete_task(next(ids)), repeat)
+    measure('get_random_task', store.get_random_task, repeat)
+    measure('list_page', lambda: list(store.iter_tasks('incomplete', limit=100)), repeat)
+    # Full listings touch every row, so fewer samples.
+    measure('list_all', lambda: sum(1 for _ in store.iter_tasks('incomplete')), max(3, repeat // 50))
+    measure('search', lambda: store.search('garden rel'), repeat)
+    # What the GUI reads after another process changed ten tasks.
+    recent = store.change_seq() - 10
+    measure('changes_since', lambda: store.changes_since(recent), repeat)
+
+    refresh = treeview_refresh(store)
+    if refresh:
+        measure('treeview_refresh', refresh, repeat)
+    store.close()
+    return results
+
+
+def treeview_refresh(store):
+    """Return a callable that refreshes a Task Manager list, or None without a display."""
+    try:
+        import tkinter as tk
+        from task_list_view import TaskListView
+        root = tk.Tk()
+    except Exception as e:
+        print(f'  skipping treeview_refresh: {e}', file=sys.stderr)
+        return None
+    root.withdraw()
+    view = TaskListView(root, store)
+
+    def refresh():
+        view.refresh()
+        root.update_idletasks()
+    return refresh
+
+
+def run_cli(workdir, args):
+    """Run goaly.py in workdir; return (seconds, peak RSS of the child in KiB)."""
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, GOALY, *args], cwd=workdir,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _pid, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - started
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise RuntimeError(f'goaly.py {" ".join(args)} exited with {proc.returncode}')
+    peak = usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+    return elapsed, peak
+
+
+def bench_cli(db_path, workdir, repeat):
+    store = TaskStore(db_path)
+    ids = iter(incomplete_ids(store, repeat + 1, seed=1))
+    store.close()
+    commands = {
+        'add_task': lambda: ['add', 'benchmark task'],
+        'complete_task': lambda: ['complete', str(next(ids))],
+        'list_page': lambda: ['list', '--limit', '100'],
+        'list_all': lambda: ['list', '--format', 'tsv'],
+        'search': lambda: ['search', 'garden', 'rel'],
+    }
+    results = {}
+    for name, make_args in commands.items():
+        times = max(3, repeat // 50) if name == 'list_all' else repeat
+        samples, peaks = [], []
+        for _ in range(times):
+            elapsed, peak = run_cli(workdir, make_args())
+            samples.append(elapsed)
+            peaks.append(peak)
+        results[name] = {**summarize(samples), 'peak_rss_kb': max(peaks)}
+    return results
+
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, cwd=os.path.dirname(GOALY)).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+    }
+
+
+def run(args):
+    owned = args.data_dir is None
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='goaly-bench-')
+    os.makedirs(data_dir, exist_ok=True)
+    report = {'meta': metadata(), 'results': []}
+    try:
+        for size in args.sizes:
+            print(f'{size} tasks', file=sys.stderr)
+            pristine = prepare(data_dir, size)
+            workdir = os.path.join(data_dir, f'work_{size}')
+            modes = [('in-process', lambda: bench_in_process(working_copy(pristine, workdir), args.repeat))]
+            if args.cli_repeat:
+                modes.append(('cli', lambda: bench_cli(working_copy(pristine, workdir), workdir, args.cli_repeat)))
+            for mode, bench in modes:
+                for op, stats in bench().items():
+                    report['results'].append({'size': size, 'mode': mode, 'op': op, **stats})
+                    print(f'  {mode:>10} {op:<17} p50 {stats["p50_ms"]:9.3f} ms  p99 {stats["p99_ms"]:9.3f} ms',
+                          file=sys.stderr)
+        report['meta']['max_rss_kb'] = rss_kb()
+    finally:
+        if owned:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Wrote {args.out}', file=sys.stderr)
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        base = {(r['size'], r['mode'], r['op']): r for r in json.load(f)['results']}
+    with open(args.current) as f:
+        current = json.load(f)['results']
+    regressions = 0
+    for r in current:
+        old = base.get((r['size'], r['mode'], r['op']))
+        if not old:
+            continue
+        ratio = r['p50_ms'] / old['p50_ms'] if old['p50_ms'] else 1.0
+        # Sub-ten-microsecond differences are timer noise, not regressions.
+        slower = ratio > args.threshold and r['p50_ms'] - old['p50_ms'] > 0.01
+        regressions += slower
+        print(f'{"SLOWER" if slower else "ok":>6}  {r["size"]:>9} {r["mode"]:>10} {r["op"]:<17}'
+              f' p50 {old["p50_ms"]:9.3f} -> {r["p50_ms"]:9.3f} ms ({ratio:.2f}x)')
+    sys.exit(1 if regressions else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_cmd = commands.add_parser('run', help='run the benchmarks and write a JSON report')
+    run_cmd.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    run_cmd.add_argument('--repeat', type=int, default=200, help='samples per in-process operation')
+    run_cmd.add_argument('--cli-repeat', type=int, default=10,
+                         help='samples per command-line operation (0 skips the CLI)')
+    run_cmd.add_argument('--out', default='bench.json')
+    run_cmd.add_argument('--data-dir', help='keep generated databases here and reuse them on later runs')
+    compare_cmd = commands.add_parser('compare', help='compare two reports')
+    compare_cmd.add_argument('baseline')
+    compare_cmd.add_argument('current')
+    compare_cmd.add_argument('--threshold', type=float, default=1.5,
+                             help='flag operations whose p50 grew by more than this factor')
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    else:
+        compare(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Cost of a sync round against database size.
+
+For each size, two replicas share a directory and are fully synced; then
+one replica makes a batch of edits and pushes, the other pulls. The delta
+round should take the same time whatever the size of the database.
+
+Usage: python bench_sync.py [--sizes 10000 100000 1000000] [--changes 100]
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import sync
+from bench_utils import build_db
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def edit(store, count, rng):
+    """Complete, rename or delete count random tasks, in one transaction."""
+    high = store.connection().execute('SELECT MAX(id) FROM tasks').fetchone()[0]
+    with store.transaction() as conn:
+        for task_id in rng.sample(range(1, high + 1), count):
+            action = rng.random()
+            if action < 0.4:
+                conn.execute('UPDATE tasks SET completed = 1 WHERE id = ?', (task_id,))
+            elif action < 0.8:
+                conn.execute("UPDATE tasks SET description = description || ' (edited)' WHERE id = ?", (task_id,))
+            else:
+                conn.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--changes', type=int, default=100)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            shared = os.path.join(tmp, f'shared_{size}')
+            first = build_db(os.path.join(tmp, f'first_{size}.db'), size)
+            second = build_db(os.path.join(tmp, f'second_{size}.db'), 0)
+            (pushed, _path), initial_push_s = timed(lambda: sync.push(first, shared))
+            (applied, _, _), initial_pull_s = timed(lambda: sync.pull(second, shared))
+            sync.push(second, shared)
+
+            edit(first, args.changes, rng)
+            (delta, _path), push_s = timed(lambda: sync.push(first, shared))
+            (applied, ignored, _), pull_s = timed(lambda: sync.pull(second, shared))
+            same = (first.connection().execute('SELECT COUNT(*), SUM(completed) FROM tasks').fetchone()
+                    == second.connection().execute('SELECT COUNT(*), SUM(completed) FROM tasks').fetchone())
+            print(f'{size:>9} tasks  initial push {pushed} in {initial_push_s:.2f} s,'
+                  f' pull in {initial_pull_s:.2f} s')
+            print(f'    {delta} changes: push {push_s * 1000:7.1f} ms  pull {pull_s * 1000:7.1f} ms'
+                  f'  ({applied} applied, {"in sync" if same else "MISMATCH"})')
+            first.close()
+            second.close()
+            shutil.rmtree(shared)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Measure timer drift over many short simulated pomodoro cycles.
+
+Runs the same schedule through TimerEngine and through the old
+sleep-per-step loop, with a callback that costs a little time on every
+step, and reports how far each one ends up behind the ideal schedule.
+Exact drift checks in simulated time live in test_timer.py.
+
+Usage: python bench_timer.py [--cycles 100] [--step-ms 5] [--callback-ms 1]
+"""
+import argparse
+import time
+
+from bench_utils import summarize
+from timer_engine import PomodoroListener, TimerEngine, run_pomodoro
+
+WORK_STEPS = 5
+BREAK_STEPS = 3
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class StepRecorder(PomodoroListener):
+    def __init__(self, callback_seconds):
+        self.callback_seconds = callback_seconds
+        self.times = []
+
+    def step(self, phase, index, count, task):
+        self.times.append(time.monotonic())
+        busy(self.callback_seconds)
+
+
+def ideal_offsets(cycles, step):
+    offsets = []
+    for cycle in range(cycles):
+        base = cycle * (WORK_STEPS + BREAK_STEPS) * step
+        offsets += [base + i * step for i in range(WORK_STEPS + BREAK_STEPS)]
+    return offsets
+
+
+def run_engine(cycles, step, callback_seconds):
+    recorder = StepRecorder(callback_seconds)
+    start = time.monotonic()
+    run_pomodoro(TimerEngine(tick_seconds=step), WORK_STEPS * step, BREAK_STEPS * step,
+                 lambda: None, recorder, step_seconds=step, cycles=cycles)
+    return start, recorder.times, time.monotonic() - start
+
+
+def run_sleep_loop(cycles, step, callback_seconds):
+    # The loop goaly.py, GoalyGUI and pomodoro.py used before TimerEngine.
+    times = []
+    start = time.monotonic()
+    for _ in range(cycles):
+        for steps in (WORK_STEPS, BREAK_STEPS):
+            for _ in range(steps):
+                times.append(time.monotonic())
+                busy(callback_seconds)
+                time.sleep(step)
+    return start, times, time.monotonic() - start
+
+
+def report(name, start, times, elapsed, expected, ideal):
+    lateness = [t - start - offset for t, offset in zip(times, ideal)]
+    stats = summarize(lateness)
+    print(f'{name:>12}: total {elapsed:7.3f}s for {expected:.3f}s scheduled '
+          f'(drift {elapsed - expected:+.3f}s)  step lateness p50 {stats["p50_ms"]:.2f} ms  '
+          f'p99 {stats["p99_ms"]:.2f} ms  final {lateness[-1] * 1000:.2f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cycles', type=int, default=100)
+    parser.add_argument('--step-ms', type=float, default=5)
+    parser.add_argument('--callback-ms', type=float, default=1)
+    args = parser.parse_args()
+    step = args.step_ms / 1000
+    callback = args.callback_ms / 1000
+    expected = args.cycles * (WORK_STEPS + BREAK_STEPS) * step
+    ideal = ideal_offsets(args.cycles, step)
+
+    report('TimerEngine', *run_engine(args.cycles, step, callback), expected, ideal)
+    report('sleep loop', *run_sleep_loop(args.cycles, step, callback), expected, ideal)
+
+
+if __name__ == '__main__':
+    main()
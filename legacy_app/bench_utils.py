@@ -0,0 +1,55 @@
+import os
+import random
+import statistics
+import time
+
+from task_store import TaskStore
+
+WORDS = ('write', 'review', 'fix', 'plan', 'refactor', 'test', 'deploy', 'read',
+         'docs', 'bug', 'feature', 'release', 'email', 'garden', 'groceries')
+
+
+def synthetic_descriptions(count, seed=0):
+    rng = random.Random(seed)
+    for n in range(count):
+        yield f'{" ".join(rng.choices(WORDS, k=4))} #{n}'
+
+
+def build_db(path, count, completed_ratio=0.5, seed=0):
+    """Create a fresh tasks.db at path holding count synthetic tasks."""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    store = TaskStore(path)
+    rng = random.Random(seed)
+    rows = ((desc, 1 if rng.random() < completed_ratio else 0)
+            for desc in synthetic_descriptions(count, seed))
+    with store.transaction() as conn:
+        conn.executemany('INSERT INTO tasks (description, completed) VALUES (?, ?)', rows)
+    return store
+
+
+def time_call(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'n': len(ordered),
+        'mean_ms': statistics.fmean(ordered) * 1000,
+        'p50_ms': percentile(ordered, 50) * 1000,
+        'p99_ms': percentile(ordered, 99) * 1000,
+    }
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
@@ -0,0 +1,112 @@
+"""Time weighted task picks against the uniform task_pool and ORDER BY RANDOM() queries.
+
+Also checks on a small database that picks follow the weights.
+
+Usage: python bench_weighted.py [--sizes 10000 100000 1000000] [--repeat 200]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+
+from bench_selection import ORDER_BY_RANDOM, churn
+from bench_utils import build_db, summarize, time_call
+from task_selector import TASK_INPUTS, FenwickTree, WeightedSelector, task_weight
+
+HOUR = 3600
+
+
+def seed_weights(store, seed=0):
+    """Give tasks a spread of priorities, ages and recent sessions."""
+    rng = random.Random(seed)
+    now_ms = int(time.time() * 1000)
+    conn = store.connection()
+    with store.transaction():
+        conn.execute('UPDATE tasks SET priority = (id % 6) - 2, created_at = ? - (id % 40) * 86400000',
+                     (now_ms,))
+        ids = [row[0] for row in conn.execute('SELECT id FROM tasks WHERE completed = 0 AND id % 50 = 0')]
+        for task_id in ids:
+            ended = now_ms - rng.randrange(48 * HOUR) * 1000
+            conn.execute('INSERT OR REPLACE INTO stats_task (task_id, work_sessions, work_ms, last_worked_at)'
+                         ' VALUES (?, 1, 1500000, ?)', (task_id, ended))
+
+
+def check_distribution(tmp, picks=100_000):
+    """Raise if observed pick frequencies stray from the weights."""
+    store = build_db(os.path.join(tmp, 'dist.db'), 200)
+    seed_weights(store)
+    selector = WeightedSelector(store, rng=random.Random(1))
+    selector.pick()
+    weights = dict(zip(selector.ids, selector.tree.weights))
+    conn = store.connection()
+    for task_id, weight in weights.items():
+        _completed, *inputs = conn.execute(TASK_INPUTS, (task_id,)).fetchone()
+        expected = task_weight(*inputs, selector._built_at)
+        if abs(weight - expected) > 1e-9 * expected:
+            raise AssertionError(f'task {task_id}: SQL weight {weight} but task_weight() gives {expected}')
+    total = sum(weights.values())
+    counts = Counter(selector.pick()[0] for _ in range(picks))
+    worst = max(abs(counts[task_id] / picks - weight / total) / (weight / total)
+                for task_id, weight in weights.items() if weight / total * picks >= 200)
+    if worst > 0.25:
+        raise AssertionError(f'pick frequencies off by up to {worst:.0%} of their expected share')
+    store.close()
+    return worst
+
+
+def check_fenwick(n=1000, seed=2):
+    """Raise if prefix sums and find() disagree with a plain list after random edits."""
+    rng = random.Random(seed)
+    weights = [rng.random() for _ in range(n)]
+    tree = FenwickTree(weights[:n // 2])
+    for w in weights[n // 2:]:
+        tree.append(w)
+    for _ in range(n):
+        i = rng.randrange(n)
+        weights[i] = rng.random() if rng.random() < 0.8 else 0.0
+        tree.set(i, weights[i])
+    for count in range(0, n + 1, 37):
+        assert abs(tree.prefix(count) - sum(weights[:count])) < 1e-6
+    running = 0.0
+    for i, w in enumerate(weights):
+        if w > 0:
+            assert tree.find(running + w / 2) == i
+        running += w
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    check_fenwick()
+    with tempfile.TemporaryDirectory() as tmp:
+        worst = check_distribution(tmp)
+        print(f'distribution ok (worst task {worst:.1%} from its expected share)')
+        for size in args.sizes:
+            store = build_db(os.path.join(tmp, f'bench_{size}.db'), size)
+            churn(store)
+            seed_weights(store)
+            conn = store.connection()
+            selector = WeightedSelector(store)
+            selector.rebuild()
+            ids = selector.ids
+
+            order_by = summarize(time_call(lambda: conn.execute(ORDER_BY_RANDOM).fetchone(),
+                                           max(3, args.repeat // 20)))
+            pool = summarize(time_call(store.get_random_task, args.repeat))
+            pick = summarize(time_call(selector.pick, args.repeat))
+            update = summarize(time_call(lambda: selector.refresh_task(random.choice(ids)), args.repeat))
+            print(f'{size:>9} tasks  rebuild {selector.last_build_ms:8.1f} ms ({len(ids)} incomplete)')
+            print(f'    ORDER BY RANDOM(): p50 {order_by["p50_ms"]:8.3f} ms'
+                  f'  |  task_pool: p50 {pool["p50_ms"]:6.3f} ms'
+                  f'  |  weighted pick: p50 {pick["p50_ms"]:6.3f} ms  p99 {pick["p99_ms"]:6.3f} ms'
+                  f'  |  weight update: p50 {update["p50_ms"]:6.3f} ms')
+            store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import time
+
+# How often the GUI looks for writes from other processes.
+POLL_INTERVAL_MS = 1000
+# Beyond this many changed tasks at once (a bulk import, say), listeners
+# are told to reload instead of being fed every row.
+MAX_CHANGES = 1000
+
+
+class ChangeWatcher:
+    """Tells the GUI about tasks changed by other connections.
+
+    check() runs every interval_ms on the Tk thread. While nothing has been
+    committed elsewhere it costs one PRAGMA data_version. Otherwise it reads
+    the task_changes rows after the last sequence number it saw, so its
+    cost follows the number of changed tasks, not the size of the table.
+    Each listener gets a list of (id, description, completed) rows, with
+    description None for a deleted task, or None when more than
+    max_changes tasks changed and it should reload instead.
+    """
+
+    def __init__(self, root, store, interval_ms=POLL_INTERVAL_MS, max_changes=MAX_CHANGES):
+        self.root = root
+        self.store = store
+        self.interval_ms = interval_ms
+        self.max_changes = max_changes
+        self.listeners = []
+        self.last_check_ms = 0.0
+        self._version = store.data_version()
+        self._seq = store.change_seq()
+        self._after_id = root.after(interval_ms, self._poll)
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def check(self):
+        """Report changes made since the last check; returns how many tasks changed."""
+        start = time.perf_counter()
+        version = self.store.data_version()
+        if version == self._version:
+            self.last_check_ms = (time.perf_counter() - start) * 1000
+            return 0
+        self._version = version
+        rows = self.store.changes_since(self._seq, self.max_changes + 1)
+        if not rows:
+            self.last_check_ms = (time.perf_counter() - start) * 1000
+            return 0
+        if len(rows) > self.max_changes:
+            # Too many to apply one by one; skip to the newest change.
+            self._seq = self.store.change_seq()
+            changes = None
+        else:
+            self._seq = rows[-1][0]
+            changes = [(task_id, description, completed) for _seq, task_id, description, completed in rows]
+        self.last_check_ms = (time.perf_counter() - start) * 1000
+        for listener in list(self.listeners):
+            listener(changes)
+        return len(rows)
+
+    def _poll(self):
+        self.check()
+        self._after_id = self.root.after(self.interval_ms, self._poll)
+
+    def close(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
@@ -0,0 +1,48 @@
+import threading
+import time
+
+
+class MonotonicClock:
+    """Real time from time.monotonic()."""
+
+    def now(self):
+        return time.monotonic()
+
+    def wait(self, cond, timeout):
+        # The caller holds cond; a notify (stop, pause) ends the wait early.
+        cond.wait(timeout)
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class VirtualClock:
+    """Clock that only moves when told to.
+
+    wait() and sleep() fast-forward straight to the end of the requested
+    time and return at once, so timers driven by this clock run as fast as
+    their callbacks allow. advance() moves time forward explicitly.
+    """
+
+    def __init__(self, start=0.0):
+        self._now = start
+        self._lock = threading.Lock()
+
+    def now(self):
+        return self._now
+
+    def advance(self, seconds):
+        with self._lock:
+            self._now += max(0.0, seconds)
+
+    def wait(self, cond, timeout):
+        if timeout is None:
+            cond.wait()
+        else:
+            self.advance(timeout)
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+
+REAL_CLOCK = MonotonicClock()
@@ -0,0 +1,35 @@
+"""Console output for the 'goaly.py start' pomodoro timer."""
+from emoji_config import *
+from timer_engine import BREAK, WORK, PomodoroListener
+
+class ConsoleListener(PomodoroListener):
+    def __init__(self, work_minutes, break_minutes):
+        self.work_minutes = work_minutes
+        self.break_minutes = break_minutes
+    
+    def task_selected(self, task):
+        if task:
+            task_id, task_desc = task
+            print(f"{EMOJI_GOAL} Current task: [{task_id}] {task_desc}")
+        else:
+            print(f"{EMOJI_GOAL} No tasks available - time to add some!")
+    
+    def phase_started(self, phase, seconds, task):
+        if phase == WORK:
+            print(f"\n{EMOJI_TIMER} Work session ({self.work_minutes} minutes)")
+        else:
+            print(f"\n{EMOJI_BREAK} Break session ({self.break_minutes} minutes)")
+    
+    def step(self, phase, index, count, task):
+        if phase == BREAK:
+            print(f"Play! ({index + 1}/{count})")
+        elif task:
+            print(f"Work on: {task[1]} ({index + 1}/{count})")
+        else:
+            print(f"Work! ({index + 1}/{count})")
+    
+    def phase_finished(self, phase, task):
+        if phase == WORK:
+            print(f"\n{EMOJI_SUCCESS} Work session complete!")
+        else:
+            print(f"\n{EMOJI_CELEBRATE} Break complete! Ready for next round?\n")
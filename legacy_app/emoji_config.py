@@ -8,4 +8,5 @@ EMOJI_BREAK = "☕"         # Break session
 EMOJI_CELEBRATE = "🎉"    # Celebration
 EMOJI_STOP = "🛑"        # Stop timer
 EMOJI_TASKS = "📝"        # Task manager
-EMOJI_DELETE = "🗑️"      # Delete task 
\ No newline at end of file
+EMOJI_DELETE = "🗑️"      # Delete task 
+EMOJI_ERROR = "⚠️"       # Failed write
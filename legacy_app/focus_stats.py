@@ -0,0 +1,89 @@
+"""Session recording and the focus report behind 'goaly.py stats'."""
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+from emoji_config import EMOJI_GOAL, EMOJI_TIMER
+from timer_engine import PomodoroListener
+
+
+class SessionRecorder(PomodoroListener):
+    """Writes each work and break session to the sessions table.
+
+    Sessions cut short by Stop are kept too, marked unfinished, with the
+    unpaused time they actually ran. wall_time supplies the start timestamp
+    (seconds since the epoch); simulations pass one tied to their clock.
+    """
+
+    def __init__(self, store, wall_time=time.time):
+        self.store = store
+        self.wall_time = wall_time
+        self._started_at = None
+        self._seconds = 0
+
+    def phase_started(self, phase, seconds, task):
+        self._started_at = int(self.wall_time() * 1000)
+        self._seconds = seconds
+
+    def phase_finished(self, phase, task):
+        # The engine schedules against deadlines, so a finished phase ran
+        # for exactly its scheduled length of unpaused time.
+        self._record(phase, task, self._seconds, True)
+
+    def phase_stopped(self, phase, elapsed, task):
+        self._record(phase, task, elapsed, False)
+
+    def _record(self, phase, task, seconds, finished):
+        task_id = task[0] if task else None
+        self.store.record_session(task_id, phase, self._started_at, round(seconds * 1000), finished)
+
+
+def format_duration(ms):
+    minutes = round(ms / 60000)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}h {minutes:02d}m' if hours else f'{minutes}m'
+
+
+def describe(row):
+    work_sessions, work_ms, break_sessions, break_ms = row
+    return (f'{work_sessions} work sessions, {format_duration(work_ms)} focus; '
+            f'{break_sessions} breaks, {format_duration(break_ms)}')
+
+
+def print_stats(store, days=7, task_id=None, today=None):
+    try:
+        _print_stats(store, days, task_id, today)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader (e.g. `| head`) went away; stop quietly.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+
+def _print_stats(store, days, task_id, today):
+    if task_id is not None:
+        row = store.task_stats(task_id)
+        if not row:
+            print(f'No sessions recorded for task {task_id}.')
+            return
+        tid, desc, sessions, work_ms, _last = row
+        print(f'{EMOJI_GOAL} [{tid}] {desc or "(deleted task)"}: '
+              f'{format_duration(work_ms)} focus over {sessions} work sessions')
+        return
+
+    today = today or date.today()
+    since = today - timedelta(days=days - 1)
+    stats = store.focus_stats(today.isoformat(), today.strftime('%G-W%V'), since.isoformat())
+    print(f'\n{EMOJI_TIMER} Focus stats')
+    for label, row in ((f'Today ({today.isoformat()}):', stats['day']),
+                       (f'This week ({today.strftime("%G-W%V")}):', stats['week']),
+                       ('All time:', stats['total'])):
+        print(f'  {label:<22} {describe(row)}')
+    if stats['days']:
+        print(f'\nLast {days} days:')
+        for day, work_sessions, work_ms, _breaks, _break_ms in stats['days']:
+            print(f'  {day}  {format_duration(work_ms):>8}  ({work_sessions} sessions)')
+    if stats['top_tasks']:
+        print('\nTop tasks by focus time:')
+        for tid, desc, sessions, work_ms, _last in stats['top_tasks']:
+            print(f'  [{tid}] {desc or "(deleted task)"}: {format_duration(work_ms)} over {sessions} sessions')
@@ -1,102 +1,368 @@
-import sqlite3
+# Startup cost is most of a CLI call, so this module imports only sys at
+# load time: each command imports what it needs, and read-only commands
+# open the database read-only (see task_store.TaskStore).
 import sys
-import time
-import threading
-import signal
-from emoji_config import *
 
 DB_NAME = 'tasks.db'
 WORK_MINUTES = 25
 BREAK_MINUTES = 5
 
+def get_store(db_name=DB_NAME, readonly=False):
+    import task_store
+    return task_store.get_store(db_name, readonly)
+
 def init_db():
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS tasks (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        description TEXT NOT NULL,
-        completed INTEGER NOT NULL DEFAULT 0
-    )''')
-    conn.commit()
-    conn.close()
-
-def add_task(description):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('INSERT INTO tasks (description) VALUES (?)', (description,))
-    conn.commit()
-    conn.close()
+    return get_store(DB_NAME)
+
+def add_task(description, key=None):
+    store = get_store(DB_NAME)
+    if key is None:
+        store.add_task(description)
+    elif not store.add_keyed_task(key, description)[1]:
+        print(f'Task with key {key} was already added.')
+        return
     print(f'Task added: {description}')
 
-def list_tasks():
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('SELECT id, description, completed FROM tasks WHERE completed = 0')
-    tasks = c.fetchall()
-    conn.close()
+def list_tasks(args=()):
+    from listing import parse_list_args, print_tasks
+
+    opts = parse_list_args('goaly.py list', args, default_status='ready')
+    rows = get_store(DB_NAME, readonly=True).iter_tasks(opts.status, opts.after, opts.limit,
+                                                           archived=opts.archived, tag=opts.tag)
+    kind = ('' if opts.status == 'all' else f'{opts.status} ') + ('' if opts.tag is None else f'"{opts.tag}" ')
+    count = print_tasks(rows, opts.format, opts.status, header=f"\n{(kind or 'all ').capitalize()}tasks:")
     
-    if not tasks:
-        print("No incomplete tasks found.")
-        return
+    if not count and opts.format == 'table':
+        print(f"No {kind}tasks found.")
+
+def search_tasks(args):
+    import argparse
+    from listing import FORMATS, STATUSES, print_tasks
+    from task_store import SEARCH_LIMIT
     
-    print("\nIncomplete tasks:")
-    for tid, desc, comp in tasks:
-        print(f'[{tid}] {desc}')
+    parser = argparse.ArgumentParser(prog='goaly.py search',
+                                     description='Find tasks by words in their description, best matches first.')
+    parser.add_argument('words', nargs='+', help='words to look for; each one matches as a prefix')
+    parser.add_argument('--status', choices=STATUSES, default='all', help='which tasks to search (default: all)')
+    parser.add_argument('--limit', type=int, default=SEARCH_LIMIT, metavar='N',
+                        help=f'show at most N tasks (default: {SEARCH_LIMIT})')
+    parser.add_argument('--format', choices=FORMATS, default='table', help='output format (default: table)')
+    parser.add_argument('--archived', action='store_true', help='search archived tasks too')
+    opts = parser.parse_args(args)
+    text = ' '.join(opts.words)
+    rows = get_store(DB_NAME, readonly=True).search(text, opts.status, max(0, opts.limit), opts.archived)
+    count = print_tasks(rows, opts.format, opts.status, header=f'\nTasks matching "{text}":')
+    
+    if not count and opts.format == 'table':
+        print(f'No tasks match "{text}".')
 
 def complete_task(task_id):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('UPDATE tasks SET completed = 1 WHERE id = ?', (task_id,))
-    if c.rowcount > 0:
-        conn.commit()
+    if get_store(DB_NAME).complete_task(task_id) > 0:
         print(f'Task {task_id} marked as completed.')
     else:
         print(f'Task {task_id} not found.')
-    conn.close()
+
+def reopen_task(task_id):
+    if get_store(DB_NAME).reopen_task(task_id) > 0:
+        print(f'Task {task_id} reopened.')
+    else:
+        print(f'Task {task_id} not found or not completed.')
+
+def parse_selection(prog, verb, args):
+    """Return (ranges, match) from ids and ranges such as '3 7 10-200', or --match TEXT."""
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog=prog, description=f'{verb} tasks in one transaction.')
+    parser.add_argument('ids', nargs='*', metavar='ID', help='task ids or inclusive id ranges such as 10-200')
+    parser.add_argument('--match', metavar='TEXT', help='every task whose description matches TEXT, as in search')
+    opts = parser.parse_args(args)
+    if bool(opts.ids) == bool(opts.match):
+        parser.error('give task ids or --match, but not both')
+    ranges = []
+    for token in opts.ids:
+        first, dash, last = token.partition('-')
+        try:
+            first = int(first)
+            last = int(last) if dash else first
+        except ValueError:
+            parser.error(f'invalid task id or range: {token}')
+        if first > last:
+            parser.error(f'range runs backwards: {token}')
+        ranges.append((first, last))
+    return ranges, opts.match
+
+def plural(count, word):
+    return f"{count} {word}{'' if count == 1 else 's'}"
+
+def complete_tasks(args):
+    if len(args) == 1 and args[0].isdigit():
+        complete_task(args[0])
+        return
+    ranges, match = parse_selection('goaly.py complete', 'Mark completed', args)
+    store = get_store(DB_NAME)
+    count = store.complete_matching(match) if match else store.complete_tasks(ranges)
+    print(f'{plural(count, "task")} marked as completed.')
+
+def delete_task(task_id):
+    if get_store(DB_NAME).delete_task(task_id) > 0:
+        print(f'Task {task_id} deleted.')
+    else:
+        print(f'Task {task_id} not found.')
+
+def delete_tasks(args):
+    if len(args) == 1 and args[0].isdigit():
+        delete_task(args[0])
+        return
+    ranges, match = parse_selection('goaly.py delete', 'Delete', args)
+    store = get_store(DB_NAME)
+    count = store.delete_matching(match) if match else store.delete_tasks(ranges)
+    print(f'{plural(count, "task")} deleted.')
 
 def get_random_task():
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('SELECT id, description FROM tasks WHERE completed = 0 ORDER BY RANDOM() LIMIT 1')
-    task = c.fetchone()
-    conn.close()
-    return task
-
-def start_timer():
+    return get_store(DB_NAME).get_random_task()
+
+def set_priority(args):
+    import argparse
+    from task_selector import MAX_PRIORITY, MIN_PRIORITY
+    
+    parser = argparse.ArgumentParser(prog='goaly.py priority',
+                                     description='Set how often start --weighted picks a task.')
+    parser.add_argument('task_id', type=int, metavar='TASK_ID')
+    parser.add_argument('level', type=int, metavar='LEVEL',
+                        help=f'{MIN_PRIORITY} to {MAX_PRIORITY}; 0 is normal, each step up doubles the chance')
+    opts = parser.parse_args(args)
+    level = min(max(opts.level, MIN_PRIORITY), MAX_PRIORITY)
+    if get_store(DB_NAME).set_priority(opts.task_id, level) > 0:
+        print(f'Task {opts.task_id} priority set to {level}.')
+    else:
+        print(f'Task {opts.task_id} not found.')
+
+def import_tasks(args):
+    import argparse
+    from importer import DEFAULT_BATCH_SIZE, FORMATS, import_file
+
+    parser = argparse.ArgumentParser(prog='goaly.py import',
+                                     description='Bulk import tasks from a file or stdin.')
+    parser.add_argument('file', nargs='?', default='-', help="input file, or '-' for stdin (default)")
+    parser.add_argument('--format', choices=FORMATS, help='input format (default: from file extension, text for stdin)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='tasks per transaction')
+    parser.add_argument('--source', help='resume key (defaults to the file path; required to resume stdin)')
+    parser.add_argument('--restart', action='store_true', help='ignore saved progress and import from the start')
+    opts = parser.parse_args(args)
+    if opts.batch_size < 1:
+        parser.error('--batch-size must be at least 1')
+    try:
+        import_file(get_store(DB_NAME), opts.file, opts.format, opts.source, opts.batch_size, opts.restart)
+    except (OSError, ValueError) as e:
+        print(f'\nImport stopped: {e}')
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print('\nImport interrupted. Run the same command again to resume.')
+        sys.exit(130)
+
+def export_backup(args):
+    import argparse
+    from backup import export_backup
+
+    parser = argparse.ArgumentParser(prog='goaly.py export',
+                                     description='Write all tasks as a backup in the mobile app format.')
+    parser.add_argument('file', nargs='?', default='-', help="output file, or '-' for stdout (default)")
+    opts = parser.parse_args(args)
+    store = get_store(DB_NAME, readonly=True)
+    try:
+        if opts.file == '-':
+            export_backup(store, sys.stdout)
+            sys.stdout.flush()
+            return
+        with open(opts.file, 'w', encoding='utf-8') as out:
+            count = export_backup(store, out)
+    except BrokenPipeError:
+        # The reader (e.g. `| head`) went away; stop quietly.
+        import os
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return
+    except OSError as e:
+        print(f'Export failed: {e}')
+        sys.exit(1)
+    print(f'Exported {plural(count, "task")} to {opts.file}.')
+
+def restore_backup(args):
+    import argparse
+    from backup import restore_backup
+
+    parser = argparse.ArgumentParser(prog='goaly.py import-backup',
+                                     description='Restore tasks from a backup in the mobile app format.')
+    parser.add_argument('file', help="backup file, or '-' for stdin")
+    parser.add_argument('--replace', action='store_true',
+                        help='delete all tasks, tags and dependencies first and keep the backup ids (default: merge)')
+    opts = parser.parse_args(args)
+    store = get_store(DB_NAME)
+    try:
+        if opts.file == '-':
+            imported, skipped, tags = restore_backup(store, sys.stdin, opts.replace)
+        else:
+            with open(opts.file, encoding='utf-8') as stream:
+                imported, skipped, tags = restore_backup(store, stream, opts.replace)
+    except (OSError, ValueError) as e:
+        print(f'Restore failed, nothing was changed: {e}')
+        sys.exit(1)
+    print(f'Restored {plural(imported, "task")}, skipped {skipped} already present.')
+    if tags:
+        print(f'Added {plural(tags, "tag")}.')
+
+def sync_tasks(args):
+    import argparse
+    import sync
+
+    parser = argparse.ArgumentParser(prog='goaly.py sync',
+                                     description='Exchange task changes with other replicas through a shared directory.')
+    parser.add_argument('action', choices=('push', 'pull'), help='push local changes, or pull everyone else\'s')
+    parser.add_argument('directory', help='sync directory shared by the replicas')
+    opts = parser.parse_args(args)
+    store = get_store(DB_NAME)
+    try:
+        if opts.action == 'push':
+            count, path = sync.push(store, opts.directory)
+            print(f'Pushed {plural(count, "change")}' + (f' to {path}.' if path else '.'))
+        else:
+            applied, ignored, files = sync.pull(store, opts.directory)
+            print(f'Pulled {plural(applied, "change")} from {plural(files, "file")}'
+                  f' ({ignored} older than local edits ignored).')
+    except (OSError, ValueError) as e:
+        print(f'Sync failed: {e}')
+        sys.exit(1)
+
+def tag_tasks(args):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='goaly.py tag', description='Add, remove or show task tags.',
+                                     usage='%(prog)s add|remove ID NAME... | list [ID] | delete NAME...')
+    parser.add_argument('action', choices=('add', 'remove', 'list', 'delete'))
+    parser.add_argument('args', nargs='*', metavar='ID | NAME')
+    opts = parser.parse_args(args)
+    names = opts.args
+    task_id = None
+    if opts.action != 'delete' and names:
+        if not names[0].isdigit():
+            parser.error(f'not a task id: {names[0]}')
+        task_id, names = int(names[0]), names[1:]
+    store = get_store(DB_NAME, readonly=opts.action == 'list')
+    if opts.action == 'list':
+        if task_id is None:
+            for name, _color, count in store.all_tags():
+                print(f'{name} ({plural(count, "task")})')
+        else:
+            print(f"Task {task_id}: {', '.join(store.task_tags(task_id)) or 'no tags'}")
+        return
+    if not names or (opts.action != 'delete' and task_id is None):
+        parser.error(f'{opts.action} needs ' + ('tag names' if opts.action == 'delete' else 'a task id and tag names'))
+    for name in names:
+        if opts.action == 'delete':
+            print(f'Tag {name} deleted.' if store.delete_tag(name) else f'No tag {name}.')
+        elif opts.action == 'remove':
+            print(f'Task {task_id} untagged {name}.' if store.untag_task(task_id, name)
+                  else f'Task {task_id} has no tag {name}.')
+        else:
+            try:
+                store.tag_task(task_id, name)
+            except ValueError as e:
+                print(f'Cannot tag task {task_id}: {e}.')
+                sys.exit(1)
+            print(f'Task {task_id} tagged {name.strip()}.')
+
+def dependency_tasks(args):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='goaly.py dep',
+                                     description='Make tasks wait for others; a waiting task is not picked or listed as ready.')
+    parser.add_argument('action', choices=('add', 'remove', 'show'))
+    parser.add_argument('task', type=int, metavar='ID')
+    parser.add_argument('prerequisites', nargs='*', type=int, metavar='PREREQ_ID',
+                        help='tasks that must be completed first')
+    opts = parser.parse_args(args)
+    store = get_store(DB_NAME, readonly=opts.action == 'show')
+    if opts.action == 'show':
+        prerequisites, dependents = store.dependencies(opts.task)
+        blockers = store.blockers(opts.task)
+        print(f'Task {opts.task}: ' + ('not in the task list' if blockers is None
+                                       else 'ready' if not blockers else f'waiting for {plural(blockers, "task")}'))
+        for title, rows in (('Waits for', prerequisites), ('Blocks', dependents)):
+            if rows:
+                print(f'{title}:')
+                for tid, desc, comp in rows:
+                    print(f'  [{"✓" if comp else " "}] {tid}: {desc}')
+        return
+    if not opts.prerequisites:
+        parser.error(f'{opts.action} needs at least one prerequisite id')
+    for prerequisite in opts.prerequisites:
+        if opts.action == 'remove':
+            print(f'Task {opts.task} no longer waits for task {prerequisite}.'
+                  if store.remove_dependency(opts.task, prerequisite)
+                  else f'Task {opts.task} did not wait for task {prerequisite}.')
+            continue
+        try:
+            store.add_dependency(opts.task, prerequisite)
+        except ValueError as e:
+            print(f'Cannot add dependency: {e}.')
+            sys.exit(1)
+        print(f'Task {opts.task} now waits for task {prerequisite}.')
+
+def archive_tasks(args):
+    import argparse
+    from archive import ARCHIVE_AFTER_DAYS, archive_completed, release_space
+
+    parser = argparse.ArgumentParser(prog='goaly.py archive',
+                                     description='Move old completed tasks out of the working set.')
+    parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS,
+                        help=f'archive tasks completed more than this many days ago (default: {ARCHIVE_AFTER_DAYS})')
+    parser.add_argument('--vacuum', action='store_true',
+                        help='run the one full VACUUM older databases need before space can be released')
+    opts = parser.parse_args(args)
+    store = get_store(DB_NAME)
+    moved = archive_completed(store, max(0, opts.days))
+    pages, full = release_space(store, opts.vacuum)
+    print(f'Archived {plural(moved, "task")}; released {plural(pages, "page")}'
+          + (' (database converted to incremental vacuum).' if full else '.'))
+
+def start_timer(args=()):
+    weighted = '--weighted' in args
     print("\n=== Goaly Pomodoro Timer ===")
     print("Press Ctrl+C to stop the timer\n")
     
+    import signal
+    from console_timer import ConsoleListener
+    from emoji_config import EMOJI_STOP
+    from focus_stats import SessionRecorder
+    from timer_engine import MultiListener, TimerEngine, run_pomodoro
+    
+    engine = TimerEngine()
+    store = get_store(DB_NAME)
+    listeners = [ConsoleListener(WORK_MINUTES, BREAK_MINUTES), SessionRecorder(store)]
+    pick_task = get_random_task
+    if weighted:
+        from task_selector import WeightedSelector
+        # After SessionRecorder, so the selector sees the session just recorded.
+        selector = WeightedSelector(store)
+        listeners.append(selector)
+        pick_task = selector.pick
+    listener = MultiListener(*listeners)
+    # Ctrl+C stops the engine so the interrupted session is still recorded.
+    previous = signal.signal(signal.SIGINT, lambda signum, frame: engine.stop())
     try:
-        while True:
-            # Get a random incomplete task
-            task = get_random_task()
-            if task:
-                task_id, task_desc = task
-                print(f"{EMOJI_GOAL} Current task: [{task_id}] {task_desc}")
-            else:
-                print(f"{EMOJI_GOAL} No tasks available - time to add some!")
-            
-            # Work session
-            print(f"\n{EMOJI_TIMER} Work session ({WORK_MINUTES} minutes)")
-            for minute in range(WORK_MINUTES):
-                if task:
-                    print(f"Work on: {task_desc} ({minute + 1}/{WORK_MINUTES})")
-                else:
-                    print(f"Work! ({minute + 1}/{WORK_MINUTES})")
-                time.sleep(60)
-            
-            print(f"\n{EMOJI_SUCCESS} Work session complete!")
-            
-            # Break session
-            print(f"\n{EMOJI_BREAK} Break session ({BREAK_MINUTES} minutes)")
-            for minute in range(BREAK_MINUTES):
-                print(f"Play! ({minute + 1}/{BREAK_MINUTES})")
-                time.sleep(60)
-            
-            print(f"\n{EMOJI_CELEBRATE} Break complete! Ready for next round?\n")
-            
-    except KeyboardInterrupt:
-        print(f"\n\n{EMOJI_STOP}  Timer stopped. Good work!")
+        run_pomodoro(engine, WORK_MINUTES * 60, BREAK_MINUTES * 60, pick_task, listener)
+    finally:
+        signal.signal(signal.SIGINT, previous)
+    print(f"\n\n{EMOJI_STOP}  Timer stopped. Good work!")
+
+def show_stats(args):
+    import argparse
+    from focus_stats import print_stats
+    
+    parser = argparse.ArgumentParser(prog='goaly.py stats', description='Show focus time from recorded sessions.')
+    parser.add_argument('--days', type=int, default=7, help='days of daily history to show (default: 7)')
+    parser.add_argument('--task', type=int, metavar='TASK_ID', help='show focus time for one task')
+    opts = parser.parse_args(args)
+    print_stats(get_store(DB_NAME, readonly=True), max(1, opts.days), opts.task)
 
 def show_help():
     print("""
@@ -105,36 +371,126 @@ Goaly - Pomodoro Timer with Task Management
 Usage: python goaly.py [command] [arguments]
 
 Commands:
-  add "task description"    Add a new task
-  list                     Show all incomplete tasks
-  complete TASK_ID         Mark a task as completed
-  start                    Start the pomodoro timer
+  add [--key KEY] "task description"  Add a new task (repeating an add with the same KEY adds it once)
+  list [OPTIONS]           Show tasks ready to work on (--status, --after, --limit, --format, --archived, --tag)
+  search WORDS [OPTIONS]   Find tasks by description (--status, --limit, --format, --archived)
+  complete ID... | --match TEXT  Mark tasks as completed (ids, ranges like 10-200, or matching text)
+  reopen ID                Mark a completed or archived task incomplete again
+  tag add|remove ID NAME...  Tag or untag a task (tag list [ID] shows tags, tag delete NAME... drops them)
+  dep add|remove ID PREREQ_ID...  Make a task wait for others to be completed first (dep show ID)
+  delete ID... | --match TEXT    Delete tasks, selected the same way
+  import [FILE]            Bulk import tasks (text, CSV or JSON Lines; stdin if no FILE)
+  export [FILE]            Write a backup in the mobile app format (stdout if no FILE)
+  import-backup FILE [--replace]  Restore a backup (merges unless --replace)
+  archive [--days N]       Move tasks completed over N days ago (default 30) to the archive
+  sync push|pull DIR        Exchange changes with other replicas through a shared directory
+  start [--weighted]       Start the pomodoro timer (--weighted favours priority and idle tasks)
+  priority ID LEVEL        Set a task's priority for weighted picks (-2 to 3, default 0)
+  stats [--days N] [--task ID]  Show focus time per day, week and task
+  metrics [--format prometheus] Show operation latencies (record with GOALY_METRICS=1)
   help                     Show this help message
 
 Examples:
   python goaly.py add "Write documentation"
   python goaly.py list
+  python goaly.py list --status all --after 500 --limit 50 --format jsonl
+  python goaly.py search quarterly rep
   python goaly.py complete 1
+  python goaly.py complete 3 7 10-200
+  python goaly.py dep add 12 10 11
+  python goaly.py tag add 12 home && python goaly.py list --tag home
+  python goaly.py delete --match "old sprint"
+  python goaly.py search --archived tax return
+  python goaly.py archive --days 90
+  python goaly.py import backlog.csv
+  python goaly.py export goaly-backup.json
+  python goaly.py import-backup goaly-backup.json
+  python goaly.py sync push ~/Dropbox/goaly && python goaly.py sync pull ~/Dropbox/goaly
   python goaly.py start
+  python goaly.py stats --days 14
 """)
 
-def main():
-    init_db()
+def show_metrics(args):
+    import argparse
+    import metrics
     
+    parser = argparse.ArgumentParser(prog='goaly.py metrics',
+                                     description='Show operation counts and latencies recorded with GOALY_METRICS=1.')
+    parser.add_argument('--format', choices=('table', 'prometheus'), default='table',
+                        help='output format (default: table)')
+    parser.add_argument('--reset', action='store_true', help='delete the recorded metrics')
+    opts = parser.parse_args(args)
+    if opts.reset:
+        metrics.reset()
+        print(f'Metrics reset ({metrics.PROM_FILE}).')
+        return
+    metrics.flush()
+    counters, histograms = metrics.load()
+    if opts.format == 'prometheus':
+        sys.stdout.write(metrics.render_prometheus(counters, histograms))
+        return
+    if not counters and not histograms:
+        state = 'on' if metrics.ENABLED else 'off; set GOALY_METRICS=1 to record them'
+        print(f'No metrics recorded yet (metrics are {state}).')
+        return
+    print(f'\nMetrics from {metrics.state_path()}:')
+    for line in metrics.report(counters, histograms):
+        print(line)
+
+def main():
+    try:
+        run_command()
+    except Exception as e:
+        from task_store import EXIT_BUSY, DatabaseBusy
+        if not isinstance(e, DatabaseBusy):
+            raise
+        # Raised before anything was written, so the command can simply be rerun.
+        print(f'Another program kept the task database busy; nothing was changed ({e}).', file=sys.stderr)
+        sys.exit(EXIT_BUSY)
+
+def run_command():
     if len(sys.argv) < 2:
         show_help()
         return
     
     command = sys.argv[1].lower()
     
-    if command == 'add' and len(sys.argv) >= 3:
+    if command == 'add' and len(sys.argv) >= 5 and sys.argv[2] == '--key':
+        add_task(' '.join(sys.argv[4:]), sys.argv[3])
+    elif command == 'add' and len(sys.argv) >= 3:
         add_task(' '.join(sys.argv[2:]))
     elif command == 'list':
-        list_tasks()
-    elif command == 'complete' and len(sys.argv) == 3:
-        complete_task(sys.argv[2])
+        list_tasks(sys.argv[2:])
+    elif command == 'search' and len(sys.argv) >= 3:
+        search_tasks(sys.argv[2:])
+    elif command == 'complete' and len(sys.argv) >= 3:
+        complete_tasks(sys.argv[2:])
+    elif command == 'reopen' and len(sys.argv) == 3:
+        reopen_task(sys.argv[2])
+    elif command == 'tag':
+        tag_tasks(sys.argv[2:])
+    elif command == 'dep':
+        dependency_tasks(sys.argv[2:])
+    elif command == 'archive':
+        archive_tasks(sys.argv[2:])
+    elif command == 'delete' and len(sys.argv) >= 3:
+        delete_tasks(sys.argv[2:])
+    elif command == 'import':
+        import_tasks(sys.argv[2:])
+    elif command == 'export':
+        export_backup(sys.argv[2:])
+    elif command == 'import-backup' and len(sys.argv) >= 3:
+        restore_backup(sys.argv[2:])
+    elif command == 'sync':
+        sync_tasks(sys.argv[2:])
+    elif command == 'priority' and len(sys.argv) >= 4:
+        set_priority(sys.argv[2:])
     elif command == 'start':
-        start_timer()
+        start_timer(sys.argv[2:])
+    elif command == 'stats':
+        show_stats(sys.argv[2:])
+    elif command == 'metrics':
+        show_metrics(sys.argv[2:])
     elif command == 'help':
         show_help()
     else:
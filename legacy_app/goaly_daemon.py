@@ -0,0 +1,287 @@
+"""Goaly timer daemon: many pomodoro sessions on one asyncio event loop.
+
+Every session's next phase change sits in a single deadline heap, and one
+loop.call_at() timer is armed for the earliest entry, so an idle session
+costs a heap entry rather than a thread. Clients talk to the daemon with
+one JSON object per line over a local Unix socket.
+
+Usage:
+  python goaly_daemon.py serve [--socket PATH] [--db PATH]
+  python goaly_daemon.py start NAME [--work-minutes 25] [--break-minutes 5]
+  python goaly_daemon.py stop SESSION_ID
+  python goaly_daemon.py status [SESSION_ID]
+"""
+import argparse
+import asyncio
+import collections
+import heapq
+import itertools
+import json
+import math
+import os
+import signal
+import socket
+import sys
+
+import metrics
+from task_store import DB_NAME, TaskStore
+from timer_engine import BREAK, WORK
+
+SOCKET_PATH = 'goaly.sock'
+LATENESS_WINDOW = 100_000
+# Shorter phases are no use for a pomodoro, and tiny ones vanish when added
+# to a large loop.time() deadline.
+MIN_PHASE_SECONDS = 1
+
+
+class Session:
+    __slots__ = ('id', 'name', 'work_seconds', 'break_seconds', 'phase', 'task', 'deadline', 'cycles')
+
+    def __init__(self, session_id, name, work_seconds, break_seconds):
+        self.id = session_id
+        self.name = name
+        self.work_seconds = work_seconds
+        self.break_seconds = break_seconds
+        self.phase = WORK
+        self.task = None
+        self.deadline = None
+        self.cycles = 0
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+class SessionManager:
+    """Owns all sessions and moves each one through work and break phases.
+
+    Must be used from the event loop's thread. Phase deadlines chain from
+    the previous deadline, not from when the timer actually fired, so a busy
+    loop delays a phase change without shifting the session's schedule.
+    """
+
+    def __init__(self, pick_task):
+        self.pick_task = pick_task
+        self.sessions = {}
+        self.transitions = 0
+        # How late each phase change ran relative to its deadline (seconds).
+        self.lateness = collections.deque(maxlen=LATENESS_WINDOW)
+        self._heap = []
+        self._ids = itertools.count(1)
+        self._timer = None
+        self._timer_at = None
+        self._loop = None
+
+    def _now(self):
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        return self._loop.time()
+
+    def _schedule(self, session, deadline, arm=True):
+        # A deadline that does not move forward is due again at once, and
+        # _fire would never leave its loop.
+        if session.deadline is not None and deadline <= session.deadline:
+            raise ValueError(f'next deadline {deadline} does not advance past {session.deadline}')
+        session.deadline = deadline
+        heapq.heappush(self._heap, (deadline, session.id))
+        if arm and (self._timer_at is None or deadline < self._timer_at):
+            self._arm()
+
+    def _arm(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = self._timer_at = None
+        if self._heap:
+            self._timer_at = self._heap[0][0]
+            self._timer = self._loop.call_at(self._timer_at, self._fire)
+
+    def _fire(self):
+        self._timer = self._timer_at = None
+        now = self._loop.time()
+        heap = self._heap
+        try:
+            while heap and heap[0][0] <= now:
+                deadline, session_id = heapq.heappop(heap)
+                session = self.sessions.get(session_id)
+                # Entries for stopped sessions are dropped lazily here.
+                if session is None or session.deadline != deadline:
+                    continue
+                self.lateness.append(now - deadline)
+                if metrics.ENABLED:
+                    metrics.observe('goaly_daemon_lateness_seconds', now - deadline)
+                self.transitions += 1
+                try:
+                    if session.phase == WORK:
+                        session.phase = BREAK
+                        self._schedule(session, deadline + session.break_seconds, arm=False)
+                    else:
+                        session.phase = WORK
+                        session.cycles += 1
+                        session.task = self._pick(session)
+                        self._schedule(session, deadline + session.work_seconds, arm=False)
+                except ValueError as e:
+                    print(f'Session {session.id} stopped: {e}', file=sys.stderr)
+                    self.stop(session.id)
+        finally:
+            # Without a timer no session would ever change phase again.
+            self._arm()
+
+    def _pick(self, session):
+        """pick_task() for a new work phase; a failure leaves the phase without a task."""
+        try:
+            return self.pick_task()
+        except Exception as e:
+            print(f'Session {session.id}: could not pick a task: {e!r}', file=sys.stderr)
+            return None
+
+    def start(self, name, work_seconds, break_seconds):
+        session = Session(next(self._ids), name, work_seconds, break_seconds)
+        session.task = self._pick(session)
+        self.sessions[session.id] = session
+        self._schedule(session, self._now() + work_seconds)
+        return session
+
+    def stop(self, session_id):
+        return self.sessions.pop(session_id, None)
+
+    def describe(self, session):
+        task = None
+        if session.task:
+            task = {'id': session.task[0], 'description': session.task[1]}
+        return {
+            'session': session.id,
+            'name': session.name,
+            'phase': session.phase,
+            'task': task,
+            'remaining': max(0.0, session.deadline - self._now()),
+            'cycles': session.cycles,
+        }
+
+    def summary(self):
+        ordered = sorted(self.lateness)
+        return {
+            'sessions': len(self.sessions),
+            'transitions': self.transitions,
+            'lateness_ms': {
+                'p50': percentile(ordered, 50) * 1000,
+                'p99': percentile(ordered, 99) * 1000,
+                'max': (ordered[-1] if ordered else 0.0) * 1000,
+            },
+        }
+
+    def handle(self, request):
+        """Run one protocol command and return the response object."""
+        cmd = request.get('cmd')
+        if cmd == 'start':
+            name = str(request.get('name') or 'anonymous')
+            work = float(request.get('work_seconds', 25 * 60))
+            rest = float(request.get('break_seconds', 5 * 60))
+            # NaN passes every comparison and infinity never fires; both
+            # would sit in the deadline heap for good.
+            if not (math.isfinite(work) and math.isfinite(rest)) or min(work, rest) < MIN_PHASE_SECONDS:
+                raise ValueError(f'work_seconds and break_seconds must be finite and at least {MIN_PHASE_SECONDS}')
+            return {'ok': True, **self.describe(self.start(name, work, rest))}
+        if cmd == 'stop':
+            session = self.stop(int(request['session']))
+            if session is None:
+                return {'ok': False, 'error': f"no session {request['session']}"}
+            return {'ok': True, 'session': session.id, 'cycles': session.cycles}
+        if cmd == 'status':
+            if request.get('session') is None:
+                return {'ok': True, **self.summary()}
+            session = self.sessions.get(int(request['session']))
+            if session is None:
+                return {'ok': False, 'error': f"no session {request['session']}"}
+            return {'ok': True, **self.describe(session)}
+        return {'ok': False, 'error': f'unknown command: {cmd!r}'}
+
+
+async def handle_client(manager, reader, writer):
+    try:
+        async for line in reader:
+            if not line.strip():
+                continue
+            try:
+                response = manager.handle(json.loads(line))
+            except (ValueError, KeyError, TypeError, AttributeError, OverflowError) as e:
+                response = {'ok': False, 'error': str(e)}
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(manager, socket_path):
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    return await asyncio.start_unix_server(
+        lambda reader, writer: handle_client(manager, reader, writer), path=socket_path)
+
+
+async def serve(socket_path, db_name):
+    store = TaskStore(db_name)
+    manager = SessionManager(store.get_random_task)
+    server = await start_server(manager, socket_path)
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopping.set)
+    print(f'Goaly daemon listening on {socket_path}')
+    try:
+        async with server:
+            await stopping.wait()
+    finally:
+        store.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def send(socket_path, request):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request).encode() + b'\n')
+        with sock.makefile('rb') as stream:
+            return json.loads(stream.readline())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Goaly multi-session timer daemon.')
+    parser.add_argument('--socket', default=SOCKET_PATH, help=f'Unix socket path (default: {SOCKET_PATH})')
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_cmd = commands.add_parser('serve', help='run the daemon')
+    serve_cmd.add_argument('--db', default=DB_NAME, help=f'task database (default: {DB_NAME})')
+    start_cmd = commands.add_parser('start', help='start a session')
+    start_cmd.add_argument('name')
+    start_cmd.add_argument('--work-minutes', type=float, default=25)
+    start_cmd.add_argument('--break-minutes', type=float, default=5)
+    stop_cmd = commands.add_parser('stop', help='stop a session')
+    stop_cmd.add_argument('session', type=int)
+    status_cmd = commands.add_parser('status', help='show one session, or daemon totals')
+    status_cmd.add_argument('session', type=int, nargs='?')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        asyncio.run(serve(args.socket, args.db))
+        print('Goaly daemon stopped.')
+        return
+
+    if args.command == 'start':
+        request = {'cmd': 'start', 'name': args.name,
+                   'work_seconds': args.work_minutes * 60, 'break_seconds': args.break_minutes * 60}
+    else:
+        request = {'cmd': args.command, 'session': args.session}
+    try:
+        response = send(args.socket, request)
+    except OSError as e:
+        print(f'Cannot reach the Goaly daemon at {args.socket}: {e}')
+        sys.exit(1)
+    print(json.dumps(response, indent=2, ensure_ascii=False))
+    sys.exit(0 if response.get('ok') else 1)
+
+
+if __name__ == '__main__':
+    main()
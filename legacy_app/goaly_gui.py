@@ -1,41 +1,93 @@
+import os
 import tkinter as tk
+import metrics
 from tkinter import ttk, scrolledtext, messagebox
-import sqlite3
-import threading
-import time
-from datetime import datetime
 from emoji_config import *
+from task_store import TaskStore
+from task_list_view import TaskListView
+from log_pipeline import LogPipeline
+from timer_engine import WORK, MultiListener, PomodoroListener, PomodoroTimer
+from focus_stats import SessionRecorder
+from task_selector import WeightedSelector
+from write_queue import WriteQueue
+from change_watcher import ChangeWatcher
+
+class GuiTimerListener(PomodoroListener):
+    # Called on the timer thread: widget updates go through root.after and
+    # log lines through the log pipeline.
+    def __init__(self, app):
+        self.app = app
+    
+    def task_selected(self, task):
+        self.app.root.after(0, self.app.update_task_display, task)
+        if task:
+            task_id, task_desc = task
+            self.app.log_message(f"{EMOJI_GOAL} Selected task: [{task_id}] {task_desc}")
+        else:
+            self.app.log_message(f"{EMOJI_GOAL} No tasks available - time to add some!")
+    
+    def phase_started(self, phase, seconds, task):
+        if phase == WORK:
+            text = f"{EMOJI_TIMER} Work Session ({self.app.work_minutes} minutes)"
+            self.app.log_message(f"{EMOJI_TIMER} Starting work session ({self.app.work_minutes} minutes)")
+        else:
+            text = f"{EMOJI_BREAK} Break Session ({self.app.break_minutes} minutes)"
+            self.app.log_message(f"{EMOJI_BREAK} Starting break session ({self.app.break_minutes} minutes)")
+        self.app.root.after(0, lambda: self.app.timer_label.config(text=text))
+    
+    def step(self, phase, index, count, task):
+        if phase != WORK:
+            self.app.log_message(f"Play! ({index + 1}/{count})")
+        elif task:
+            self.app.log_message(f"Work on: {task[1]}. Minute: {index + 1} out of {count}")
+        else:
+            self.app.log_message(f"Work! Minute {index + 1} out of {count}")
+    
+    def progress(self, phase, elapsed, total):
+        self.app.root.after(0, self.app.progress_var.set, elapsed / total * 100)
+    
+    def phase_finished(self, phase, task):
+        if phase == WORK:
+            self.app.log_message(f"{EMOJI_SUCCESS} Work session complete!")
+        else:
+            self.app.log_message(f"{EMOJI_CELEBRATE} Break complete! Ready for next round?")
+            self.app.root.after(0, self.app.progress_var.set, 0)
+
+# How often a long-running GUI publishes metrics when GOALY_METRICS is set.
+METRICS_FLUSH_MS = 60_000
 
 class GoalyGUI:
-    def __init__(self, root):
+    def __init__(self, root, log_file=None, clock=None):
         self.root = root
+        self.log_file = log_file
         self.root.title("Goaly - Pomodoro Timer with Task Management")
         self.root.geometry("600x500")
         self.root.configure(bg='#f0f0f0')
         
         # Timer variables
-        self.is_running = False
-        self.timer_thread = None
         self.work_minutes = 25
         self.break_minutes = 5
         
         # Database
         self.db_name = 'tasks.db'
-        self.init_db()
+        self.store = TaskStore(self.db_name)
+        # Task edits are written off the Tk thread so a locked or slow
+        # database cannot freeze the window.
+        self.writes = WriteQueue(self.root, self.store)
+        # Picks up tasks added or changed from the command line meanwhile.
+        self.changes = ChangeWatcher(self.root, self.store)
+        # Read on the timer thread at each pick; set from the checkbox.
+        self.weighted = False
+        self.selector = WeightedSelector(self.store)
+        
+        self.timer = PomodoroTimer(self.get_random_task, self.work_minutes * 60,
+                                   self.break_minutes * 60, clock=clock, store=self.store)
         
         self.setup_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        if metrics.ENABLED:
+            self.root.after(METRICS_FLUSH_MS, self.flush_metrics)
         
-    def init_db(self):
-        conn = sqlite3.connect(self.db_name)
-        c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            description TEXT NOT NULL,
-            completed INTEGER NOT NULL DEFAULT 0
-        )''')
-        conn.commit()
-        conn.close()
-    
     def setup_ui(self):
         # Main frame
         main_frame = ttk.Frame(self.root, padding="10")
@@ -80,6 +132,7 @@ class GoalyGUI:
         
         self.output_text = scrolledtext.ScrolledText(self.output_frame, height=8, width=70)
         self.output_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.log = LogPipeline(self.root, self.output_text, spill_path=self.log_file)
         
         # Control buttons
         button_frame = ttk.Frame(main_frame)
@@ -91,29 +144,50 @@ class GoalyGUI:
         self.stop_button = ttk.Button(button_frame, text="Stop Timer", command=self.stop_timer, state='disabled')
         self.stop_button.grid(row=0, column=1, padx=(0, 10))
         
+        self.pause_button = ttk.Button(button_frame, text="Pause", command=self.toggle_pause, state='disabled')
+        self.pause_button.grid(row=0, column=2, padx=(0, 10))
+        
         self.add_task_button = ttk.Button(button_frame, text="Add Task", command=self.add_task_dialog)
-        self.add_task_button.grid(row=0, column=2, padx=(0, 10))
+        self.add_task_button.grid(row=0, column=3, padx=(0, 10))
         
         self.list_tasks_button = ttk.Button(button_frame, text="List Tasks", command=self.list_tasks)
-        self.list_tasks_button.grid(row=0, column=3)
+        self.list_tasks_button.grid(row=0, column=4, padx=(0, 10))
+        
+        self.weighted_var = tk.BooleanVar(value=self.weighted)
+        self.weighted_check = ttk.Checkbutton(button_frame, text="Weighted pick", variable=self.weighted_var,
+                                              command=self.toggle_weighted)
+        self.weighted_check.grid(row=0, column=5)
         
         # Configure grid weights for output frame
         self.output_frame.columnconfigure(0, weight=1)
         self.output_frame.rowconfigure(0, weight=1)
         
+    def close(self):
+        self.timer.stop()
+        if self.timer.thread:
+            # Let the timer thread record the interrupted session.
+            self.timer.thread.join(timeout=1)
+        self.writes.close()
+        self.changes.close()
+        self.log.close()
+        self.root.destroy()
+    
+    def flush_metrics(self):
+        metrics.flush()
+        self.root.after(METRICS_FLUSH_MS, self.flush_metrics)
+    
     def log_message(self, message):
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.output_text.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.output_text.see(tk.END)
-        self.root.update_idletasks()
+        # Safe from any thread; the Tk main loop writes it to the widget.
+        self.log.post(message)
     
     def get_random_task(self):
-        conn = sqlite3.connect(self.db_name)
-        c = conn.cursor()
-        c.execute('SELECT id, description FROM tasks WHERE completed = 0 ORDER BY RANDOM() LIMIT 1')
-        task = c.fetchone()
-        conn.close()
-        return task
+        if self.weighted:
+            return self.selector.pick()
+        return self.store.get_random_task()
+    
+    def toggle_weighted(self):
+        self.weighted = self.weighted_var.get()
+        self.log_message("Weighted task picks " + ("on: priority and idle tasks first" if self.weighted else "off"))
     
     def update_task_display(self, task):
         if task:
@@ -123,83 +197,33 @@ class GoalyGUI:
             self.current_task_label.config(text="No tasks available - add some tasks!")
     
     def start_timer(self):
-        if self.is_running:
+        if self.timer.running:
             return
             
-        self.is_running = True
         self.start_button.config(state='disabled')
         self.stop_button.config(state='normal')
+        self.pause_button.config(state='normal', text="Pause")
         
-        self.timer_thread = threading.Thread(target=self.timer_loop, daemon=True)
-        self.timer_thread.start()
+        self.timer.start(MultiListener(GuiTimerListener(self), SessionRecorder(self.store), self.selector))
     
     def stop_timer(self):
-        self.is_running = False
+        self.timer.stop()
         self.start_button.config(state='normal')
         self.stop_button.config(state='disabled')
+        self.pause_button.config(state='disabled', text="Pause")
         self.timer_label.config(text="Timer stopped")
         self.progress_var.set(0)
         self.log_message(f"{EMOJI_STOP} Timer stopped by user")
     
-    def timer_loop(self):
-        while self.is_running:
-            # Get a random task
-            task = self.get_random_task()
-            self.root.after(0, self.update_task_display, task)
-            
-            if task:
-                task_id, task_desc = task
-                self.log_message(f"{EMOJI_GOAL} Selected task: [{task_id}] {task_desc}")
-            else:
-                self.log_message(f"{EMOJI_GOAL} No tasks available - time to add some!")
-            
-            # Work session
-            if not self.is_running:
-                break
-                
-            self.root.after(0, lambda: self.timer_label.config(text=f"{EMOJI_TIMER} Work Session ({self.work_minutes} minutes)"))
-            self.log_message(f"{EMOJI_TIMER} Starting work session ({self.work_minutes} minutes)")
-            
-            for minute in range(self.work_minutes):
-                if not self.is_running:
-                    break
-                    
-                progress = (minute / self.work_minutes) * 100
-                self.root.after(0, self.progress_var.set, progress)
-                
-                if task:
-                    message = f"Work on: {task_desc}. Minute: {minute + 1} out of {self.work_minutes}"
-                else:
-                    message = f"Work! Minute {minute + 1} out of {self.work_minutes})"
-                
-                self.log_message(message)
-                time.sleep(60)
-            
-            if not self.is_running:
-                break
-                
-            self.log_message(f"{EMOJI_SUCCESS} Work session complete!")
-            
-            # Break session
-            self.root.after(0, lambda: self.timer_label.config(text=f"{EMOJI_BREAK} Break Session ({self.break_minutes} minutes)"))
-            self.log_message(f"{EMOJI_BREAK} Starting break session ({self.break_minutes} minutes)")
-            
-            for minute in range(self.break_minutes):
-                if not self.is_running:
-                    break
-                    
-                progress = (minute / self.break_minutes) * 100
-                self.root.after(0, self.progress_var.set, progress)
-                
-                message = f"Play! ({minute + 1}/{self.break_minutes})"
-                self.log_message(message)
-                time.sleep(60)
-            
-            if not self.is_running:
-                break
-                
-            self.log_message(f"{EMOJI_CELEBRATE} Break complete! Ready for next round?")
-            self.root.after(0, self.progress_var.set, 0)
+    def toggle_pause(self):
+        if self.timer.paused:
+            self.timer.resume()
+            self.pause_button.config(text="Pause")
+            self.log_message("Timer resumed")
+        else:
+            self.timer.pause()
+            self.pause_button.config(text="Resume")
+            self.log_message("Timer paused")
     
     def add_task_dialog(self):
         dialog = tk.Toplevel(self.root)
@@ -217,11 +241,8 @@ class GoalyGUI:
         def add_task():
             description = task_entry.get().strip()
             if description:
-                conn = sqlite3.connect(self.db_name)
-                c = conn.cursor()
-                c.execute('INSERT INTO tasks (description) VALUES (?)', (description,))
-                conn.commit()
-                conn.close()
+                self.writes.add(description, on_error=lambda e: self.log_message(
+                    f"{EMOJI_ERROR} Could not add task '{description}': {e}"))
                 self.log_message(f"{EMOJI_SUCCESS} Task added: {description}")
                 dialog.destroy()
         
@@ -241,7 +262,7 @@ class GoalyGUI:
         # Create task management window
         task_window = tk.Toplevel(self.root)
         task_window.title("Task Manager")
-        task_window.geometry("500x450")
+        task_window.geometry("500x480")
         task_window.transient(self.root)
         task_window.grab_set()
         
@@ -253,101 +274,92 @@ class GoalyGUI:
         title_label = ttk.Label(main_frame, text=f"{EMOJI_TASKS} Task Manager", font=('Arial', 14, 'bold'))
         title_label.pack(pady=(0, 10))
         
+        # Filter box: matches as you type, through the full-text index
+        filter_frame = ttk.Frame(main_frame)
+        filter_frame.pack(fill=tk.X, pady=(0, 10))
+        ttk.Label(filter_frame, text="Filter:").pack(side=tk.LEFT, padx=(0, 5))
+        filter_var = tk.StringVar()
+        filter_entry = ttk.Entry(filter_frame, textvariable=filter_var)
+        filter_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        filter_entry.bind('<Escape>', lambda e: filter_var.set(""))
+        
         # Task list frame
         list_frame = ttk.LabelFrame(main_frame, text="Tasks", padding="10")
         list_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
         
-        # Create treeview for tasks
-        columns = ('ID', 'Description', 'Status')
-        tree = ttk.Treeview(list_frame, columns=columns, show='headings', height=15)
+        refresh_label = ttk.Label(main_frame, text="", foreground='gray')
         
-        # Configure columns
-        tree.heading('ID', text='ID')
-        tree.heading('Description', text='Description')
-        tree.heading('Status', text='Status')
-        tree.column('ID', width=50)
-        tree.column('Description', width=300)
-        tree.column('Status', width=100)
+        def show_refresh_time(view):
+            if view.query:
+                count = len(view.tree.get_children())
+                refresh_label.config(text=f"{count} matches for \"{view.query}\" in {view.last_refresh_ms:.1f} ms")
+            else:
+                refresh_label.config(text=f"Refreshed in {view.last_refresh_ms:.1f} ms")
         
-        # Scrollbar
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=tree.yview)
-        tree.configure(yscrollcommand=scrollbar.set)
+        # Task list only holds the rows around the visible window
+        view = TaskListView(list_frame, self.store, on_update=show_refresh_time)
+        filter_var.trace_add('write', lambda *args: view.search(filter_var.get()))
+        # Tasks changed elsewhere show up without a refresh
+        self.changes.subscribe(view.apply_changes)
+        view.tree.bind('<Destroy>', lambda e: self.changes.unsubscribe(view.apply_changes), add='+')
         
-        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        refresh_label.pack(anchor=tk.W)
         
         # Button frame
         button_frame = ttk.Frame(main_frame)
         button_frame.pack(fill=tk.X, pady=(10, 0))
         
         def refresh_tasks():
-            # Clear existing items
-            for item in tree.get_children():
-                tree.delete(item)
-            
-            # Load tasks from database
-            conn = sqlite3.connect(self.db_name)
-            c = conn.cursor()
-            c.execute('SELECT id, description, completed FROM tasks ORDER BY id')
-            tasks = c.fetchall()
-            conn.close()
-            
-            # Configure tags once
-            tree.tag_configure('completed', foreground='gray')
-            
-            # Add tasks to treeview
-            for tid, desc, comp in tasks:
-                status = "Completed" if comp else "Incomplete"
-                item = tree.insert('', tk.END, values=(tid, desc, status))
-                
-                # Apply gray color for completed tasks
-                if comp:
-                    tree.item(item, tags=('completed',))
+            # Only reads what changed since the last check
+            if not self.changes.check():
+                refresh_label.config(text=f"Up to date (checked in {self.changes.last_check_ms:.1f} ms)")
+        
+        def while_open(callback):
+            # Write results can arrive after the Task Manager is closed.
+            return lambda *args: callback(*args) if view.tree.winfo_exists() else None
+        
+        def describe(task_ids):
+            return f"Task {task_ids[0]}" if len(task_ids) == 1 else f"{len(task_ids)} tasks"
         
         def mark_complete():
-            selected_item = tree.selection()
-            if not selected_item:
+            # Already completed rows are skipped
+            task_ids = [task_id for task_id, _desc, completed in view.selected_tasks() if not completed]
+            if not task_ids:
                 return
             
-            item = tree.item(selected_item[0])
-            task_id = item['values'][0]
-            status = item['values'][2]
-            
-            if status == "Completed":
-                return  # Already completed
+            # Shown as done at once; put back if the write fails
+            view.mark_completed(*task_ids)
+            self.log_message(f"{EMOJI_SUCCESS} {describe(task_ids)} marked as completed")
             
-            conn = sqlite3.connect(self.db_name)
-            c = conn.cursor()
-            c.execute('UPDATE tasks SET completed = 1 WHERE id = ?', (task_id,))
-            conn.commit()
-            conn.close()
+            def failed(error):
+                self.log_message(f"{EMOJI_ERROR} Could not complete {describe(task_ids).lower()}: {error}")
+                while_open(view.mark_incomplete)(*task_ids)
             
-            self.log_message(f"{EMOJI_SUCCESS} Task {task_id} marked as completed")
-            refresh_tasks()
+            self.writes.complete(task_ids, on_error=failed)
         
         def delete_task():
-            selected_item = tree.selection()
-            if not selected_item:
+            selected = view.selected_tasks()
+            if not selected:
                 return
             
-            item = tree.item(selected_item[0])
-            task_id = item['values'][0]
-            task_desc = item['values'][1]
-            
             # Confirm deletion
-            confirm = tk.messagebox.askyesno("Confirm Delete", 
-                                           f"Are you sure you want to delete task {task_id}: '{task_desc}'?")
-            if not confirm:
+            if len(selected) == 1:
+                task_id, task_desc, _completed = selected[0]
+                question = f"Are you sure you want to delete task {task_id}: '{task_desc}'?"
+            else:
+                question = f"Are you sure you want to delete {len(selected)} tasks?"
+            if not tk.messagebox.askyesno("Confirm Delete", question):
                 return
             
-            conn = sqlite3.connect(self.db_name)
-            c = conn.cursor()
-            c.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
-            conn.commit()
-            conn.close()
+            task_ids = [task_id for task_id, _desc, _completed in selected]
+            view.remove(*task_ids)
+            self.log_message(f"{EMOJI_DELETE} {describe(task_ids)} deleted")
+            
+            def failed(error):
+                self.log_message(f"{EMOJI_ERROR} Could not delete {describe(task_ids).lower()}: {error}")
+                while_open(view.restore)(selected)
             
-            self.log_message(f"{EMOJI_DELETE} Task {task_id} deleted")
-            refresh_tasks()
+            self.writes.delete(task_ids, on_error=failed)
         
         def add_new_task():
             # Create add task dialog
@@ -366,14 +378,16 @@ class GoalyGUI:
             def add_task():
                 description = task_entry.get().strip()
                 if description:
-                    conn = sqlite3.connect(self.db_name)
-                    c = conn.cursor()
-                    c.execute('INSERT INTO tasks (description) VALUES (?)', (description,))
-                    conn.commit()
-                    conn.close()
+                    pending = view.add_pending(description)
                     self.log_message(f"{EMOJI_SUCCESS} Task added: {description}")
                     add_dialog.destroy()
-                    refresh_tasks()
+                    
+                    def failed(error):
+                        self.log_message(f"{EMOJI_ERROR} Could not add task '{description}': {error}")
+                        while_open(view.resolve_pending)(pending)
+                    
+                    self.writes.add(description, on_done=while_open(lambda task_id: view.resolve_pending(pending, task_id)),
+                                    on_error=failed)
             
             def cancel():
                 add_dialog.destroy()
@@ -394,12 +408,16 @@ class GoalyGUI:
         ttk.Button(button_frame, text="Close", command=task_window.destroy).pack(side=tk.RIGHT)
         
         # Load initial tasks
-        refresh_tasks()
+        view.refresh()
 
 def main():
     root = tk.Tk()
-    app = GoalyGUI(root)
-    root.mainloop()
+    # Set GOALY_LOG_FILE to keep log lines that scroll out of the window.
+    app = GoalyGUI(root, log_file=os.environ.get('GOALY_LOG_FILE'))
+    try:
+        root.mainloop()
+    finally:
+        app.store.close()
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
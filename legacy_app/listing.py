@@ -0,0 +1,64 @@
+"""Streaming task listing shared by the tasks.py and goaly.py list commands."""
+import os
+import sys
+from types import SimpleNamespace
+
+STATUSES = ('all', 'incomplete', 'ready', 'completed')
+FORMATS = ('table', 'jsonl', 'tsv')
+
+TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def parse_list_args(prog, args, default_status):
+    if not args:
+        # The plain call needs no parsing; skip importing and building argparse.
+        return SimpleNamespace(status=default_status, after=0, limit=None, format='table', archived=False, tag=None)
+    import argparse
+    parser = argparse.ArgumentParser(prog=prog, description='List tasks, streaming in id order.')
+    parser.add_argument('--status', choices=STATUSES, default=default_status,
+                        help=f'which tasks to show (default: {default_status})')
+    parser.add_argument('--after', type=int, default=0, metavar='ID',
+                        help='start after this task id (pass the last id shown to get the next page)')
+    parser.add_argument('--limit', type=int, metavar='N', help='show at most N tasks')
+    parser.add_argument('--format', choices=FORMATS, default='table', help='output format (default: table)')
+    parser.add_argument('--archived', action='store_true', help='include archived tasks')
+    parser.add_argument('--tag', metavar='NAME', help='only tasks with this tag')
+    opts = parser.parse_args(args)
+    if opts.limit is not None and opts.limit < 0:
+        parser.error('--limit must not be negative')
+    if opts.tag is not None and opts.archived:
+        parser.error('--tag lists tasks in the task list only; drop --archived')
+    return opts
+
+
+def format_row(row, fmt, status):
+    tid, desc, comp = row
+    if fmt == 'jsonl':
+        import json
+        return json.dumps({'id': tid, 'description': desc, 'completed': bool(comp)}, ensure_ascii=False)
+    if fmt == 'tsv':
+        return f'{tid}\t{1 if comp else 0}\t{desc.translate(TSV_ESCAPES)}'
+    # Listing only incomplete tasks makes the check mark redundant.
+    if status in ('incomplete', 'ready'):
+        return f'[{tid}] {desc}'
+    return f'[{"✓" if comp else " "}] {tid}: {desc}'
+
+
+def print_tasks(rows, fmt, status, header=None, out=None):
+    """Write rows as they arrive and return how many were written.
+
+    header is printed before the first row in table format only.
+    """
+    out = out or sys.stdout
+    count = 0
+    try:
+        for row in rows:
+            if count == 0 and header and fmt == 'table':
+                print(header, file=out)
+            print(format_row(row, fmt, status), file=out)
+            count += 1
+        out.flush()
+    except BrokenPipeError:
+        # The reader (e.g. `| head`) went away; stop quietly.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), out.fileno())
+    return count
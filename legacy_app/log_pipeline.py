@@ -0,0 +1,94 @@
+import logging
+import queue
+import tkinter as tk
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+MAX_LINES = 1000
+DRAIN_INTERVAL_MS = 100
+MAX_BATCH = 500
+SPILL_BYTES = 1_000_000
+SPILL_BACKUPS = 3
+
+
+class LogPipeline:
+    """Thread-safe, batched writer for the GUI's timer log.
+
+    Any thread may call post(); messages are queued and the Tk main loop
+    drains them into the text widget in batches every DRAIN_INTERVAL_MS.
+    The widget keeps at most max_lines lines. Older lines are dropped, or
+    appended to a rotating log file when spill_path is given.
+    """
+
+    def __init__(self, root, widget, max_lines=MAX_LINES, spill_path=None,
+                 interval_ms=DRAIN_INTERVAL_MS):
+        self.root = root
+        self.widget = widget
+        self.max_lines = max_lines
+        self.interval_ms = interval_ms
+        self.queue = queue.SimpleQueue()
+        self._lines = 0
+        self._spill = None
+        if spill_path:
+            handler = RotatingFileHandler(spill_path, maxBytes=SPILL_BYTES,
+                                          backupCount=SPILL_BACKUPS, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self._spill = logging.getLogger(f'goaly.timer_log.{id(self)}')
+            self._spill.setLevel(logging.INFO)
+            self._spill.propagate = False
+            self._spill.addHandler(handler)
+        self._after_id = root.after(interval_ms, self._drain)
+
+    def post(self, message):
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        self.queue.put(f"[{timestamp}] {message}\n")
+
+    def _drain(self):
+        batch = []
+        try:
+            while len(batch) < MAX_BATCH:
+                batch.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        if batch:
+            self.widget.insert(tk.END, ''.join(batch))
+            self._lines += len(batch)
+            self._trim()
+            self.widget.see(tk.END)
+        self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def _trim(self):
+        excess = self._lines - self.max_lines
+        if excess <= 0:
+            return
+        end = f'{excess + 1}.0'
+        if self._spill:
+            for line in self.widget.get('1.0', end).splitlines():
+                self._spill.info(line)
+        self.widget.delete('1.0', end)
+        self._lines = self.max_lines
+
+    def close(self):
+        """Stop draining and, when spilling, write out every remaining line.
+
+        Call before the window is destroyed so the lines still shown in the
+        widget reach the spill file too.
+        """
+        try:
+            if self._after_id is not None:
+                self.root.after_cancel(self._after_id)
+            shown = self.widget.get('1.0', tk.END).splitlines()
+        except tk.TclError:
+            shown = []
+        self._after_id = None
+        if self._spill:
+            for line in shown:
+                if line:
+                    self._spill.info(line)
+            try:
+                while True:
+                    self._spill.info(self.queue.get_nowait().rstrip('\n'))
+            except queue.Empty:
+                pass
+            for handler in self._spill.handlers:
+                handler.close()
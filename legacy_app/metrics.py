@@ -0,0 +1,226 @@
+"""Optional counters and latency histograms for DB operations and timers.
+
+Off unless GOALY_METRICS is set in the environment when this module is
+first imported. When off, timed() hands back the undecorated function and
+the inline `if metrics.ENABLED:` checks are a single global lookup, so
+instrumented code runs as if the layer were not there.
+
+When on, each process accumulates in memory and flush() (run at exit, and
+periodically by the GUI) merges the totals into a JSON state file under a
+file lock. It also rewrites a Prometheus text-format file next to it for
+node exporter's textfile collector (GOALY_METRICS_FILE, default
+goaly_metrics.prom).
+"""
+import atexit
+import bisect
+import functools
+import os
+import threading
+import time
+
+ENABLED = os.environ.get('GOALY_METRICS', '').lower() not in ('', '0', 'false', 'no')
+PROM_FILE = os.environ.get('GOALY_METRICS_FILE', 'goaly_metrics.prom')
+
+# Upper bounds in seconds, from a fast indexed query to a stalled callback.
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+HELP = {
+    'goaly_db_operations_total': ('counter', 'Task store operations run.'),
+    'goaly_db_errors_total': ('counter', 'Task store operations that raised.'),
+    'goaly_db_operation_seconds': ('histogram', 'Task store operation latency.'),
+    'goaly_db_connections_opened_total': ('counter', 'SQLite connections opened.'),
+    'goaly_db_connections_closed_total': ('counter', 'SQLite connections closed.'),
+    'goaly_db_busy_total': ('counter', 'Write transactions that found the database locked.'),
+    'goaly_db_lock_wait_seconds': ('histogram', 'Time write transactions waited for the write lock.'),
+    'goaly_timer_ticks_total': ('counter', 'Timer step and progress callbacks fired.'),
+    'goaly_timer_lag_seconds': ('histogram', 'How late timer callbacks fired after their scheduled time.'),
+    'goaly_timer_callback_seconds': ('histogram', 'Time spent inside timer callbacks.'),
+    'goaly_daemon_lateness_seconds': ('histogram', 'How late daemon phase changes ran after their deadline.'),
+}
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+        hist[0][bisect.bisect_left(BUCKETS, seconds)] += 1
+        hist[1] += seconds
+        hist[2] += 1
+
+
+def timed(op):
+    """Decorator counting and timing a task store operation, when metrics are on."""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                inc('goaly_db_errors_total', op=op)
+                raise
+            finally:
+                inc('goaly_db_operations_total', op=op)
+                observe('goaly_db_operation_seconds', time.perf_counter() - start, op=op)
+        return wrapper
+    return decorate
+
+
+def state_path(prom_file=None):
+    return os.path.splitext(prom_file or PROM_FILE)[0] + '.json'
+
+
+def load(path=None):
+    """Return (counters, histograms) saved by earlier flushes."""
+    import json
+    counters, histograms = {}, {}
+    try:
+        with open(path or state_path()) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return counters, histograms
+    for name, labels, value in state.get('counters', []):
+        counters[name, tuple(map(tuple, labels))] = value
+    for name, labels, buckets, total, count in state.get('histograms', []):
+        histograms[name, tuple(map(tuple, labels))] = [buckets, total, count]
+    return counters, histograms
+
+
+def _save(path, counters, histograms):
+    import json
+    state = {
+        'counters': [[name, labels, value] for (name, labels), value in sorted(counters.items())],
+        'histograms': [[name, labels, *hist] for (name, labels), hist in sorted(histograms.items())],
+    }
+    _write_atomic(path, json.dumps(state))
+
+
+def _write_atomic(path, text):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def flush(prom_file=None):
+    """Merge this process's metrics into the shared files and reset them."""
+    with _lock:
+        counters, histograms = dict(_counters), dict(_histograms)
+        _counters.clear()
+        _histograms.clear()
+    if not counters and not histograms:
+        return
+    prom_file = prom_file or PROM_FILE
+    path = state_path(prom_file)
+    import fcntl
+    with open(path + '.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        saved_counters, saved_histograms = load(path)
+        for key, value in counters.items():
+            saved_counters[key] = saved_counters.get(key, 0) + value
+        for key, (buckets, total, count) in histograms.items():
+            saved = saved_histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+            saved[0] = [a + b for a, b in zip(saved[0], buckets)]
+            saved[1] += total
+            saved[2] += count
+        _save(path, saved_counters, saved_histograms)
+        _write_atomic(prom_file, render_prometheus(saved_counters, saved_histograms))
+
+
+def _labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+
+def render_prometheus(counters, histograms):
+    lines = []
+    described = set()
+
+    def describe(name):
+        if name not in described:
+            described.add(name)
+            kind, text = HELP.get(name, ('untyped', name))
+            lines.append(f'# HELP {name} {text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+    for (name, labels), value in sorted(counters.items()):
+        describe(name)
+        lines.append(f'{name}{_labels(labels)} {value}')
+    for (name, labels), (buckets, total, count) in sorted(histograms.items()):
+        describe(name)
+        cumulative = 0
+        for bound, n in zip((*BUCKETS, '+Inf'), buckets):
+            cumulative += n
+            lines.append(f'{name}_bucket{_labels(labels, [("le", bound)])} {cumulative}')
+        lines.append(f'{name}_sum{_labels(labels)} {total}')
+        lines.append(f'{name}_count{_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def quantile(buckets, q):
+    """Upper bound of the bucket holding quantile q (inf for the overflow bucket)."""
+    target = q * sum(buckets)
+    cumulative = 0
+    for bound, n in zip((*BUCKETS, float('inf')), buckets):
+        cumulative += n
+        if n and cumulative >= target:
+            return bound
+    return 0.0
+
+
+def format_ms(seconds):
+    return '>2500' if seconds == float('inf') else f'{seconds * 1000:g}'
+
+
+def report(counters, histograms):
+    """Return a readable summary: one line per histogram, then the counters."""
+    lines = []
+    for (name, labels), (buckets, total, count) in sorted(histograms.items()):
+        if not count:
+            continue
+        label = ' '.join(f'{v}' for _k, v in labels)
+        lines.append(f'  {name.replace("goaly_", "")} {label}'.rstrip().ljust(42)
+                     + f'{count:>9}  mean {total / count * 1000:9.3f} ms'
+                     + f'  p50 <= {format_ms(quantile(buckets, 0.5)):>6} ms'
+                     + f'  p99 <= {format_ms(quantile(buckets, 0.99)):>6} ms')
+    for (name, labels), value in sorted(counters.items()):
+        if name in ('goaly_db_operations_total', 'goaly_timer_ticks_total'):
+            continue  # Already shown as histogram counts.
+        label = ' '.join(f'{v}' for _k, v in labels)
+        lines.append(f'  {name.replace("goaly_", "")} {label}'.rstrip().ljust(42) + f'{value:>9}')
+    return lines
+
+
+def reset(prom_file=None):
+    prom_file = prom_file or PROM_FILE
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+    for path in (prom_file, state_path(prom_file)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+if ENABLED:
+    atexit.register(flush)
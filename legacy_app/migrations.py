@@ -0,0 +1,437 @@
+"""Versioned schema migrations for tasks.db, tracked with PRAGMA user_version.
+
+Usage: python migrations.py [DB_PATH]   upgrade a database in place and
+                                        print the hot queries' plans
+"""
+import sqlite3
+import sys
+
+# Epoch milliseconds in SQL, for triggers.
+SQL_NOW_MS = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+
+# Migration 1 is the schema every entry point used to create inline, so
+# databases written by older versions (user_version 0) upgrade cleanly.
+MIGRATIONS = [
+    (1, 'tasks table', [
+        '''CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            description TEXT NOT NULL,
+            completed INTEGER NOT NULL DEFAULT 0
+        )''',
+    ]),
+    # task_pool holds the ids of incomplete tasks in dense slots 1..N.
+    # Triggers append on insert/reopen and swap-remove on complete/delete
+    # (the last slot's task moves into the freed slot), so a uniform pick is
+    # one MAX(slot) lookup plus one rowid lookup.
+    (2, 'task_pool random-selection index', [
+        '''CREATE TABLE IF NOT EXISTS task_pool (
+            slot INTEGER PRIMARY KEY,
+            task_id INTEGER NOT NULL
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_task_pool_task ON task_pool (task_id)',
+        '''CREATE TRIGGER IF NOT EXISTS task_pool_add AFTER INSERT ON tasks
+        WHEN NEW.completed = 0
+        BEGIN
+            INSERT INTO task_pool (task_id) VALUES (NEW.id);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS task_pool_reopen AFTER UPDATE OF completed ON tasks
+        WHEN OLD.completed != 0 AND NEW.completed = 0
+        BEGIN
+            INSERT INTO task_pool (task_id) VALUES (NEW.id);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS task_pool_complete AFTER UPDATE OF completed ON tasks
+        WHEN OLD.completed = 0 AND NEW.completed != 0
+            AND EXISTS (SELECT 1 FROM task_pool WHERE task_id = OLD.id)
+        BEGIN
+            UPDATE task_pool SET task_id = (SELECT task_id FROM task_pool ORDER BY slot DESC LIMIT 1)
+            WHERE task_id = OLD.id;
+            DELETE FROM task_pool WHERE slot = (SELECT MAX(slot) FROM task_pool);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS task_pool_delete AFTER DELETE ON tasks
+        WHEN OLD.completed = 0
+            AND EXISTS (SELECT 1 FROM task_pool WHERE task_id = OLD.id)
+        BEGIN
+            UPDATE task_pool SET task_id = (SELECT task_id FROM task_pool ORDER BY slot DESC LIMIT 1)
+            WHERE task_id = OLD.id;
+            DELETE FROM task_pool WHERE slot = (SELECT MAX(slot) FROM task_pool);
+        END''',
+        # Rebuild rather than trust a pool left behind by pre-migration code.
+        'DELETE FROM task_pool',
+        'INSERT INTO task_pool (task_id) SELECT id FROM tasks WHERE completed = 0 ORDER BY id',
+    ]),
+    # Timestamps are milliseconds since the epoch, matching the mobile app.
+    # Rows that predate this migration keep NULL timestamps.
+    (3, 'timestamps and partial index on incomplete tasks', [
+        'ALTER TABLE tasks ADD COLUMN created_at INTEGER',
+        'ALTER TABLE tasks ADD COLUMN completed_at INTEGER',
+        'CREATE INDEX IF NOT EXISTS idx_tasks_incomplete ON tasks (id) WHERE completed = 0',
+    ]),
+    # Checkpoints for resumable bulk imports, keyed by source.
+    (4, 'import progress', [
+        '''CREATE TABLE IF NOT EXISTS import_progress (
+            source TEXT PRIMARY KEY,
+            records INTEGER NOT NULL,
+            updated_at INTEGER NOT NULL
+        )''',
+    ]),
+    # Session history plus rollups that record_session() updates in the same
+    # transaction, so reports read a handful of rows instead of the history.
+    # Durations are monotonic milliseconds; day/week keys are local time.
+    (5, 'session history and focus rollups', [
+        '''CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id INTEGER,
+            phase TEXT NOT NULL,
+            started_at INTEGER NOT NULL,
+            duration_ms INTEGER NOT NULL,
+            finished INTEGER NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS stats_daily (
+            day TEXT PRIMARY KEY,
+            work_sessions INTEGER NOT NULL DEFAULT 0,
+            work_ms INTEGER NOT NULL DEFAULT 0,
+            break_sessions INTEGER NOT NULL DEFAULT 0,
+            break_ms INTEGER NOT NULL DEFAULT 0
+        )''',
+        '''CREATE TABLE IF NOT EXISTS stats_weekly (
+            week TEXT PRIMARY KEY,
+            work_sessions INTEGER NOT NULL DEFAULT 0,
+            work_ms INTEGER NOT NULL DEFAULT 0,
+            break_sessions INTEGER NOT NULL DEFAULT 0,
+            break_ms INTEGER NOT NULL DEFAULT 0
+        )''',
+        '''CREATE TABLE IF NOT EXISTS stats_task (
+            task_id INTEGER PRIMARY KEY,
+            work_sessions INTEGER NOT NULL DEFAULT 0,
+            work_ms INTEGER NOT NULL DEFAULT 0,
+            last_worked_at INTEGER
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_stats_task_work ON stats_task (work_ms)',
+        '''CREATE TABLE IF NOT EXISTS stats_total (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            work_sessions INTEGER NOT NULL DEFAULT 0,
+            work_ms INTEGER NOT NULL DEFAULT 0,
+            break_sessions INTEGER NOT NULL DEFAULT 0,
+            break_ms INTEGER NOT NULL DEFAULT 0
+        )''',
+    ]),
+    # Full-text index over descriptions. tasks_fts is an external-content
+    # table: it stores only the index and reads text from tasks, and the
+    # triggers keep it in step with every insert, edit and delete. The
+    # prefix indexes make short as-you-type prefixes as cheap as whole words.
+    (6, 'full-text search', [
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+            description, content='tasks', content_rowid='id', prefix='2 3'
+        )''',
+        '''CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (rowid, description) VALUES (NEW.id, NEW.description);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, description) VALUES ('delete', OLD.id, OLD.description);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF description ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, description) VALUES ('delete', OLD.id, OLD.description);
+            INSERT INTO tasks_fts (rowid, description) VALUES (NEW.id, NEW.description);
+        END''',
+        "INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')",
+    ]),
+    # Priority for weighted selection: 0 is normal, each step up doubles
+    # a task's chance and each step down halves it (task_selector.py).
+    (7, 'task priority', [
+        'ALTER TABLE tasks ADD COLUMN priority INTEGER NOT NULL DEFAULT 0',
+    ]),
+    # Change feed for other processes: each insert, edit, completion or
+    # delete gives the task the next sequence number, one row per task (a
+    # deleted task keeps its row, with no match in tasks). A reader that
+    # remembers the last seq it saw fetches just what changed since.
+    # AUTOINCREMENT keeps seq rising even when the newest row is replaced.
+    (8, 'task change sequence', [
+        '''CREATE TABLE IF NOT EXISTS task_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id INTEGER NOT NULL UNIQUE
+        )''',
+        '''CREATE TRIGGER IF NOT EXISTS task_changes_insert AFTER INSERT ON tasks
+        BEGIN
+            INSERT OR REPLACE INTO task_changes (task_id) VALUES (NEW.id);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS task_changes_update AFTER UPDATE OF description, completed ON tasks
+        BEGIN
+            INSERT OR REPLACE INTO task_changes (task_id) VALUES (NEW.id);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS task_changes_delete AFTER DELETE ON tasks
+        BEGIN
+            INSERT OR REPLACE INTO task_changes (task_id) VALUES (OLD.id);
+        END''',
+    ]),
+    # Sync between replicas (sync.py). Each change now records when it was
+    # made, and which replica made it when it arrived through a pull (NULL
+    # for local edits), for last-writer-wins. Tasks from older versions get
+    # a change row so a first push carries them. A local task is known to
+    # other replicas as '<replica>:<id>'; sync_tasks maps the tasks that came
+    # from elsewhere to their local ids, so local writes pay nothing extra.
+    (9, 'replica sync', [
+        'ALTER TABLE task_changes ADD COLUMN changed_at INTEGER',
+        'ALTER TABLE task_changes ADD COLUMN replica TEXT',
+        'DROP TRIGGER IF EXISTS task_changes_insert',
+        'DROP TRIGGER IF EXISTS task_changes_update',
+        'DROP TRIGGER IF EXISTS task_changes_delete',
+        f'''CREATE TRIGGER task_changes_insert AFTER INSERT ON tasks
+        BEGIN
+            INSERT OR REPLACE INTO task_changes (task_id, changed_at) VALUES (NEW.id, {SQL_NOW_MS});
+        END''',
+        f'''CREATE TRIGGER task_changes_update AFTER UPDATE OF description, completed ON tasks
+        BEGIN
+            INSERT OR REPLACE INTO task_changes (task_id, changed_at) VALUES (NEW.id, {SQL_NOW_MS});
+        END''',
+        f'''CREATE TRIGGER task_changes_delete AFTER DELETE ON tasks
+        BEGIN
+            INSERT OR REPLACE INTO task_changes (task_id, changed_at) VALUES (OLD.id, {SQL_NOW_MS});
+        END''',
+        '''UPDATE task_changes SET changed_at = IFNULL(
+            (SELECT COALESCE(completed_at, created_at) FROM tasks WHERE id = task_id), 0)''',
+        '''INSERT INTO task_changes (task_id, changed_at)
+        SELECT id, COALESCE(completed_at, created_at, 0) FROM tasks
+        WHERE id NOT IN (SELECT task_id FROM task_changes) ORDER BY id''',
+        '''CREATE TABLE IF NOT EXISTS sync_tasks (
+            task_id INTEGER PRIMARY KEY,
+            uid TEXT NOT NULL UNIQUE
+        )''',
+        # replica is this database's id; pushed_seq the last change pushed.
+        '''CREATE TABLE IF NOT EXISTS sync_state (
+            name TEXT PRIMARY KEY,
+            value
+        )''',
+        "INSERT OR IGNORE INTO sync_state VALUES ('replica', lower(hex(randomblob(8))))",
+        "INSERT OR IGNORE INTO sync_state VALUES ('pushed_seq', 0)",
+        # The last change pulled from each other replica.
+        '''CREATE TABLE IF NOT EXISTS sync_peers (
+            replica TEXT PRIMARY KEY,
+            pulled_seq INTEGER NOT NULL
+        )''',
+    ]),
+    # Completed tasks past a certain age move here (archive.py), keeping
+    # tasks, its indexes and tasks_fts down to the working set. Same ids and
+    # columns as tasks, with its own full-text index for searches that ask
+    # for archived tasks too.
+    (10, 'task archive', [
+        '''CREATE TABLE IF NOT EXISTS tasks_archive (
+            id INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            completed INTEGER NOT NULL,
+            created_at INTEGER,
+            completed_at INTEGER,
+            priority INTEGER NOT NULL DEFAULT 0,
+            archived_at INTEGER NOT NULL
+        )''',
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS tasks_archive_fts USING fts5(
+            description, content='tasks_archive', content_rowid='id', prefix='2 3'
+        )''',
+        '''CREATE TRIGGER IF NOT EXISTS tasks_archive_fts_insert AFTER INSERT ON tasks_archive
+        BEGIN
+            INSERT INTO tasks_archive_fts (rowid, description) VALUES (NEW.id, NEW.description);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS tasks_archive_fts_delete AFTER DELETE ON tasks_archive
+        BEGIN
+            INSERT INTO tasks_archive_fts (tasks_archive_fts, rowid, description)
+            VALUES ('delete', OLD.id, OLD.description);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS tasks_archive_fts_update AFTER UPDATE OF description ON tasks_archive
+        BEGIN
+            INSERT INTO tasks_archive_fts (tasks_archive_fts, rowid, description)
+            VALUES ('delete', OLD.id, OLD.description);
+            INSERT INTO tasks_archive_fts (rowid, description) VALUES (NEW.id, NEW.description);
+        END''',
+    ]),
+    # Idempotency keys for adds that callers may repeat after a failure
+    # they could not see the outcome of (TaskStore.add_keyed_task).
+    (11, 'command keys', [
+        '''CREATE TABLE IF NOT EXISTS command_keys (
+            key TEXT PRIMARY KEY,
+            task_id INTEGER NOT NULL,
+            created_at INTEGER NOT NULL
+        )''',
+    ]),
+    # Tags as in the mobile app, and dependencies: a task_deps row says
+    # task_id waits for depends_on. blockers counts a task's incomplete
+    # prerequisites and the triggers keep it current, so completing,
+    # reopening or deleting a task touches only the tasks that wait for it,
+    # through idx_task_deps_depends_on. task_pool now holds only ready tasks
+    # (incomplete, no blockers), so random picks skip blocked ones for free.
+    # Archiving keeps a task's tags and edges (an archived task is complete
+    # and blocks nothing); they go when it is deleted for good.
+    (12, 'tags and task dependencies', [
+        '''CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            color INTEGER NOT NULL,
+            created_at INTEGER NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS task_tags (
+            task_id INTEGER NOT NULL,
+            tag_id INTEGER NOT NULL,
+            PRIMARY KEY (task_id, tag_id)
+        ) WITHOUT ROWID''',
+        'CREATE INDEX IF NOT EXISTS idx_task_tags_tag ON task_tags (tag_id, task_id)',
+        '''CREATE TABLE IF NOT EXISTS task_deps (
+            task_id INTEGER NOT NULL,
+            depends_on INTEGER NOT NULL,
+            PRIMARY KEY (task_id, depends_on)
+        ) WITHOUT ROWID''',
+        'CREATE INDEX IF NOT EXISTS idx_task_deps_depends_on ON task_deps (depends_on, task_id)',
+        'ALTER TABLE tasks ADD COLUMN blockers INTEGER NOT NULL DEFAULT 0',
+        'CREATE INDEX IF NOT EXISTS idx_tasks_ready ON tasks (id) WHERE completed = 0 AND blockers = 0',
+        '''CREATE TRIGGER IF NOT EXISTS task_deps_add AFTER INSERT ON task_deps
+        WHEN EXISTS (SELECT 1 FROM tasks WHERE id = NEW.depends_on AND completed = 0)
+        BEGIN
+            UPDATE tasks SET blockers = blockers + 1 WHERE id = NEW.task_id;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS task_deps_remove AFTER DELETE ON task_deps
+        WHEN EXISTS (SELECT 1 FROM tasks WHERE id = OLD.depends_on AND completed = 0)
+        BEGIN
+            UPDATE tasks SET blockers = blockers - 1 WHERE id = OLD.task_id;
+        END''',
+        # The WHEN clauses keep tasks without edges or tags, nearly all of
+        # them in bulk imports and deletes, down to one index probe.
+        '''CREATE TRIGGER IF NOT EXISTS task_deps_complete AFTER UPDATE OF completed ON tasks
+        WHEN OLD.completed = 0 AND NEW.completed != 0
+            AND EXISTS (SELECT 1 FROM task_deps WHERE depends_on = NEW.id)
+        BEGIN
+            UPDATE tasks SET blockers = blockers - 1
+            WHERE id IN (SELECT task_id FROM task_deps WHERE depends_on = NEW.id);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS task_deps_reopen AFTER UPDATE OF completed ON tasks
+        WHEN OLD.completed != 0 AND NEW.completed = 0
+            AND EXISTS (SELECT 1 FROM task_deps WHERE depends_on = NEW.id)
+        BEGIN
+            UPDATE tasks SET blockers = blockers + 1
+            WHERE id IN (SELECT task_id FROM task_deps WHERE depends_on = NEW.id);
+        END''',
+        # Only a task coming back from the archive can have edges already.
+        '''CREATE TRIGGER IF NOT EXISTS task_deps_insert AFTER INSERT ON tasks
+        WHEN NEW.completed = 0 AND EXISTS (SELECT 1 FROM task_deps WHERE depends_on = NEW.id)
+        BEGIN
+            UPDATE tasks SET blockers = blockers + 1
+            WHERE id IN (SELECT task_id FROM task_deps WHERE depends_on = NEW.id);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS task_deps_delete AFTER DELETE ON tasks
+        WHEN EXISTS (SELECT 1 FROM task_deps WHERE task_id = OLD.id)
+            OR EXISTS (SELECT 1 FROM task_deps WHERE depends_on = OLD.id)
+            OR EXISTS (SELECT 1 FROM task_tags WHERE task_id = OLD.id)
+        BEGIN
+            UPDATE tasks SET blockers = blockers - 1
+            WHERE OLD.completed = 0 AND id IN (SELECT task_id FROM task_deps WHERE depends_on = OLD.id);
+            DELETE FROM task_deps WHERE task_id = OLD.id
+                AND NOT EXISTS (SELECT 1 FROM tasks_archive WHERE id = OLD.id);
+            DELETE FROM task_deps WHERE depends_on = OLD.id
+                AND NOT EXISTS (SELECT 1 FROM tasks_archive WHERE id = OLD.id);
+            DELETE FROM task_tags WHERE task_id = OLD.id
+                AND NOT EXISTS (SELECT 1 FROM tasks_archive WHERE id = OLD.id);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS tasks_archive_deps_delete AFTER DELETE ON tasks_archive
+        WHEN NOT EXISTS (SELECT 1 FROM tasks WHERE id = OLD.id)
+        BEGIN
+            DELETE FROM task_deps WHERE task_id = OLD.id;
+            DELETE FROM task_deps WHERE depends_on = OLD.id;
+            DELETE FROM task_tags WHERE task_id = OLD.id;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS tags_delete AFTER DELETE ON tags
+        BEGIN
+            DELETE FROM task_tags WHERE tag_id = OLD.id;
+        END''',
+        # The pool follows blockers: a task leaves it when it gets its first
+        # incomplete prerequisite and comes back when the last one is done.
+        'DROP TRIGGER IF EXISTS task_pool_reopen',
+        '''CREATE TRIGGER task_pool_reopen AFTER UPDATE OF completed ON tasks
+        WHEN OLD.completed != 0 AND NEW.completed = 0 AND NEW.blockers = 0
+        BEGIN
+            INSERT INTO task_pool (task_id) VALUES (NEW.id);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS task_pool_block AFTER UPDATE OF blockers ON tasks
+        WHEN OLD.blockers = 0 AND NEW.blockers != 0 AND NEW.completed = 0
+            AND EXISTS (SELECT 1 FROM task_pool WHERE task_id = OLD.id)
+        BEGIN
+            UPDATE task_pool SET task_id = (SELECT task_id FROM task_pool ORDER BY slot DESC LIMIT 1)
+            WHERE task_id = OLD.id;
+            DELETE FROM task_pool WHERE slot = (SELECT MAX(slot) FROM task_pool);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS task_pool_unblock AFTER UPDATE OF blockers ON tasks
+        WHEN OLD.blockers != 0 AND NEW.blockers = 0 AND NEW.completed = 0
+        BEGIN
+            INSERT INTO task_pool (task_id) VALUES (NEW.id);
+        END''',
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn):
+    """Apply any pending migrations and return the resulting schema version.
+
+    conn must be in autocommit mode (isolation_level=None). The version is
+    re-read under the write lock so two processes starting together do not
+    both run the same migration.
+    """
+    if schema_version(conn) >= SCHEMA_VERSION:
+        return SCHEMA_VERSION
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        version = schema_version(conn)
+        for target, _name, statements in MIGRATIONS:
+            if target <= version:
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {target}')
+            version = target
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    return version
+
+
+def query_plan(conn, sql, params=()):
+    return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+def check_query_plans(conn, queries):
+    """Return (name, plan) for every query whose plan misses its index.
+
+    queries holds (name, sql, params, expected) tuples, where expected is a
+    substring that must appear in one step of the plan.
+    """
+    failures = []
+    for name, sql, params, expected in queries:
+        plan = query_plan(conn, sql, params)
+        if not any(expected in step for step in plan):
+            failures.append((name, plan))
+    return failures
+
+
+def main():
+    from task_store import HOT_QUERIES
+
+    db_name = sys.argv[1] if len(sys.argv) > 1 else 'tasks.db'
+    conn = sqlite3.connect(db_name, isolation_level=None)
+    before = schema_version(conn)
+    after = migrate(conn)
+    print(f'{db_name}: schema version {before} -> {after}')
+    for name, sql, params, _expected in HOT_QUERIES:
+        print(f'  {name}: {"; ".join(query_plan(conn, sql, params))}')
+    failures = check_query_plans(conn, HOT_QUERIES)
+    for name, plan in failures:
+        print(f'  FAIL {name} does not use its index: {plan}')
+    conn.close()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
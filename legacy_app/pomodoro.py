@@ -1,12 +1,11 @@
-import time
+from timer_engine import BREAK, PomodoroListener, TimerEngine, run_pomodoro
 
 WORK_MINUTES = 25
 BREAK_MINUTES = 5
 
-while True:
-    for minute in range(WORK_MINUTES):
-        print(f"Work! ({minute + 1}/{WORK_MINUTES})")
-        time.sleep(60)
-    for minute in range(BREAK_MINUTES):
-        print(f"Play! ({minute + 1}/{BREAK_MINUTES})")
-        time.sleep(60) 
\ No newline at end of file
+class StepPrinter(PomodoroListener):
+    def step(self, phase, index, count, task):
+        label = "Play!" if phase == BREAK else "Work!"
+        print(f"{label} ({index + 1}/{count})")
+
+run_pomodoro(TimerEngine(), WORK_MINUTES * 60, BREAK_MINUTES * 60, lambda: None, StepPrinter())
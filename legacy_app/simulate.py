@@ -0,0 +1,87 @@
+"""Fast-forward simulation of pomodoro cycles on a virtual clock.
+
+Runs the same PomodoroTimer the GUI uses, headless, against a VirtualClock:
+every work session picks a task from the database, every session is
+recorded with its rollups, and some sessions end by completing their task,
+so thousands of cycles of selection and DB writes run in about a second of
+wall time.
+
+Usage: python simulate.py [--cycles 5000] [--tasks 10000] [--complete-ratio 0.2] [--db PATH]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from clock import VirtualClock
+from focus_stats import SessionRecorder, print_stats
+from task_store import TaskStore
+from timer_engine import WORK, MultiListener, PomodoroListener, PomodoroTimer
+
+WORK_SECONDS = 25 * 60
+BREAK_SECONDS = 5 * 60
+
+
+class SimulationListener(PomodoroListener):
+    def __init__(self, store, complete_ratio, rng):
+        self.store = store
+        self.complete_ratio = complete_ratio
+        self.rng = rng
+        self.sessions = 0
+        self.idle_sessions = 0
+        self.completed = 0
+
+    def phase_finished(self, phase, task):
+        if phase != WORK:
+            return
+        self.sessions += 1
+        if task is None:
+            self.idle_sessions += 1
+        elif self.rng.random() < self.complete_ratio:
+            self.completed += self.store.complete_task(task[0])
+
+
+def simulate(store, cycles, complete_ratio=0.2, clock=None, seed=0):
+    """Run cycles work/break cycles headless and return the listener's tallies."""
+    clock = clock or VirtualClock()
+    listener = SimulationListener(store, complete_ratio, random.Random(seed))
+    # Session timestamps advance with simulated time from the real present.
+    base = time.time() - clock.now()
+    recorder = SessionRecorder(store, wall_time=lambda: base + clock.now())
+    timer = PomodoroTimer(store.get_random_task, WORK_SECONDS, BREAK_SECONDS,
+                          tick_seconds=60, clock=clock)
+    timer.start(MultiListener(listener, recorder), cycles=cycles, background=False)
+    return listener
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cycles', type=int, default=5000)
+    parser.add_argument('--tasks', type=int, default=10_000, help='tasks to seed a fresh database with')
+    parser.add_argument('--complete-ratio', type=float, default=0.2)
+    parser.add_argument('--db', help='simulate against an existing database (it will be modified)')
+    parser.add_argument('--stats', action='store_true', help='print the focus report afterwards')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.db:
+            store = TaskStore(args.db)
+        else:
+            from bench_utils import build_db
+            store = build_db(os.path.join(tmp, 'tasks.db'), args.tasks, completed_ratio=0)
+        clock = VirtualClock()
+        started = time.perf_counter()
+        result = simulate(store, args.cycles, args.complete_ratio, clock)
+        elapsed = time.perf_counter() - started
+        if args.stats:
+            print_stats(store, days=7)
+        store.close()
+
+    print(f'{args.cycles} cycles ({clock.now() / 3600:,.0f} simulated hours) in {elapsed * 1000:.0f} ms: '
+          f'{result.sessions} work sessions, {result.completed} tasks completed, '
+          f'{result.idle_sessions} sessions with no task')
+
+
+if __name__ == '__main__':
+    main()
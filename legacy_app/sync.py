@@ -0,0 +1,168 @@
+"""Delta sync between task databases through a shared directory.
+
+Each replica pushes the changes made on it since its last push to
+DIR/<replica>/<first seq>-<last seq>.jsonl, one line per changed task with
+the task's current state, read straight from task_changes. A pull reads
+only the files of other replicas newer than the last one it applied, so
+both directions cost what changed, not the size of the database.
+
+Conflicts are last-writer-wins on the change time, ties broken by replica
+id, so every replica settles on the same state whatever order the files
+are pulled in. Changes applied by a pull are not pushed again; each
+replica's own files carry its changes to every peer. Change times come
+from each machine's clock, so a clock that runs ahead wins more often.
+"""
+import json
+import os
+import re
+
+import metrics
+
+FILE_NAME = re.compile(r'^(\d+)-(\d+)\.jsonl$')
+
+REPLICA = "SELECT value FROM sync_state WHERE name = 'replica'"
+PUSHED_SEQ = "SELECT value FROM sync_state WHERE name = 'pushed_seq'"
+SET_PUSHED_SEQ = "UPDATE sync_state SET value = ? WHERE name = 'pushed_seq'"
+PULLED_SEQ = 'SELECT pulled_seq FROM sync_peers WHERE replica = ?'
+SET_PULLED_SEQ = '''INSERT INTO sync_peers (replica, pulled_seq) VALUES (?, ?)
+ON CONFLICT (replica) DO UPDATE SET pulled_seq = excluded.pulled_seq'''
+FIND_UID = 'SELECT task_id FROM sync_tasks WHERE uid = ?'
+ADD_UID = 'INSERT INTO sync_tasks (task_id, uid) VALUES (?, ?)'
+TASK_VERSION = 'SELECT changed_at, replica FROM task_changes WHERE task_id = ?'
+TASK_EXISTS = 'SELECT 1 FROM tasks WHERE id = ?'
+ARCHIVED_EXISTS = 'SELECT 1 FROM tasks_archive WHERE id = ?'
+UPDATE_ARCHIVED = '''UPDATE tasks_archive SET description = ?, completed = ?, created_at = ?, completed_at = ?
+WHERE id = ?'''
+DELETE_ARCHIVED = 'DELETE FROM tasks_archive WHERE id = ?'
+UPDATE_TASK = 'UPDATE tasks SET description = ?, completed = ?, created_at = ?, completed_at = ? WHERE id = ?'
+INSERT_TASK = 'INSERT INTO tasks (id, description, completed, created_at, completed_at) VALUES (?, ?, ?, ?, ?)'
+DELETE_TASK = 'DELETE FROM tasks WHERE id = ?'
+# Replaces the row the triggers just wrote: same task, the remote version.
+SET_VERSION = '''INSERT INTO task_changes (task_id, changed_at, replica) VALUES (?, ?, ?)
+ON CONFLICT (task_id) DO UPDATE SET changed_at = excluded.changed_at, replica = excluded.replica'''
+
+
+def replica_id(store):
+    return store.connection().execute(REPLICA).fetchone()[0]
+
+
+@metrics.timed('sync_push')
+def push(store, directory):
+    """Write the local changes since the last push; return (changes, file written or None)."""
+    conn = store.connection()
+    replica = replica_id(store)
+    after = conn.execute(PUSHED_SEQ).fetchone()[0]
+    upto = store.change_seq()
+    if upto <= after:
+        return 0, None
+    folder = os.path.join(directory, replica)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f'{after + 1:012d}-{upto:012d}.jsonl')
+    temp = os.path.join(folder, f'.{replica}.tmp')
+    count = 0
+    with open(temp, 'w', encoding='utf-8') as out:
+        for seq, task_id, changed_at, uid, description, completed, created_at, completed_at in \
+                store.local_changes(after, upto):
+            change = {'seq': seq, 'uid': uid or f'{replica}:{task_id}', 'changedAt': changed_at or 0,
+                      'deleted': description is None}
+            if description is not None:
+                change.update(description=description, completed=bool(completed),
+                              createdAt=created_at, completedAt=completed_at)
+            out.write(json.dumps(change, ensure_ascii=False) + '\n')
+            count += 1
+    if count:
+        os.replace(temp, path)
+    else:
+        os.remove(temp)
+        path = None
+    # Only after the file is in place: a failed push is simply redone.
+    with store.transaction() as conn:
+        conn.execute(SET_PUSHED_SEQ, (upto,))
+    return count, path
+
+
+def pending_files(directory, replica, pulled_seq):
+    """Return (last seq, path) for the replica's files with changes after pulled_seq, in order."""
+    folder = os.path.join(directory, replica)
+    files = []
+    for name in os.listdir(folder):
+        match = FILE_NAME.match(name)
+        if match and int(match.group(2)) > pulled_seq:
+            files.append((int(match.group(1)), int(match.group(2)), os.path.join(folder, name)))
+    return [(last, path) for _first, last, path in sorted(files)]
+
+
+@metrics.timed('sync_pull')
+def pull(store, directory):
+    """Apply other replicas' changes; return (applied, ignored as older, files read).
+
+    Each file is applied in its own transaction together with the record
+    of how far that replica has been pulled, so an interrupted pull
+    resumes where it stopped.
+    """
+    conn = store.connection()
+    own = replica_id(store)
+    applied = ignored = files = 0
+    if not os.path.isdir(directory):
+        raise FileNotFoundError(f'no sync directory {directory}')
+    for replica in sorted(os.listdir(directory)):
+        if replica == own or not os.path.isdir(os.path.join(directory, replica)):
+            continue
+        row = conn.execute(PULLED_SEQ, (replica,)).fetchone()
+        pulled_seq = row[0] if row else 0
+        for last, path in pending_files(directory, replica, pulled_seq):
+            with store.transaction() as conn, open(path, encoding='utf-8') as lines:
+                for number, line in enumerate(lines, 1):
+                    try:
+                        change = json.loads(line)
+                        if change['seq'] <= pulled_seq:
+                            continue
+                        if apply_change(conn, own, replica, change):
+                            applied += 1
+                        else:
+                            ignored += 1
+                    except (KeyError, TypeError, ValueError) as e:
+                        raise ValueError(f'{path}:{number}: bad change ({e})') from None
+                conn.execute(SET_PULLED_SEQ, (replica, last))
+            pulled_seq = last
+            files += 1
+    return applied, ignored, files
+
+
+def apply_change(conn, own, replica, change):
+    """Apply one remote change unless the local version is newer; return whether it was applied."""
+    uid = change['uid']
+    if uid.startswith(own + ':'):
+        task_id = int(uid[len(own) + 1:])
+    else:
+        row = conn.execute(FIND_UID, (uid,)).fetchone()
+        task_id = row[0] if row else None
+    version = (change['changedAt'], replica)
+    if task_id is not None:
+        row = conn.execute(TASK_VERSION, (task_id,)).fetchone()
+        if row and version <= (row[0] or 0, row[1] or own):
+            return False
+    exists = task_id is not None and conn.execute(TASK_EXISTS, (task_id,)).fetchone()
+    archived = task_id is not None and not exists and conn.execute(ARCHIVED_EXISTS, (task_id,)).fetchone()
+    if change['deleted']:
+        if task_id is None:
+            return False  # Created and deleted there before we ever saw it.
+        if exists:
+            conn.execute(DELETE_TASK, (task_id,))
+        elif archived:
+            conn.execute(DELETE_ARCHIVED, (task_id,))
+    else:
+        values = (change['description'], int(change['completed']), change['createdAt'], change['completedAt'])
+        if exists:
+            conn.execute(UPDATE_TASK, values + (task_id,))
+        elif archived and change['completed']:
+            conn.execute(UPDATE_ARCHIVED, values + (task_id,))
+        elif task_id is not None:
+            # Deleted here, or archived here and reopened there.
+            conn.execute(DELETE_ARCHIVED, (task_id,))
+            conn.execute(INSERT_TASK, (task_id,) + values)
+        else:
+            task_id = conn.execute(INSERT_TASK, (None,) + values).lastrowid
+            conn.execute(ADD_UID, (task_id, uid))
+    conn.execute(SET_VERSION, (task_id, change['changedAt'], replica))
+    return True
@@ -0,0 +1,330 @@
+import bisect
+import itertools
+import queue
+import sqlite3
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk
+
+from task_model import Task
+
+PAGE_SIZE = 100
+MAX_PAGES = 3
+# Fraction of the scroll range from either end at which the next page loads.
+EDGE = 0.05
+# Typing pause before a filter query runs.
+SEARCH_DELAY_MS = 200
+
+
+# Row ids of tasks shown before their INSERT has committed.
+PENDING = 'pending-'
+_pending_ids = itertools.count(1)
+
+
+def status_text(completed):
+    return "Completed" if completed else "Incomplete"
+
+
+class TaskListView:
+    """Task Manager Treeview that holds only a window of the tasks table.
+
+    Pages are fetched by id (keyset) as the user scrolls towards either end,
+    and pages scrolled out of the MAX_PAGES window are dropped, so the number
+    of rows in the widget stays bounded however large the table is. Changes
+    made from the Task Manager, and those a ChangeWatcher reports from other
+    processes (apply_changes), are applied as single-row edits rather than
+    a reload.
+
+    search() filters the list through the full-text index. Queries run on a
+    worker thread after a short typing pause, and results that arrive for
+    an outdated query are dropped. on_update(view) is called on the Tk
+    thread whenever rows are reloaded or changes applied.
+    """
+
+    def __init__(self, parent, store, page_size=PAGE_SIZE, max_pages=MAX_PAGES, on_update=None):
+        self.store = store
+        self.page_size = page_size
+        self.max_rows = page_size * max_pages
+        self.on_update = on_update
+        self.more_before = False
+        self.more_after = False
+        self.last_refresh_ms = 0.0
+        self.query = ''
+        self._loading = False
+        self._search_job = None
+        self._search_seq = 0
+        self._searches = None
+        self._pending = {}
+
+        columns = ('ID', 'Description', 'Status')
+        self.tree = ttk.Treeview(parent, columns=columns, show='headings', height=15, selectmode='extended')
+        self.tree.heading('ID', text='ID')
+        self.tree.heading('Description', text='Description')
+        self.tree.heading('Status', text='Status')
+        self.tree.column('ID', width=50)
+        self.tree.column('Description', width=300)
+        self.tree.column('Status', width=100)
+        self.tree.tag_configure('completed', foreground='gray')
+        self.tree.tag_configure('pending', foreground='gray')
+
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.bind('<Destroy>', lambda event: self.close(), add='+')
+        self.tree.bind('<Control-a>', lambda event: self.tree.selection_set(self.tree.get_children()))
+
+    def _insert(self, index, row):
+        tid, desc, comp = row
+        self.tree.insert('', index, iid=str(tid), values=(tid, desc, status_text(comp)),
+                         tags=('completed',) if comp else ())
+
+    def refresh(self):
+        """Reload the current window (or rerun the filter) and time it."""
+        if self.query:
+            self._start_search(self.query)
+            return
+        start = time.perf_counter()
+        children = self.tree.get_children()
+        loaded = [iid for iid in children if not iid.startswith(PENDING)]
+        after = int(loaded[0]) - 1 if loaded else 0
+        count = max(len(loaded), self.page_size)
+        rows = list(self.store.iter_tasks('all', after, count))
+        if children:
+            self.tree.delete(*children)
+        for row in rows:
+            self._insert(tk.END, row)
+        self.more_before = bool(self.store.tasks_before(after + 1, 1))
+        self.more_after = len(rows) == count
+        self.last_refresh_ms = (time.perf_counter() - start) * 1000
+        if self.on_update:
+            self.on_update(self)
+
+    def search(self, text):
+        """Show the tasks matching text, or the whole list again when text is blank."""
+        if self._search_job is not None:
+            self.tree.after_cancel(self._search_job)
+        self._search_job = self.tree.after(SEARCH_DELAY_MS, self._start_search, text.strip())
+
+    def _start_search(self, text):
+        self._search_job = None
+        self._search_seq += 1
+        if not text:
+            if self.query:
+                self.query = ''
+                self.tree.delete(*self.tree.get_children())
+                self.refresh()
+            return
+        if self._searches is None:
+            self._searches = queue.SimpleQueue()
+            threading.Thread(target=self._search_worker, args=(self._searches,), daemon=True).start()
+        self._searches.put((self._search_seq, text))
+
+    def _search_worker(self, searches):
+        # Runs on its own thread with its own connection; a None request
+        # (from close()) ends it.
+        request = searches.get()
+        while request is not None:
+            # Skip to the newest query if several queued up meanwhile.
+            while not searches.empty():
+                request = searches.get()
+                if request is None:
+                    break
+            if request is None:
+                break
+            seq, text = request
+            start = time.perf_counter()
+            try:
+                rows = self.store.search(text, limit=self.max_rows)
+            except sqlite3.Error:
+                rows = []
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            try:
+                self.tree.after(0, self._show_results, seq, text, rows, elapsed_ms)
+            except (tk.TclError, RuntimeError):
+                break
+            request = searches.get()
+        self.store.close_connection()
+
+    def _show_results(self, seq, text, rows, elapsed_ms):
+        if seq != self._search_seq:
+            return
+        self.query = text
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        for row in rows:
+            self._insert(tk.END, row)
+        self.more_before = self.more_after = False
+        self.last_refresh_ms = elapsed_ms
+        if self.on_update:
+            self.on_update(self)
+
+    def close(self):
+        """Stop the search worker; called automatically when the tree is destroyed."""
+        if self._search_job is not None:
+            self.tree.after_cancel(self._search_job)
+            self._search_job = None
+        if self._searches is not None:
+            self._searches.put(None)
+            self._searches = None
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self._loading:
+            return
+        if float(last) >= 1 - EDGE and self.more_after:
+            self._loading = True
+            self.tree.after_idle(self._load_next)
+        elif float(first) <= EDGE and self.more_before:
+            self._loading = True
+            self.tree.after_idle(self._load_previous)
+
+    def _load_next(self):
+        try:
+            children = self.tree.get_children()
+            after = int(children[-1]) if children else 0
+            rows = list(self.store.iter_tasks('all', after, self.page_size))
+            self.more_after = len(rows) == self.page_size
+            for row in rows:
+                self._insert(tk.END, row)
+            overflow = len(children) + len(rows) - self.max_rows
+            if overflow > 0:
+                self.tree.delete(*children[:overflow])
+                self.more_before = True
+                # Keep the row the user was looking at in view.
+                self.tree.see(children[-1])
+        finally:
+            self._loading = False
+
+    def _load_previous(self):
+        try:
+            children = self.tree.get_children()
+            if not children:
+                return
+            rows = self.store.tasks_before(int(children[0]), self.page_size)
+            self.more_before = len(rows) == self.page_size
+            for index, row in enumerate(rows):
+                self._insert(index, row)
+            overflow = len(children) + len(rows) - self.max_rows
+            if overflow > 0:
+                self.tree.delete(*children[-overflow:])
+                self.more_after = True
+            self.tree.see(children[0])
+        finally:
+            self._loading = False
+
+    def selected_task(self):
+        """Return the Task for the first selected row, or None."""
+        selected = self.selected_tasks()
+        return selected[0] if selected else None
+
+    def selected_tasks(self):
+        """Return a Task for every selected row, in list order.
+
+        Rows for tasks that are still being added have no id yet and are skipped.
+        """
+        rows = []
+        for iid in self.tree.selection():
+            if iid.startswith(PENDING):
+                continue
+            tid, desc, status = self.tree.item(iid)['values']
+            rows.append(Task(int(tid), str(desc), status == "Completed"))
+        return rows
+
+    def mark_completed(self, *task_ids):
+        self._set_completed(True, task_ids)
+
+    def mark_incomplete(self, *task_ids):
+        self._set_completed(False, task_ids)
+
+    def _set_completed(self, completed, task_ids):
+        for task_id in task_ids:
+            iid = str(task_id)
+            if self.tree.exists(iid):
+                tid, desc, _status = self.tree.item(iid)['values']
+                self.tree.item(iid, values=(tid, desc, status_text(completed)),
+                               tags=('completed',) if completed else ())
+
+    def remove(self, *task_ids):
+        iids = [str(task_id) for task_id in task_ids if self.tree.exists(str(task_id))]
+        if iids:
+            self.tree.delete(*iids)
+
+    def restore(self, rows):
+        """Insert (id, description, completed) rows or Tasks, e.g. ones just removed, in id order.
+
+        Rows that fall outside the loaded window are left for scrolling to load.
+        """
+        for row in sorted(tuple(row) for row in rows):
+            iid = str(row[0])
+            if self.tree.exists(iid):
+                continue
+            ids = [int(child) for child in self.tree.get_children() if not child.startswith(PENDING)]
+            index = bisect.bisect(ids, row[0])
+            if (index == 0 and self.more_before) or (index == len(ids) and self.more_after):
+                continue
+            self._insert(index, row)
+
+    def apply_changes(self, changes):
+        """Apply (id, description, completed) rows from ChangeWatcher to the loaded window.
+
+        description None means the task was deleted; changes None means too
+        much changed and the window is reloaded. With a filter active, new
+        or renamed tasks rerun the search since only it knows what matches.
+        """
+        if changes is None:
+            self.refresh()
+            return
+        start = time.perf_counter()
+        research = False
+        for task_id, description, completed in changes:
+            iid = str(task_id)
+            if description is None:
+                self.remove(task_id)
+            elif self.tree.exists(iid):
+                shown = self.tree.item(iid)['values']
+                research = research or str(shown[1]) != description
+                self.tree.item(iid, values=(task_id, description, status_text(completed)),
+                               tags=('completed',) if completed else ())
+            elif self.query:
+                research = True
+            else:
+                self.restore([(task_id, description, completed)])
+        if research and self.query:
+            self._start_search(self.query)
+            return
+        self.last_refresh_ms = (time.perf_counter() - start) * 1000
+        if self.on_update:
+            self.on_update(self)
+
+    def add_pending(self, description):
+        """Show a task that is still being written; returns its placeholder row."""
+        iid = f'{PENDING}{next(_pending_ids)}'
+        self._pending[iid] = description
+        if not self.query and not self.more_after:
+            self.tree.insert('', tk.END, iid=iid, values=('…', description, 'Adding…'), tags=('pending',))
+            self.tree.see(iid)
+        return iid
+
+    def resolve_pending(self, iid, task_id=None):
+        """Replace a placeholder with the task once written, or drop it (task_id None)."""
+        description = self._pending.pop(iid, None)
+        if not self.tree.exists(iid):
+            # Dropped by a reload meanwhile; show the task like any new one.
+            if task_id is not None:
+                self.append(task_id, description)
+            return
+        index = self.tree.index(iid)
+        self.tree.delete(iid)
+        if task_id is not None and not self.tree.exists(str(task_id)):
+            self._insert(index, (task_id, description, False))
+
+    def append(self, task_id, description, completed=False):
+        """Show a newly added task if the window already reaches the end."""
+        if self.query or self.more_after or self.tree.exists(str(task_id)):
+            return
+        self._insert(tk.END, (task_id, description, completed))
+        self.tree.see(str(task_id))
@@ -0,0 +1,26 @@
+"""A slotted Task for code that holds tasks in memory.
+
+Nothing in the app keeps the whole task table in memory: listings stream
+rows and the Task Manager holds a bounded window. The weighted selector's
+per-task state lives in arrays (see task_selector.py).
+"""
+
+
+class Task:
+    """One task; unpacks like the (id, description, completed) row tuples."""
+
+    __slots__ = ('id', 'description', 'completed')
+
+    def __init__(self, id, description, completed=False):
+        self.id = id
+        self.description = description
+        self.completed = bool(completed)
+
+    def __iter__(self):
+        return iter((self.id, self.description, self.completed))
+
+    def __eq__(self, other):
+        return tuple(self) == tuple(other)
+
+    def __repr__(self):
+        return f'Task({self.id!r}, {self.description!r}, completed={self.completed})'
@@ -0,0 +1,232 @@
+"""Weighted task selection backed by a Fenwick (binary indexed) tree.
+
+Each ready task (incomplete, not waiting for another task) gets a weight
+from its priority, how long it has sat untouched and whether it was
+worked on recently. Picking a task and
+changing one task's weight both take O(log n), and the tree is rebuilt in
+one pass over the incomplete tasks when the database changes underneath.
+"""
+import bisect
+import heapq
+import time
+from array import array
+
+import metrics
+from timer_engine import WORK, PomodoroListener
+
+MIN_PRIORITY = -2
+MAX_PRIORITY = 3
+# A task untouched for a week is twice as likely as a fresh one, up to a
+# limit, so old tasks surface without drowning out everything else.
+STALE_DAYS = 7
+MAX_STALE_DAYS = 28
+# Tasks worked on in the last few hours are much less likely to come up again.
+RECENT_HOURS = 8
+RECENT_PENALTY = 0.2
+# Staleness is computed at build time, so rebuild at least this often.
+MAX_BUILD_AGE = 3600
+
+DAY_MS = 86_400_000
+HOUR_MS = 3_600_000
+
+# task_weight() for every ready task at once; computing it in SQL
+# roughly halves a rebuild over hundreds of thousands of tasks.
+WEIGHTS = f'''SELECT t.id,
+    (CASE MIN(MAX(t.priority, {MIN_PRIORITY}), {MAX_PRIORITY})
+        {' '.join(f'WHEN {p} THEN {2.0 ** p}' for p in range(MIN_PRIORITY, MAX_PRIORITY + 1))} END)
+    * (1 + MIN(MAX(:now - MAX(IFNULL(t.created_at, 0), IFNULL(s.last_worked_at, 0)), 0) / {DAY_MS}.0,
+               {MAX_STALE_DAYS}) / {STALE_DAYS}.0)
+    * (CASE WHEN s.last_worked_at > :recent THEN {RECENT_PENALTY} ELSE 1 END)
+FROM tasks t LEFT JOIN stats_task s ON s.task_id = t.id WHERE t.completed = 0 AND t.blockers = 0 ORDER BY t.id'''
+RECENTLY_WORKED = 'SELECT last_worked_at, task_id FROM stats_task WHERE last_worked_at > ?'
+TASK_INPUTS = '''SELECT t.completed OR t.blockers, t.priority, t.created_at, s.last_worked_at
+FROM tasks t LEFT JOIN stats_task s ON s.task_id = t.id WHERE t.id = ?'''
+READY_TASK = 'SELECT id, description FROM tasks WHERE id = ? AND completed = 0 AND blockers = 0'
+
+
+def task_weight(priority, created_at, last_worked_at, now_ms):
+    """Relative chance of picking a task; always positive."""
+    priority = min(max(priority or 0, MIN_PRIORITY), MAX_PRIORITY)
+    touched = max(created_at or 0, last_worked_at or 0)
+    idle_days = min(max(now_ms - touched, 0) / DAY_MS, MAX_STALE_DAYS)
+    weight = 2.0 ** priority * (1 + idle_days / STALE_DAYS)
+    if last_worked_at and now_ms - last_worked_at < RECENT_HOURS * HOUR_MS:
+        weight *= RECENT_PENALTY
+    return weight
+
+
+class FenwickTree:
+    """Prefix sums over a growable array of non-negative weights."""
+
+    def __init__(self, weights=()):
+        self.weights = array('d', weights)
+        tree = array('d', [0.0])
+        tree.extend(self.weights)
+        n = len(self.weights)
+        for i in range(1, n + 1):
+            parent = i + (i & -i)
+            if parent <= n:
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def __len__(self):
+        return len(self.weights)
+
+    def total(self):
+        return self.prefix(len(self.weights))
+
+    def prefix(self, count):
+        """Sum of the first count weights."""
+        tree = self._tree
+        total = 0.0
+        while count > 0:
+            total += tree[count]
+            count &= count - 1
+        return total
+
+    def set(self, index, weight):
+        delta = weight - self.weights[index]
+        self.weights[index] = weight
+        tree = self._tree
+        i = index + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def append(self, weight):
+        self.weights.append(weight)
+        i = len(self.weights)
+        # The new node covers weights (i - lowbit(i), i].
+        self._tree.append(weight + self.prefix(i - 1) - self.prefix(i - (i & -i)))
+        return i - 1
+
+    def find(self, target):
+        """Index of the weight whose cumulative range contains target (0 <= target < total)."""
+        tree = self._tree
+        n = len(tree) - 1
+        pos = 0
+        step = 1 << n.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= n and tree[nxt] <= target:
+                pos = nxt
+                target -= tree[nxt]
+            step >>= 1
+        return min(pos, n - 1)
+
+
+class WeightedSelector(PomodoroListener):
+    """Picks ready tasks with probability proportional to task_weight().
+
+    Use pick() as a pick_task function and add the selector as a listener,
+    so a finished or stopped work session lowers that task's weight right
+    away. The tree is rebuilt when another connection commits (PRAGMA
+    data_version), and at least every MAX_BUILD_AGE seconds. A pick that
+    lands on a task completed, deleted or blocked through this thread's
+    connection in the meantime drops it and draws again; tasks that became
+    ready that way join at the next rebuild.
+    """
+
+    def __init__(self, store, rng=None, wall_time=time.time):
+        self.store = store
+        self.rng = rng or store.rng
+        self.wall_time = wall_time
+        self.tree = None
+        # Ready task ids in ascending order, parallel to tree.weights;
+        # a binary search finds a task's slot without a per-task dict.
+        self.ids = array('q')
+        self.last_build_ms = 0.0
+        self._built_at = 0.0
+        self._version = None
+        self._expiries = []
+
+    def _now_ms(self):
+        return int(self.wall_time() * 1000)
+
+    @metrics.timed('selector_rebuild')
+    def rebuild(self):
+        start = time.perf_counter()
+        now = self._now_ms()
+        recent = now - RECENT_HOURS * HOUR_MS
+        conn = self.store.connection()
+        ids, weights = array('q'), array('d')
+        for task_id, weight in conn.execute(WEIGHTS, {'now': now, 'recent': recent}):
+            ids.append(task_id)
+            weights.append(weight)
+        expiries = [(worked_at + RECENT_HOURS * HOUR_MS, task_id)
+                    for worked_at, task_id in conn.execute(RECENTLY_WORKED, (recent,))]
+        heapq.heapify(expiries)
+        self.tree = FenwickTree(weights)
+        self.ids = ids
+        self._expiries = expiries
+        self._version = self.store.data_version()
+        self._built_at = now
+        self.last_build_ms = (time.perf_counter() - start) * 1000
+
+    def _set_weight(self, task_id, weight):
+        ids = self.ids
+        i = bisect.bisect_left(ids, task_id)
+        if i < len(ids) and ids[i] == task_id:
+            self.tree.set(i, weight)
+        elif weight <= 0:
+            return
+        elif i == len(ids):
+            # New tasks have the highest ids, so they go on the end.
+            self.tree.append(weight)
+            ids.append(task_id)
+        else:
+            # A reopened older task; rare enough to rebuild for.
+            self.tree = None
+
+    @metrics.timed('selector_refresh')
+    def refresh_task(self, task_id):
+        """Re-read one task and update its weight in O(log n)."""
+        if self.tree is None:
+            return
+        row = self.store.connection().execute(TASK_INPUTS, (task_id,)).fetchone()
+        if row is None or row[0]:
+            self._set_weight(task_id, 0.0)
+            return
+        _unready, priority, created_at, last_worked_at = row
+        now = self._now_ms()
+        self._set_weight(task_id, task_weight(priority, created_at, last_worked_at, now))
+        if last_worked_at and now - last_worked_at < RECENT_HOURS * HOUR_MS:
+            heapq.heappush(self._expiries, (last_worked_at + RECENT_HOURS * HOUR_MS, task_id))
+
+    def _expire_penalties(self, now):
+        while self._expiries and self._expiries[0][0] <= now:
+            _at, task_id = heapq.heappop(self._expiries)
+            self.refresh_task(task_id)
+
+    @metrics.timed('selector_pick')
+    def pick(self):
+        """Return (id, description) of a weighted random ready task, or None."""
+        now = self._now_ms()
+        if (self.tree is None or now - self._built_at > MAX_BUILD_AGE * 1000
+                or self.store.data_version() != self._version):
+            self.rebuild()
+        self._expire_penalties(now)
+        if self.tree is None:
+            self.rebuild()
+        conn = self.store.connection()
+        while True:
+            total = self.tree.total()
+            if total <= 0:
+                return None
+            i = self.tree.find(self.rng.random() * total)
+            if self.tree.weights[i] <= 0:
+                # Rounding in the prefix sums can land on an emptied slot.
+                self.tree = FenwickTree(self.tree.weights)
+                continue
+            row = conn.execute(READY_TASK, (self.ids[i],)).fetchone()
+            if row:
+                return row
+            self.tree.set(i, 0.0)
+
+    def phase_finished(self, phase, task):
+        if phase == WORK and task:
+            self.refresh_task(task[0])
+
+    def phase_stopped(self, phase, elapsed, task):
+        if phase == WORK and task:
+            self.refresh_task(task[0])
@@ -0,0 +1,719 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+from migrations import SCHEMA_VERSION, migrate, schema_version
+
+DB_NAME = 'tasks.db'
+
+# Contention: every connection waits up to BUSY_TIMEOUT_S for a lock inside
+# SQLite, and a write transaction that still cannot start is retried
+# WRITE_RETRIES times after a random pause of up to RETRY_BASE_S, doubling
+# each time, so processes that gave up together do not all come back
+# together. The worst case is about 11 s before DatabaseBusy is raised.
+BUSY_TIMEOUT_S = 2.0
+WRITE_RETRIES = 4
+RETRY_BASE_S = 0.05
+# SQLite's busy handler polls, it does not queue, and a writer that starts
+# its next transaction straight after committing takes the lock again
+# before any waiter wakes up. Loops that write in batches (import, archive)
+# pause this long after each commit so other writers get their turn.
+BATCH_PAUSE_S = 0.02
+
+# Statements are kept as module constants so every call hands sqlite3 the
+# exact same string and hits the connection's prepared-statement cache.
+INSERT_TASK = 'INSERT INTO tasks (description, created_at) VALUES (?, ?)'
+# Keys from `goaly.py add --key`: a repeated add returns the first task.
+KEYED_TASK = 'SELECT task_id FROM command_keys WHERE key = ?'
+ADD_KEY = 'INSERT INTO command_keys (key, task_id, created_at) VALUES (?, ?, ?)'
+IMPORT_TASK = 'INSERT INTO tasks (description, completed, created_at, completed_at) VALUES (?, ?, ?, ?)'
+# Keyset pages: each page is a short indexed query starting after the last
+# id seen, so listing never holds a cursor or a read snapshot open.
+PAGE_QUERIES = {
+    'all': 'SELECT id, description, completed FROM tasks WHERE id > ? ORDER BY id LIMIT ?',
+    'incomplete': 'SELECT id, description, completed FROM tasks WHERE completed = 0 AND id > ? ORDER BY id LIMIT ?',
+    'ready': '''SELECT id, description, completed FROM tasks WHERE completed = 0 AND blockers = 0 AND id > ?
+ORDER BY id LIMIT ?''',
+    'completed': 'SELECT id, description, completed FROM tasks WHERE completed != 0 AND id > ? ORDER BY id LIMIT ?',
+}
+# The same pages over tasks and tasks_archive together, merged in id order.
+# The archive only holds completed tasks.
+ARCHIVED_PAGE_QUERIES = {
+    'all': '''SELECT id, description, completed FROM tasks WHERE id > ?1
+UNION ALL SELECT id, description, completed FROM tasks_archive WHERE id > ?1 ORDER BY id LIMIT ?2''',
+    'incomplete': PAGE_QUERIES['incomplete'],
+    'ready': PAGE_QUERIES['ready'],
+    'completed': '''SELECT id, description, completed FROM tasks WHERE completed != 0 AND id > ?1
+UNION ALL SELECT id, description, completed FROM tasks_archive WHERE id > ?1 ORDER BY id LIMIT ?2''',
+}
+# Tasks with a tag, in id order; ?1 is the tag name.
+TAG_PAGE_TEMPLATE = '''SELECT t.id, t.description, t.completed FROM task_tags g JOIN tasks t ON t.id = g.task_id
+WHERE g.tag_id = (SELECT id FROM tags WHERE name = ?1) AND g.task_id > ?2{filter} ORDER BY g.task_id LIMIT ?3'''
+TAG_PAGE_QUERIES = {
+    'all': TAG_PAGE_TEMPLATE.format(filter=''),
+    'incomplete': TAG_PAGE_TEMPLATE.format(filter=' AND t.completed = 0'),
+    'ready': TAG_PAGE_TEMPLATE.format(filter=' AND t.completed = 0 AND t.blockers = 0'),
+    'completed': TAG_PAGE_TEMPLATE.format(filter=' AND t.completed != 0'),
+}
+PAGE_BEFORE = 'SELECT id, description, completed FROM tasks WHERE id < ? ORDER BY id DESC LIMIT ?'
+PAGE_SIZE = 500
+REOPEN_TASK = 'UPDATE tasks SET completed = 0, completed_at = NULL WHERE id = ? AND completed != 0'
+UNARCHIVE_TASK = '''INSERT INTO tasks (id, description, completed, created_at, completed_at, priority)
+SELECT id, description, 0, created_at, NULL, priority FROM tasks_archive WHERE id = ?'''
+# Prerequisites may have been reopened while the task sat in the archive.
+COUNT_BLOCKERS = '''UPDATE tasks SET blockers = (SELECT COUNT(*) FROM task_deps d JOIN tasks p ON p.id = d.depends_on
+    WHERE d.task_id = ?1 AND p.completed = 0) WHERE id = ?1'''
+DELETE_ARCHIVED = 'DELETE FROM tasks_archive WHERE id = ?'
+COMPLETE_TASK = 'UPDATE tasks SET completed = 1, completed_at = IFNULL(completed_at, ?) WHERE id = ?'
+DELETE_TASK = 'DELETE FROM tasks WHERE id = ?'
+SET_PRIORITY = 'UPDATE tasks SET priority = ? WHERE id = ?'
+# Batch forms: a JSON array of ids, inclusive id ranges, or every task
+# matching an fts_query(). One statement over a list of ids visits rows in
+# id order and runs about four times faster than a statement per id.
+# Only tasks not yet completed count as completed by a batch.
+COMPLETE_IDS = '''UPDATE tasks SET completed = 1, completed_at = IFNULL(completed_at, ?)
+WHERE completed = 0 AND id IN (SELECT value FROM json_each(?))'''
+DELETE_IDS = 'DELETE FROM tasks WHERE id IN (SELECT value FROM json_each(?))'
+COMPLETE_RANGE = '''UPDATE tasks SET completed = 1, completed_at = IFNULL(completed_at, ?)
+WHERE id BETWEEN ? AND ? AND completed = 0'''
+DELETE_RANGE = 'DELETE FROM tasks WHERE id BETWEEN ? AND ?'
+COMPLETE_MATCHING = '''UPDATE tasks SET completed = 1, completed_at = IFNULL(completed_at, ?)
+WHERE completed = 0 AND id IN (SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH ?)'''
+DELETE_MATCHING = 'DELETE FROM tasks WHERE id IN (SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH ?)'
+
+# The caller supplies a uniform float in [0, 1); picking the slot inside one
+# statement keeps the read consistent with concurrent writers.
+RANDOM_TASK = '''SELECT t.id, t.description FROM task_pool p JOIN tasks t ON t.id = p.task_id
+WHERE p.slot = (SELECT CAST(? * MAX(slot) AS INTEGER) + 1 FROM task_pool)'''
+
+# Ranked full-text search; the first ? is a query built by fts_query().
+# Only the newest SEARCH_CANDIDATES matches are ranked (FTS5's rank is
+# bm25), so a word found in half a million tasks costs no more than a rare
+# one: the inner query walks the index in rowid order and stops early.
+SEARCH_TEMPLATE = '''SELECT id, description, completed FROM (
+    SELECT t.id, t.description, t.completed, f.rank FROM tasks_fts f JOIN tasks t ON t.id = f.rowid
+    WHERE tasks_fts MATCH ?{filter} ORDER BY f.rowid DESC LIMIT ?
+) ORDER BY rank LIMIT ?'''
+SEARCH_QUERIES = {
+    'all': SEARCH_TEMPLATE.format(filter=''),
+    'incomplete': SEARCH_TEMPLATE.format(filter=' AND t.completed = 0'),
+    'ready': SEARCH_TEMPLATE.format(filter=' AND t.completed = 0 AND t.blockers = 0'),
+    'completed': SEARCH_TEMPLATE.format(filter=' AND t.completed != 0'),
+}
+# Archived matches are ranked alongside the live ones; each index
+# contributes its newest candidates.
+ARCHIVED_SEARCH_TEMPLATE = '''SELECT id, description, completed FROM (
+    SELECT * FROM (
+        SELECT t.id, t.description, t.completed, f.rank FROM tasks_fts f JOIN tasks t ON t.id = f.rowid
+        WHERE tasks_fts MATCH ?1{filter} ORDER BY f.rowid DESC LIMIT ?2)
+    UNION ALL
+    SELECT * FROM (
+        SELECT a.id, a.description, a.completed, f.rank FROM tasks_archive_fts f JOIN tasks_archive a ON a.id = f.rowid
+        WHERE tasks_archive_fts MATCH ?1 ORDER BY f.rowid DESC LIMIT ?2)
+) ORDER BY rank LIMIT ?3'''
+ARCHIVED_SEARCH_QUERIES = {
+    'all': ARCHIVED_SEARCH_TEMPLATE.format(filter=''),
+    'incomplete': SEARCH_QUERIES['incomplete'],
+    'ready': SEARCH_QUERIES['ready'],
+    'completed': ARCHIVED_SEARCH_TEMPLATE.format(filter=' AND t.completed != 0'),
+}
+SEARCH_CANDIDATES = 1000
+SEARCH_LIMIT = 50
+
+# Tags: names are unique, colours cycle through the mobile app's palette.
+TAG_COLORS = (0xFF5C6BC0, 0xFF26A69A, 0xFFEF5350, 0xFFFF7043, 0xFF66BB6A,
+              0xFFAB47BC, 0xFF42A5F5, 0xFFFFCA28, 0xFF8D6E63, 0xFF78909C)
+MAX_TAG_NAME = 31
+TAG_ID = 'SELECT id FROM tags WHERE name = ?'
+TAG_COUNT = 'SELECT COUNT(*) FROM tags'
+ADD_TAG = 'INSERT INTO tags (name, color, created_at) VALUES (?, ?, ?)'
+DELETE_TAG = 'DELETE FROM tags WHERE name = ?'
+TAG_TASK = 'INSERT OR IGNORE INTO task_tags (task_id, tag_id) VALUES (?, ?)'
+UNTAG_TASK = 'DELETE FROM task_tags WHERE task_id = ? AND tag_id = (SELECT id FROM tags WHERE name = ?)'
+TASK_TAGS = '''SELECT g.name FROM task_tags tt JOIN tags g ON g.id = tt.tag_id
+WHERE tt.task_id = ? ORDER BY g.name'''
+ALL_TAGS = '''SELECT g.name, g.color, COUNT(tt.task_id) FROM tags g LEFT JOIN task_tags tt ON tt.tag_id = g.id
+GROUP BY g.id ORDER BY g.name'''
+
+# Dependencies. A new edge closes a cycle when the prerequisite already
+# waits for the task, directly or through others, so the check walks only
+# what the prerequisite waits for (UNION visits each task once).
+TASK_EXISTS = 'SELECT 1 FROM tasks WHERE id = ?'
+WAITS_FOR = '''WITH RECURSIVE waits(id) AS (
+    SELECT ?2 UNION SELECT d.depends_on FROM task_deps d JOIN waits w ON d.task_id = w.id
+) SELECT 1 FROM waits WHERE id = ?1 LIMIT 1'''
+ADD_DEPENDENCY = 'INSERT OR IGNORE INTO task_deps (task_id, depends_on) VALUES (?, ?)'
+REMOVE_DEPENDENCY = 'DELETE FROM task_deps WHERE task_id = ? AND depends_on = ?'
+# (id, description, completed) of the tasks on either end, wherever they live.
+PREREQUISITES = '''SELECT d.depends_on, IFNULL(t.description, a.description), IFNULL(t.completed, a.completed)
+FROM task_deps d LEFT JOIN tasks t ON t.id = d.depends_on LEFT JOIN tasks_archive a ON a.id = d.depends_on
+WHERE d.task_id = ? ORDER BY d.depends_on'''
+DEPENDENTS = '''SELECT d.task_id, IFNULL(t.description, a.description), IFNULL(t.completed, a.completed)
+FROM task_deps d LEFT JOIN tasks t ON t.id = d.task_id LEFT JOIN tasks_archive a ON a.id = d.task_id
+WHERE d.depends_on = ? ORDER BY d.task_id'''
+BLOCKERS = 'SELECT blockers FROM tasks WHERE id = ?'
+
+CHANGE_SEQ = 'SELECT IFNULL(MAX(seq), 0) FROM task_changes'
+CHANGES_SINCE = '''SELECT c.seq, c.task_id, t.description, t.completed
+FROM task_changes c LEFT JOIN tasks t ON t.id = c.task_id WHERE c.seq > ? ORDER BY c.seq LIMIT ?'''
+CHANGES_LIMIT = 1000
+# Local changes in (after, upto] with the task's state, wherever it lives;
+# sync_tasks gives the uid of tasks that came from another replica.
+LOCAL_CHANGES = '''SELECT c.seq, c.task_id, c.changed_at, m.uid,
+    IFNULL(t.description, a.description), IFNULL(t.completed, a.completed),
+    IFNULL(t.created_at, a.created_at), IFNULL(t.completed_at, a.completed_at)
+FROM task_changes c LEFT JOIN tasks t ON t.id = c.task_id LEFT JOIN tasks_archive a ON a.id = c.task_id
+LEFT JOIN sync_tasks m ON m.task_id = c.task_id
+WHERE c.seq > ? AND c.seq <= ? AND c.replica IS NULL ORDER BY c.seq'''
+
+INSERT_SESSION = '''INSERT INTO sessions (task_id, phase, started_at, duration_ms, finished)
+VALUES (?, ?, ?, ?, ?)'''
+# Rollup upserts take (key, work_sessions, work_ms, break_sessions, break_ms).
+ROLLUP_DAILY = '''INSERT INTO stats_daily (day, work_sessions, work_ms, break_sessions, break_ms)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (day) DO UPDATE SET
+    work_sessions = work_sessions + excluded.work_sessions, work_ms = work_ms + excluded.work_ms,
+    break_sessions = break_sessions + excluded.break_sessions, break_ms = break_ms + excluded.break_ms'''
+ROLLUP_WEEKLY = '''INSERT INTO stats_weekly (week, work_sessions, work_ms, break_sessions, break_ms)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (week) DO UPDATE SET
+    work_sessions = work_sessions + excluded.work_sessions, work_ms = work_ms + excluded.work_ms,
+    break_sessions = break_sessions + excluded.break_sessions, break_ms = break_ms + excluded.break_ms'''
+ROLLUP_TOTAL = '''INSERT INTO stats_total (id, work_sessions, work_ms, break_sessions, break_ms)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    work_sessions = work_sessions + excluded.work_sessions, work_ms = work_ms + excluded.work_ms,
+    break_sessions = break_sessions + excluded.break_sessions, break_ms = break_ms + excluded.break_ms'''
+ROLLUP_TASK = '''INSERT INTO stats_task (task_id, work_sessions, work_ms, last_worked_at) VALUES (?, 1, ?, ?)
+ON CONFLICT (task_id) DO UPDATE SET
+    work_sessions = work_sessions + 1, work_ms = work_ms + excluded.work_ms,
+    last_worked_at = MAX(IFNULL(last_worked_at, 0), excluded.last_worked_at)'''
+STATS_COLUMNS = 'work_sessions, work_ms, break_sessions, break_ms'
+STATS_DAY = f'SELECT {STATS_COLUMNS} FROM stats_daily WHERE day = ?'
+STATS_WEEK = f'SELECT {STATS_COLUMNS} FROM stats_weekly WHERE week = ?'
+STATS_TOTAL = f'SELECT {STATS_COLUMNS} FROM stats_total WHERE id = 1'
+STATS_DAYS = f'SELECT day, {STATS_COLUMNS} FROM stats_daily WHERE day BETWEEN ? AND ? ORDER BY day'
+STATS_TASK = '''SELECT s.task_id, t.description, s.work_sessions, s.work_ms, s.last_worked_at
+FROM stats_task s LEFT JOIN tasks t ON t.id = s.task_id WHERE s.task_id = ?'''
+STATS_TOP_TASKS = '''SELECT s.task_id, t.description, s.work_sessions, s.work_ms, s.last_worked_at
+FROM stats_task s LEFT JOIN tasks t ON t.id = s.task_id ORDER BY s.work_ms DESC LIMIT ?'''
+
+# Hot-path queries and the index each must use; checked with
+# migrations.check_query_plans. Parameter values do not affect the plan.
+HOT_QUERIES = [
+    ('incomplete page', PAGE_QUERIES['incomplete'], (0, PAGE_SIZE), 'idx_tasks_incomplete'),
+    ('ready page', PAGE_QUERIES['ready'], (0, PAGE_SIZE), 'idx_tasks_ready'),
+    ('tag page', TAG_PAGE_QUERIES['ready'], ('work', 0, PAGE_SIZE), 'idx_task_tags_tag'),
+    ('dependents', 'SELECT task_id FROM task_deps WHERE depends_on = ?', (1,), 'idx_task_deps_depends_on'),
+    ('random task', RANDOM_TASK, (0.5,), 'INTEGER PRIMARY KEY'),
+    ('pool removal', 'SELECT slot FROM task_pool WHERE task_id = ?', (1,), 'idx_task_pool_task'),
+    ('top tasks', STATS_TOP_TASKS, (5,), 'idx_stats_task_work'),
+    ('search', SEARCH_QUERIES['incomplete'], ('"write"*', SEARCH_CANDIDATES, SEARCH_LIMIT), 'VIRTUAL TABLE INDEX'),
+    ('changes since', CHANGES_SINCE, (0, CHANGES_LIMIT), 'INTEGER PRIMARY KEY (rowid>?)'),
+    ('archived page', ARCHIVED_PAGE_QUERIES['all'], (0, PAGE_SIZE), 'MERGE (UNION ALL)'),
+    ('local changes', LOCAL_CHANGES, (0, 0), 'INTEGER PRIMARY KEY (rowid>? AND rowid<?)'),
+]
+
+STATEMENT_CACHE_SIZE = 256
+# Exit status for a CLI when the database stayed locked: EX_TEMPFAIL, "try again".
+EXIT_BUSY = 75
+
+
+class DatabaseBusy(sqlite3.OperationalError):
+    """Another process kept the write lock through every retry; nothing was written."""
+
+
+class TaskStore:
+    """Data-access layer for the tasks database.
+
+    Each thread gets its own long-lived connection, opened lazily on first
+    use and reused for every later call, so the GUI's worker thread and the
+    Tk main thread never share a connection or open one per operation.
+
+    A readonly store opens its connections with mode=ro, for CLI commands
+    that only read; it takes a writable connection just once, to create or
+    upgrade the database when the schema version is behind.
+
+    Every operation is counted and timed with metrics.timed under its own
+    op label, except iter_tasks() and local_changes(): they are generators,
+    so iter_tasks() times each page it fetches (list_page), and
+    local_changes() is timed as part of sync push. Modules that run their
+    own statements on connection() time the whole operation the same way.
+    """
+
+    def __init__(self, db_name=DB_NAME, rng=None, readonly=False):
+        self.db_name = db_name
+        self.readonly = readonly
+        self._rng = rng
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self.init_db()
+
+    @property
+    def rng(self):
+        # Created on first use: importing random is a noticeable part of a
+        # CLI call that never picks a task.
+        if self._rng is None:
+            import random
+            self._rng = random.Random()
+        return self._rng
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.depth = 0
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _connect(self):
+        # isolation_level=None leaves transaction control to transaction().
+        # check_same_thread is off only so close() can run from any thread;
+        # each connection is still used by the thread that opened it.
+        if self.readonly:
+            path = self.db_name.replace('%', '%25').replace('?', '%3f').replace('#', '%23')
+            conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, isolation_level=None,
+                                   timeout=BUSY_TIMEOUT_S, check_same_thread=False,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+        else:
+            conn = sqlite3.connect(self.db_name, isolation_level=None,
+                                   timeout=BUSY_TIMEOUT_S, check_same_thread=False,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+            # Only takes effect on a new file, and only before WAL mode is
+            # set; archive.py converts older files with one full VACUUM.
+            # Setting it needs the write lock, so leave existing files alone.
+            if not conn.execute('PRAGMA page_count').fetchone()[0]:
+                conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+        if metrics.ENABLED:
+            metrics.inc('goaly_db_connections_opened_total')
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Run the enclosed statements in one write transaction.
+
+        Nested use joins the outer transaction; only the outermost block
+        commits or rolls back. The write lock is taken up front (BEGIN
+        IMMEDIATE): the FTS triggers read before they write, and a deferred
+        transaction that has read cannot wait for a writer in another
+        process to finish, it fails with "database is locked" at once.
+
+        Taking the lock is the only step that waits on other processes, and
+        nothing has run yet when it fails, so that is where contention is
+        retried (see WRITE_RETRIES); DatabaseBusy means the block never ran.
+        """
+        conn = self.connection()
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+        self._begin(conn)
+        self._local.depth = 1
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            self._local.depth = 0
+
+    def _begin(self, conn):
+        start = time.perf_counter()
+        for attempt in range(WRITE_RETRIES + 1):
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                break
+            except sqlite3.OperationalError as e:
+                if not is_busy(e):
+                    raise
+                if metrics.ENABLED:
+                    metrics.inc('goaly_db_busy_total')
+                if attempt == WRITE_RETRIES:
+                    raise DatabaseBusy(f'database is locked (gave up after {time.perf_counter() - start:.1f} s)') from e
+                time.sleep(self.rng.uniform(0, RETRY_BASE_S * 2 ** attempt))
+        if metrics.ENABLED:
+            metrics.observe('goaly_db_lock_wait_seconds', time.perf_counter() - start)
+
+    @metrics.timed('init_db')
+    def init_db(self):
+        """Bring the schema up to date; a no-op read of user_version when it is."""
+        if not self.readonly:
+            migrate(self.connection())
+            return
+        try:
+            if schema_version(self.connection()) >= SCHEMA_VERSION:
+                return
+        except sqlite3.OperationalError:
+            pass  # No database yet, or it cannot be opened read-only.
+        self.close()
+        writer = TaskStore(self.db_name)
+        writer.close()
+
+    @metrics.timed('add_task')
+    def add_task(self, description):
+        with self.transaction() as conn:
+            return conn.execute(INSERT_TASK, (description, now_ms())).lastrowid
+
+    @metrics.timed('add_keyed_task')
+    def add_keyed_task(self, key, description):
+        """Add a task once per key; return (task id, whether it was added now).
+
+        A caller that lost track of an add (it timed out, or the process was
+        killed) can repeat it with the same key without creating a duplicate.
+        """
+        with self.transaction() as conn:
+            row = conn.execute(KEYED_TASK, (key,)).fetchone()
+            if row:
+                return row[0], False
+            now = now_ms()
+            task_id = conn.execute(INSERT_TASK, (description, now)).lastrowid
+            conn.execute(ADD_KEY, (key, task_id, now))
+            return task_id, True
+
+    @metrics.timed('add_tasks')
+    def add_tasks(self, rows):
+        """Insert (description, completed, created_at, completed_at) rows in one transaction."""
+        with self.transaction() as conn:
+            return conn.executemany(IMPORT_TASK, rows).rowcount
+
+    def iter_tasks(self, status='all', after=0, limit=None, page_size=PAGE_SIZE, archived=False, tag=None):
+        """Yield (id, description, completed) rows with id > after, in id order.
+
+        Rows are fetched a page at a time, so memory stays flat however large
+        the table is and the first rows arrive without waiting for the rest.
+        archived includes the tasks moved to the archive; tag limits the rows
+        to tasks (not archived) with that tag. 'ready' is the incomplete
+        tasks not waiting for any other task.
+        """
+        if tag is not None:
+            query, prefix = TAG_PAGE_QUERIES[status], (tag,)
+        else:
+            query, prefix = (ARCHIVED_PAGE_QUERIES if archived else PAGE_QUERIES)[status], ()
+        conn = self.connection()
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+            if metrics.ENABLED:
+                start = time.perf_counter()
+                rows = conn.execute(query, prefix + (after, size)).fetchall()
+                metrics.inc('goaly_db_operations_total', op='list_page')
+                metrics.observe('goaly_db_operation_seconds', time.perf_counter() - start, op='list_page')
+            else:
+                rows = conn.execute(query, prefix + (after, size)).fetchall()
+            yield from rows
+            if len(rows) < size:
+                return
+            after = rows[-1][0]
+            if remaining is not None:
+                remaining -= len(rows)
+
+    @metrics.timed('tasks_before')
+    def tasks_before(self, before, limit):
+        """Return up to limit rows with id < before, in ascending id order."""
+        rows = self.connection().execute(PAGE_BEFORE, (before, limit)).fetchall()
+        rows.reverse()
+        return rows
+
+    @metrics.timed('reopen_task')
+    def reopen_task(self, task_id):
+        """Mark a completed task incomplete, moving it back out of the archive if it is there."""
+        with self.transaction() as conn:
+            count = conn.execute(REOPEN_TASK, (task_id,)).rowcount
+            if not count:
+                count = conn.execute(UNARCHIVE_TASK, (task_id,)).rowcount
+                conn.execute(DELETE_ARCHIVED, (task_id,))
+                conn.execute(COUNT_BLOCKERS, (task_id,))
+            return count
+
+    @metrics.timed('complete_task')
+    def complete_task(self, task_id):
+        with self.transaction() as conn:
+            return conn.execute(COMPLETE_TASK, (now_ms(), task_id)).rowcount
+
+    @metrics.timed('delete_task')
+    def delete_task(self, task_id):
+        with self.transaction() as conn:
+            return conn.execute(DELETE_TASK, (task_id,)).rowcount
+
+    @metrics.timed('set_priority')
+    def set_priority(self, task_id, priority):
+        with self.transaction() as conn:
+            return conn.execute(SET_PRIORITY, (priority, task_id)).rowcount
+
+    @metrics.timed('complete_tasks')
+    def complete_tasks(self, ranges):
+        """Complete every task in the inclusive (first, last) id ranges, in one transaction.
+
+        Returns how many tasks went from incomplete to completed.
+        """
+        ids, spans = split_ranges(ranges)
+        now = now_ms()
+        count = 0
+        with self.transaction() as conn:
+            if ids:
+                count += conn.execute(COMPLETE_IDS, (now, ids)).rowcount
+            if spans:
+                count += conn.executemany(COMPLETE_RANGE, ((now, first, last) for first, last in spans)).rowcount
+        return count
+
+    @metrics.timed('delete_tasks')
+    def delete_tasks(self, ranges):
+        """Delete every task in the inclusive (first, last) id ranges, in one transaction."""
+        ids, spans = split_ranges(ranges)
+        count = 0
+        with self.transaction() as conn:
+            if ids:
+                count += conn.execute(DELETE_IDS, (ids,)).rowcount
+            if spans:
+                count += conn.executemany(DELETE_RANGE, spans).rowcount
+        return count
+
+    @metrics.timed('complete_matching')
+    def complete_matching(self, text):
+        """Complete every incomplete task that search(text) would find, in one statement."""
+        query = fts_query(text)
+        if not query:
+            return 0
+        with self.transaction() as conn:
+            return conn.execute(COMPLETE_MATCHING, (now_ms(), query)).rowcount
+
+    @metrics.timed('delete_matching')
+    def delete_matching(self, text):
+        query = fts_query(text)
+        if not query:
+            return 0
+        with self.transaction() as conn:
+            return conn.execute(DELETE_MATCHING, (query,)).rowcount
+
+    @metrics.timed('get_random_task')
+    def get_random_task(self):
+        """Return (id, description) of a uniformly random ready task, or None."""
+        return self.connection().execute(RANDOM_TASK, (self.rng.random(),)).fetchone()
+
+    @metrics.timed('search')
+    def search(self, text, status='all', limit=SEARCH_LIMIT, archived=False):
+        """Return up to limit (id, description, completed) rows matching text, best first.
+
+        Every word of text must appear, each matched as a prefix, so a
+        half-typed word already finds its tasks. Only the newest
+        SEARCH_CANDIDATES matches are ranked. archived searches the
+        archive too.
+        """
+        query = fts_query(text)
+        if not query:
+            return []
+        queries = ARCHIVED_SEARCH_QUERIES if archived else SEARCH_QUERIES
+        return self.connection().execute(queries[status],
+                                         (query, max(limit, SEARCH_CANDIDATES), limit)).fetchall()
+
+    @metrics.timed('tag_task')
+    def tag_task(self, task_id, name):
+        """Give a task a tag, creating the tag on first use; return whether the task was untagged before."""
+        name = name.strip()
+        if not name or len(name) > MAX_TAG_NAME:
+            raise ValueError(f'tag names are 1 to {MAX_TAG_NAME} characters')
+        with self.transaction() as conn:
+            if not conn.execute(TASK_EXISTS, (task_id,)).fetchone():
+                raise ValueError(f'no task {task_id}')
+            row = conn.execute(TAG_ID, (name,)).fetchone()
+            if row:
+                tag_id = row[0]
+            else:
+                count = conn.execute(TAG_COUNT).fetchone()[0]
+                tag_id = conn.execute(ADD_TAG, (name, TAG_COLORS[count % len(TAG_COLORS)], now_ms())).lastrowid
+            return conn.execute(TAG_TASK, (task_id, tag_id)).rowcount > 0
+
+    @metrics.timed('untag_task')
+    def untag_task(self, task_id, name):
+        with self.transaction() as conn:
+            return conn.execute(UNTAG_TASK, (task_id, name.strip())).rowcount
+
+    @metrics.timed('task_tags')
+    def task_tags(self, task_id):
+        """Names of a task's tags, sorted."""
+        return [row[0] for row in self.connection().execute(TASK_TAGS, (task_id,))]
+
+    @metrics.timed('all_tags')
+    def all_tags(self):
+        """Return (name, color, tasks tagged) for every tag, by name."""
+        return self.connection().execute(ALL_TAGS).fetchall()
+
+    @metrics.timed('delete_tag')
+    def delete_tag(self, name):
+        with self.transaction() as conn:
+            return conn.execute(DELETE_TAG, (name.strip(),)).rowcount
+
+    @metrics.timed('add_dependency')
+    def add_dependency(self, task_id, prerequisite):
+        """Make task_id wait until prerequisite is completed; return whether the edge is new.
+
+        Both must be tasks in the task list (not archived). Raises
+        ValueError, and adds nothing, if prerequisite already waits for
+        task_id, since the two could then never be started.
+        """
+        with self.transaction() as conn:
+            for tid in (task_id, prerequisite):
+                if not conn.execute(TASK_EXISTS, (tid,)).fetchone():
+                    raise ValueError(f'no task {tid}')
+            if conn.execute(WAITS_FOR, (task_id, prerequisite)).fetchone():
+                raise ValueError(f'task {prerequisite} already waits for task {task_id}'
+                                 if task_id != prerequisite else f'task {task_id} cannot wait for itself')
+            return conn.execute(ADD_DEPENDENCY, (task_id, prerequisite)).rowcount > 0
+
+    @metrics.timed('remove_dependency')
+    def remove_dependency(self, task_id, prerequisite):
+        with self.transaction() as conn:
+            return conn.execute(REMOVE_DEPENDENCY, (task_id, prerequisite)).rowcount
+
+    @metrics.timed('dependencies')
+    def dependencies(self, task_id):
+        """Return (prerequisites, dependents) of a task as lists of (id, description, completed).
+
+        blockers() says how many prerequisites are still incomplete.
+        """
+        conn = self.connection()
+        return conn.execute(PREREQUISITES, (task_id,)).fetchall(), conn.execute(DEPENDENTS, (task_id,)).fetchall()
+
+    @metrics.timed('blockers')
+    def blockers(self, task_id):
+        """How many incomplete tasks a task waits for; None if it is not in the task list."""
+        row = self.connection().execute(BLOCKERS, (task_id,)).fetchone()
+        return row[0] if row else None
+
+    @metrics.timed('data_version')
+    def data_version(self):
+        """A number that changes whenever another connection commits to the database."""
+        return self.connection().execute('PRAGMA data_version').fetchone()[0]
+
+    @metrics.timed('change_seq')
+    def change_seq(self):
+        """Sequence number of the latest task change; pass it to changes_since() later."""
+        return self.connection().execute(CHANGE_SEQ).fetchone()[0]
+
+    @metrics.timed('changes_since')
+    def changes_since(self, seq, limit=CHANGES_LIMIT):
+        """Return (seq, id, description, completed) for up to limit tasks changed after seq, oldest first.
+
+        A deleted task comes back with description and completed None.
+        """
+        return self.connection().execute(CHANGES_SINCE, (seq, limit)).fetchall()
+
+    def local_changes(self, after, upto):
+        """Yield (seq, id, changed_at, uid, description, completed, created_at, completed_at)
+        for changes made here with after < seq <= upto, oldest first.
+
+        uid is None for tasks created here; a deleted task has description None.
+        """
+        return self.connection().execute(LOCAL_CHANGES, (after, upto))
+
+    @metrics.timed('record_session')
+    def record_session(self, task_id, phase, started_at, duration_ms, finished=True):
+        """Store one work or break session and fold it into every rollup.
+
+        started_at is wall-clock epoch ms (it decides the day and week);
+        duration_ms is measured on the monotonic clock.
+        """
+        from datetime import datetime
+        local = datetime.fromtimestamp(started_at / 1000)
+        counts = (1, duration_ms, 0, 0) if phase == 'work' else (0, 0, 1, duration_ms)
+        with self.transaction() as conn:
+            conn.execute(INSERT_SESSION, (task_id, phase, started_at, duration_ms, int(finished)))
+            conn.execute(ROLLUP_DAILY, (local.strftime('%Y-%m-%d'), *counts))
+            conn.execute(ROLLUP_WEEKLY, (local.strftime('%G-W%V'), *counts))
+            conn.execute(ROLLUP_TOTAL, (1, *counts))
+            if phase == 'work' and task_id is not None:
+                conn.execute(ROLLUP_TASK, (task_id, duration_ms, started_at + duration_ms))
+
+    @metrics.timed('focus_stats')
+    def focus_stats(self, day, week, since_day, top=5):
+        """Read the rollups: one day, one ISO week, since_day..day, totals and top tasks."""
+        conn = self.connection()
+        empty = (0, 0, 0, 0)
+        return {
+            'day': conn.execute(STATS_DAY, (day,)).fetchone() or empty,
+            'week': conn.execute(STATS_WEEK, (week,)).fetchone() or empty,
+            'days': conn.execute(STATS_DAYS, (since_day, day)).fetchall(),
+            'total': conn.execute(STATS_TOTAL).fetchone() or empty,
+            'top_tasks': conn.execute(STATS_TOP_TASKS, (top,)).fetchall(),
+        }
+
+    @metrics.timed('task_stats')
+    def task_stats(self, task_id):
+        return self.connection().execute(STATS_TASK, (task_id,)).fetchone()
+
+    def close_connection(self):
+        """Close the calling thread's connection, e.g. before a worker thread exits."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        conn.close()
+        if metrics.ENABLED:
+            metrics.inc('goaly_db_connections_closed_total')
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        if metrics.ENABLED and connections:
+            metrics.inc('goaly_db_connections_closed_total', len(connections))
+        self._local = threading.local()
+
+
+def split_ranges(ranges):
+    """Split (first, last) pairs into a JSON array of single ids and the real spans."""
+    ids, spans = [], []
+    for first, last in ranges:
+        if first == last:
+            ids.append(int(first))
+        else:
+            spans.append((first, last))
+    return ('[%s]' % ','.join(map(str, ids)) if ids else None), spans
+
+
+def fts_query(text):
+    """Turn free text into an FTS5 query: every word, quoted, as a prefix.
+
+    Quoting keeps user input from being read as FTS5 syntax, so text such as
+    'fix: "auth" OR' cannot make the query fail.
+    """
+    import re
+    return ' '.join('"%s"*' % word for word in re.findall(r'\w+', text))
+
+
+def is_busy(error):
+    """Whether an OperationalError means another connection holds a lock."""
+    return str(error).startswith(('database is locked', 'database is busy'))
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(db_name=DB_NAME, readonly=False):
+    """Return the process-wide TaskStore for db_name, creating it once."""
+    with _stores_lock:
+        store = _stores.get((db_name, readonly))
+        if store is None:
+            store = _stores[db_name, readonly] = TaskStore(db_name, readonly=readonly)
+        return store
@@ -1,59 +1,46 @@
-import sqlite3
 import sys
-
-DB_NAME = 'tasks.db'
+from listing import parse_list_args, print_tasks
+from task_store import DB_NAME, EXIT_BUSY, DatabaseBusy, get_store
 
 def init_db():
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS tasks (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        description TEXT NOT NULL,
-        completed INTEGER NOT NULL DEFAULT 0
-    )''')
-    conn.commit()
-    conn.close()
+    return get_store(DB_NAME)
 
 def add_task(description):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('INSERT INTO tasks (description) VALUES (?)', (description,))
-    conn.commit()
-    conn.close()
+    get_store(DB_NAME).add_task(description)
     print(f'Task added: {description}')
 
-def list_tasks():
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('SELECT id, description, completed FROM tasks')
-    tasks = c.fetchall()
-    conn.close()
-    for tid, desc, comp in tasks:
-        status = '✓' if comp else ' '
-        print(f'[{status}] {tid}: {desc}')
+def list_tasks(args=()):
+    opts = parse_list_args('tasks.py list', args, default_status='all')
+    rows = get_store(DB_NAME).iter_tasks(opts.status, opts.after, opts.limit,
+                                        archived=opts.archived, tag=opts.tag)
+    print_tasks(rows, opts.format, opts.status)
 
 def complete_task(task_id):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('UPDATE tasks SET completed = 1 WHERE id = ?', (task_id,))
-    conn.commit()
-    conn.close()
+    get_store(DB_NAME).complete_task(task_id)
     print(f'Task {task_id} marked as completed.')
 
 def main():
+    try:
+        run_command()
+    except DatabaseBusy as e:
+        # Raised before anything was written, so the command can simply be rerun.
+        print(f'Another program kept the task database busy; nothing was changed ({e}).', file=sys.stderr)
+        sys.exit(EXIT_BUSY)
+
+def run_command():
     init_db()
     if len(sys.argv) < 2:
-        print('Usage: python tasks.py [add "task desc" | list | complete TASK_ID]')
+        print('Usage: python tasks.py [add "task desc" | list [--status S] [--after ID] [--limit N] [--format F] | complete TASK_ID]')
         return
     cmd = sys.argv[1]
     if cmd == 'add' and len(sys.argv) >= 3:
         add_task(' '.join(sys.argv[2:]))
     elif cmd == 'list':
-        list_tasks()
+        list_tasks(sys.argv[2:])
     elif cmd == 'complete' and len(sys.argv) == 3:
         complete_task(sys.argv[2])
     else:
         print('Invalid command or arguments.')
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
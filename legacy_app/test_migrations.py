@@ -0,0 +1,76 @@
+import sqlite3
+
+from migrations import SCHEMA_VERSION, check_query_plans, migrate, schema_version
+from task_store import HOT_QUERIES, TaskStore
+
+# The schema tasks.py, goaly.py and goaly_gui.py created before migrations.
+BASELINE_SCHEMA = '''CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    description TEXT NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0
+)'''
+
+
+def migrated(path):
+    conn = sqlite3.connect(str(path), isolation_level=None)
+    migrate(conn)
+    return conn
+
+
+def baseline_db(path):
+    """Write a version 0 database with a few tasks, one of them deleted."""
+    conn = sqlite3.connect(str(path))
+    conn.execute(BASELINE_SCHEMA)
+    conn.executemany('INSERT INTO tasks (description, completed) VALUES (?, ?)',
+                     [('Write the report', 0), ('Buy milk', 1), ('Gone', 0), ('Call the bank', 0)])
+    conn.execute("DELETE FROM tasks WHERE description = 'Gone'")
+    conn.commit()
+    conn.close()
+
+
+def test_hot_queries_use_their_indexes(tmp_path):
+    conn = migrated(tmp_path / 'tasks.db')
+    try:
+        assert check_query_plans(conn, HOT_QUERIES) == []
+    finally:
+        conn.close()
+
+
+def test_upgrades_a_populated_baseline_database(tmp_path):
+    path = tmp_path / 'tasks.db'
+    baseline_db(path)
+    conn = sqlite3.connect(str(path), isolation_level=None)
+    try:
+        assert schema_version(conn) == 0
+        assert migrate(conn) == SCHEMA_VERSION
+
+        def state():
+            return (
+                conn.execute('SELECT slot, task_id FROM task_pool ORDER BY slot').fetchall(),
+                conn.execute('SELECT task_id, changed_at, replica FROM task_changes ORDER BY task_id').fetchall(),
+                conn.execute('SELECT id, blockers, created_at FROM tasks ORDER BY id').fetchall(),
+            )
+        pool, changes, tasks = state()
+        assert pool == [(1, 1), (2, 4)]
+        # Old rows have no timestamps; a first sync push still carries them.
+        assert changes == [(1, 0, None), (2, 0, None), (4, 0, None)]
+        assert tasks == [(1, 0, None), (2, 0, None), (4, 0, None)]
+        assert conn.execute("SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH 'rep*'").fetchall() == [(1,)]
+        assert check_query_plans(conn, HOT_QUERIES) == []
+
+        assert migrate(conn) == SCHEMA_VERSION
+        assert state() == (pool, changes, tasks)
+    finally:
+        conn.close()
+
+    # The upgraded rows work with everything built on the new schema.
+    store = TaskStore(str(path))
+    try:
+        assert [row[0] for row in store.search('bank')] == [4]
+        store.add_dependency(4, 1)
+        assert store.get_random_task() == (1, 'Write the report')
+        store.complete_task(1)
+        assert store.get_random_task() == (4, 'Call the bank')
+        assert store.add_task('New task') == 5
+    finally:
+        store.close()
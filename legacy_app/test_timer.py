@@ -1,49 +1,167 @@
-import sqlite3
-import time
+import sys
+import threading
+
+import pytest
+
+from clock import VirtualClock
 from emoji_config import *
+from task_store import DB_NAME, get_store
+from timer_engine import BREAK, WORK, PomodoroListener, TimerEngine, run_pomodoro
 
-DB_NAME = 'tasks.db'
 WORK_SECONDS = 5  # Just 5 seconds for testing
 BREAK_SECONDS = 3  # Just 3 seconds for testing
 
 def get_random_task():
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('SELECT id, description FROM tasks WHERE completed = 0 ORDER BY RANDOM() LIMIT 1')
-    task = c.fetchone()
-    conn.close()
-    return task
-
-def test_timer():
-    print("\n=== Goaly Pomodoro Timer (Test Mode) ===")
-    print("This is a quick test - real timer uses 25min work / 5min break\n")
-    
-    # Get a random incomplete task
-    task = get_random_task()
-    if task:
-        task_id, task_desc = task
-        print(f"{EMOJI_GOAL} Current task: [{task_id}] {task_desc}")
-    else:
-        print(f"{EMOJI_GOAL} No tasks available - time to add some!")
-    
-    # Work session (shortened for testing)
-    print(f"\n{EMOJI_TIMER} Work session ({WORK_SECONDS} seconds)")
-    for second in range(WORK_SECONDS):
+    return get_store(DB_NAME).get_random_task()
+
+class QuickListener(PomodoroListener):
+    def task_selected(self, task):
         if task:
-            print(f"Work on: {task_desc} ({second + 1}/{WORK_SECONDS})")
+            task_id, task_desc = task
+            print(f"{EMOJI_GOAL} Current task: [{task_id}] {task_desc}")
+        else:
+            print(f"{EMOJI_GOAL} No tasks available - time to add some!")
+    
+    def phase_started(self, phase, seconds, task):
+        if phase == WORK:
+            print(f"\n{EMOJI_TIMER} Work session ({WORK_SECONDS} seconds)")
         else:
-            print(f"Work! ({second + 1}/{WORK_SECONDS})")
-        time.sleep(1)
+            print(f"\n{EMOJI_BREAK} Break session ({BREAK_SECONDS} seconds)")
     
-    print(f"\n{EMOJI_SUCCESS} Work session complete!")
+    def step(self, phase, index, count, task):
+        if phase != WORK:
+            print(f"Play! ({index + 1}/{count})")
+        elif task:
+            print(f"Work on: {task[1]} ({index + 1}/{count})")
+        else:
+            print(f"Work! ({index + 1}/{count})")
     
-    # Break session (shortened for testing)
-    print(f"\n{EMOJI_BREAK} Break session ({BREAK_SECONDS} seconds)")
-    for second in range(BREAK_SECONDS):
-        print(f"Play! ({second + 1}/{BREAK_SECONDS})")
-        time.sleep(1)
+    def phase_finished(self, phase, task):
+        if phase == WORK:
+            print(f"\n{EMOJI_SUCCESS} Work session complete!")
+        else:
+            print(f"\n{EMOJI_CELEBRATE} Break complete! Ready for next round?\n")
+
+def test_timer(clock=None, pick_task=None):
+    print("\n=== Goaly Pomodoro Timer (Test Mode) ===")
+    print("This is a quick test - real timer uses 25min work / 5min break\n")
     
-    print(f"\n{EMOJI_CELEBRATE} Break complete! Ready for next round?\n")
+    # Simulated time and no tasks by default, so pytest never opens the
+    # user's tasks.db; run as a script to pick from it, with --real to watch it tick.
+    clock = clock or VirtualClock()
+    start = clock.now()
+    cycles = run_pomodoro(TimerEngine(clock=clock), WORK_SECONDS, BREAK_SECONDS, pick_task or (lambda: None),
+                          QuickListener(), step_seconds=1, cycles=1)
+    assert cycles == 1
+    assert clock.now() - start >= WORK_SECONDS + BREAK_SECONDS
+
+
+class StepRecorder(PomodoroListener):
+    """Records (phase, index, time) for every step.
+
+    The last step of each phase takes last_step_seconds of virtual time,
+    so with more than one step's worth it runs past the phase's end.
+    """
+
+    def __init__(self, clock, last_step_seconds=0.0):
+        self.clock = clock
+        self.last_step_seconds = last_step_seconds
+        self.steps = []
+        self.stopped = None
+        self.on_step = None
+
+    def step(self, phase, index, count, task):
+        self.steps.append((phase, index, self.clock.now()))
+        if index == count - 1:
+            self.clock.advance(self.last_step_seconds)
+        if self.on_step:
+            self.on_step(len(self.steps) - 1)
+
+    def phase_stopped(self, phase, elapsed, task):
+        self.stopped = (phase, elapsed)
+
+
+def ideal_times(cycles):
+    times = []
+    for cycle in range(cycles):
+        base = cycle * (WORK_SECONDS + BREAK_SECONDS)
+        times += [base + i for i in range(WORK_SECONDS + BREAK_SECONDS)]
+    return times
+
+
+@pytest.mark.parametrize('last_step_seconds', [0.0, 0.5, 1.5])
+def test_no_drift_over_100_cycles(last_step_seconds):
+    clock = VirtualClock()
+    listener = StepRecorder(clock, last_step_seconds)
+    assert run_pomodoro(TimerEngine(clock=clock), WORK_SECONDS, BREAK_SECONDS, lambda: None,
+                        listener, step_seconds=1, cycles=100) == 100
+    late = [t - ideal for (_phase, _index, t), ideal in zip(listener.steps, ideal_times(100))]
+    assert len(late) == 100 * (WORK_SECONDS + BREAK_SECONDS)
+    # A phase that overruns delays the next phase's first step, but every
+    # phase still starts at the previous one's deadline: nothing adds up.
+    overrun = max(0.0, last_step_seconds - 1)
+    assert max(late) == pytest.approx(overrun, abs=1e-9)
+    per_cycle = WORK_SECONDS + BREAK_SECONDS
+    assert late[-per_cycle:] == pytest.approx(late[per_cycle:2 * per_cycle], abs=1e-9)
+    assert clock.now() == pytest.approx(100 * (WORK_SECONDS + BREAK_SECONDS) + overrun, abs=1e-9)
+
+
+class PausingClock(VirtualClock):
+    """Signals once a paused engine has read the time it paused at."""
+
+    def __init__(self):
+        super().__init__()
+        self.engine = None
+        self.pause_seen = threading.Event()
+
+    def now(self):
+        if self.engine is not None and self.engine.paused:
+            self.pause_seen.set()
+        return super().now()
+
+
+def test_pause_shifts_the_rest_of_the_schedule():
+    pause_seconds = 42.0
+    clock = PausingClock()
+    engine = clock.engine = TimerEngine(clock=clock)
+    listener = StepRecorder(clock)
+
+    def pause_and_resume():
+        assert clock.pause_seen.wait(5)
+        clock.advance(pause_seconds)
+        engine.resume()
+
+    def on_step(n):
+        # Pause in the middle of the first work phase.
+        if n == 2:
+            engine.pause()
+            threading.Thread(target=pause_and_resume, daemon=True).start()
+
+    listener.on_step = on_step
+    assert run_pomodoro(engine, WORK_SECONDS, BREAK_SECONDS, lambda: None, listener,
+                        step_seconds=1, cycles=2) == 2
+    times = [t for _phase, _index, t in listener.steps]
+    expected = [t if n <= 2 else t + pause_seconds for n, t in enumerate(ideal_times(2))]
+    assert times == pytest.approx(expected, abs=1e-9)
+    assert clock.now() == pytest.approx(2 * (WORK_SECONDS + BREAK_SECONDS) + pause_seconds, abs=1e-9)
+
+
+@pytest.mark.parametrize('stop_at, phase, elapsed', [(2, WORK, 2), (WORK_SECONDS + 1, BREAK, 1)])
+def test_stop_during_a_phase(stop_at, phase, elapsed):
+    clock = VirtualClock()
+    engine = TimerEngine(clock=clock)
+    listener = StepRecorder(clock)
+    steps_per_cycle = WORK_SECONDS + BREAK_SECONDS
+    listener.on_step = lambda n: n == steps_per_cycle + stop_at and engine.stop()
+    assert run_pomodoro(engine, WORK_SECONDS, BREAK_SECONDS, lambda: None, listener,
+                        step_seconds=1, cycles=3) == 1
+    # Stopped in the second cycle: no steps after the stop, and the phase
+    # reports how far it got.
+    assert len(listener.steps) == steps_per_cycle + stop_at + 1
+    assert listener.stopped == (phase, pytest.approx(elapsed, abs=1e-9))
+    assert engine.stopped
+
 
 if __name__ == '__main__':
-    test_timer() 
\ No newline at end of file
+    from clock import REAL_CLOCK
+    test_timer(REAL_CLOCK if '--real' in sys.argv else None, get_random_task)
@@ -0,0 +1,271 @@
+import math
+import threading
+import time
+
+import metrics
+from clock import REAL_CLOCK
+
+WORK = 'work'
+BREAK = 'break'
+TICK_SECONDS = 0.5
+
+
+class TimerEngine:
+    """Runs timed phases against monotonic clock deadlines.
+
+    Step and tick times are computed from the phase start rather than by
+    sleeping a fixed amount per step, and each phase starts at the previous
+    phase's deadline, so lateness in callbacks or between phases never
+    accumulates. stop(), pause() and resume() may be called from any thread
+    and take effect immediately, even in the middle of a step.
+
+    clock defaults to real monotonic time; pass a clock.VirtualClock to run
+    phases in simulated time.
+    """
+
+    def __init__(self, tick_seconds=TICK_SECONDS, clock=None):
+        self.tick_seconds = tick_seconds
+        self.clock = clock or REAL_CLOCK
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._paused = False
+        self._last_deadline = None
+        # Unpaused time spent in the most recent phase, set when it ends.
+        self.elapsed = 0.0
+
+    @property
+    def stopped(self):
+        return self._stopped
+
+    @property
+    def paused(self):
+        return self._paused
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def pause(self):
+        with self._cond:
+            self._paused = True
+            self._cond.notify_all()
+
+    def resume(self):
+        with self._cond:
+            self._paused = False
+            self._cond.notify_all()
+
+    def _wait(self, timeout):
+        with self._cond:
+            if not self._stopped and not self._paused:
+                self.clock.wait(self._cond, timeout)
+
+    def _wait_while_paused(self):
+        """Block until resumed or stopped and return how long that took."""
+        paused_at = self.clock.now()
+        with self._cond:
+            while self._paused and not self._stopped:
+                self._cond.wait()
+        return self.clock.now() - paused_at
+
+    def _call(self, late, callback, *args):
+        # late is how far past its scheduled time the callback is firing.
+        if not metrics.ENABLED:
+            callback(*args)
+            return
+        begin = time.perf_counter()
+        callback(*args)
+        metrics.inc('goaly_timer_ticks_total')
+        metrics.observe('goaly_timer_lag_seconds', max(0.0, late))
+        metrics.observe('goaly_timer_callback_seconds', time.perf_counter() - begin)
+
+    def run_phase(self, seconds, step_seconds=None, on_step=None, on_tick=None):
+        """Block for seconds of unpaused time. Return False if stopped first.
+
+        on_step(index, count) fires at the start of each step_seconds step,
+        and on_tick(elapsed, total) every tick_seconds and once at the end.
+        """
+        start = self._last_deadline
+        if start is None:
+            start = self.clock.now()
+        deadline = start + seconds
+        count = math.ceil(seconds / step_seconds) if step_seconds else 0
+        next_step = 0
+        next_tick = start if on_tick else math.inf
+        while True:
+            if self._stopped:
+                self.elapsed = min(self.clock.now() - start, seconds)
+                return False
+            if self._paused:
+                shift = self._wait_while_paused()
+                start += shift
+                deadline += shift
+                next_tick += shift
+                continue
+            now = self.clock.now()
+            while next_step < count and now >= start + next_step * step_seconds:
+                if on_step:
+                    self._call(now - start - next_step * step_seconds, on_step, next_step, count)
+                next_step += 1
+            if now >= deadline:
+                self._last_deadline = deadline
+                self.elapsed = seconds
+                if on_tick:
+                    self._call(now - deadline, on_tick, seconds, seconds)
+                return True
+            if now >= next_tick:
+                if on_tick:
+                    self._call(now - next_tick, on_tick, now - start, seconds)
+                # Skip ticks missed while a callback ran late instead of
+                # firing them back to back.
+                next_tick += self.tick_seconds * max(1, math.ceil((now - next_tick) / self.tick_seconds))
+            wake = min(deadline, next_tick)
+            if next_step < count:
+                wake = min(wake, start + next_step * step_seconds)
+            # Callbacks above may have run long; wait from the current time.
+            self._wait(wake - self.clock.now())
+
+
+class PomodoroListener:
+    """Callbacks made by run_pomodoro; override the ones you need."""
+
+    def task_selected(self, task):
+        pass
+
+    def phase_started(self, phase, seconds, task):
+        pass
+
+    def step(self, phase, index, count, task):
+        pass
+
+    def progress(self, phase, elapsed, total):
+        pass
+
+    def phase_finished(self, phase, task):
+        pass
+
+    def phase_stopped(self, phase, elapsed, task):
+        pass
+
+
+class MultiListener(PomodoroListener):
+    """Forwards every callback to each of the given listeners in turn."""
+
+    def __init__(self, *listeners):
+        self.listeners = listeners
+
+    def task_selected(self, task):
+        for listener in self.listeners:
+            listener.task_selected(task)
+
+    def phase_started(self, phase, seconds, task):
+        for listener in self.listeners:
+            listener.phase_started(phase, seconds, task)
+
+    def step(self, phase, index, count, task):
+        for listener in self.listeners:
+            listener.step(phase, index, count, task)
+
+    def progress(self, phase, elapsed, total):
+        for listener in self.listeners:
+            listener.progress(phase, elapsed, total)
+
+    def phase_finished(self, phase, task):
+        for listener in self.listeners:
+            listener.phase_finished(phase, task)
+
+    def phase_stopped(self, phase, elapsed, task):
+        for listener in self.listeners:
+            listener.phase_stopped(phase, elapsed, task)
+
+
+def run_pomodoro(engine, work_seconds, break_seconds, pick_task, listener,
+                 step_seconds=60, cycles=None):
+    """Alternate work and break phases until the engine stops.
+
+    pick_task() supplies the task for each work phase (or None). Returns the
+    number of completed work/break cycles; cycles caps it when given.
+    """
+    done = 0
+    while not engine.stopped and (cycles is None or done < cycles):
+        task = pick_task()
+        listener.task_selected(task)
+        for phase, seconds in ((WORK, work_seconds), (BREAK, break_seconds)):
+            listener.phase_started(phase, seconds, task)
+            finished = engine.run_phase(
+                seconds, step_seconds,
+                on_step=lambda index, count: listener.step(phase, index, count, task),
+                on_tick=lambda elapsed, total: listener.progress(phase, elapsed, total))
+            if not finished:
+                listener.phase_stopped(phase, engine.elapsed, task)
+                return done
+            listener.phase_finished(phase, task)
+        done += 1
+    return done
+
+
+class PomodoroTimer:
+    """Start/stop/pause control around run_pomodoro, as used by GoalyGUI.
+
+    Each start() gets a fresh TimerEngine on the configured clock and runs
+    the cycle on a daemon thread, or inline with background=False. Nothing
+    here touches Tk, so the GUI's timer can also run headless, e.g. against
+    a VirtualClock in tests and simulations.
+
+    Pass the TaskStore that pick_task and the listeners read from as store
+    so each background thread closes its connection when the cycle ends.
+    """
+
+    def __init__(self, pick_task, work_seconds, break_seconds, step_seconds=60,
+                 tick_seconds=TICK_SECONDS, clock=None, store=None):
+        self.pick_task = pick_task
+        self.work_seconds = work_seconds
+        self.break_seconds = break_seconds
+        self.step_seconds = step_seconds
+        self.tick_seconds = tick_seconds
+        self.clock = clock or REAL_CLOCK
+        self.store = store
+        self.engine = None
+        self.thread = None
+
+    @property
+    def running(self):
+        return self.engine is not None and not self.engine.stopped
+
+    @property
+    def paused(self):
+        return self.running and self.engine.paused
+
+    def start(self, listener, cycles=None, background=True):
+        if self.running:
+            return None
+        engine = self.engine = TimerEngine(self.tick_seconds, self.clock)
+
+        def run():
+            try:
+                return run_pomodoro(engine, self.work_seconds, self.break_seconds, self.pick_task,
+                                    listener, self.step_seconds, cycles)
+            finally:
+                engine.stop()
+                # Inline runs share the caller's connection; leave it open.
+                if background and self.store is not None:
+                    self.store.close_connection()
+
+        if not background:
+            return run()
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self):
+        if self.engine:
+            self.engine.stop()
+
+    def pause(self):
+        if self.running:
+            self.engine.pause()
+
+    def resume(self):
+        if self.running:
+            self.engine.resume()
@@ -0,0 +1,124 @@
+import queue
+import sqlite3
+import threading
+import tkinter as tk
+
+ADD = 'add'
+COMPLETE = 'complete'
+DELETE = 'delete'
+# How long close() waits for queued writes before giving up on them.
+CLOSE_TIMEOUT = 10
+
+
+class Write:
+    def __init__(self, kind, args, on_done, on_error):
+        self.kind = kind
+        self.args = args
+        self.on_done = on_done
+        self.on_error = on_error
+
+
+class WriteQueue:
+    """Runs the GUI's task writes on a background thread.
+
+    add(), complete() and delete() return at once; the caller updates the
+    UI optimistically and passes on_done/on_error callbacks, which run on
+    the Tk thread through root.after. Whatever has queued up while a write
+    was running is applied together in one transaction: completes and
+    deletes are merged into one statement each, and completing a task that
+    is deleted in the same batch is skipped. If the batch fails for any
+    reason, every write in it gets on_error(exc), nothing is committed and
+    the thread goes on with the next batch.
+    """
+
+    def __init__(self, root, store):
+        self.root = root
+        self.store = store
+        self.queue = queue.SimpleQueue()
+        self.batches = 0
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, description, on_done=None, on_error=None):
+        """Insert a task; on_done(task_id)."""
+        self.queue.put(Write(ADD, description, on_done, on_error))
+
+    def complete(self, task_ids, on_done=None, on_error=None):
+        """Mark tasks completed; on_done(task_ids)."""
+        self.queue.put(Write(COMPLETE, list(task_ids), on_done, on_error))
+
+    def delete(self, task_ids, on_done=None, on_error=None):
+        """Delete tasks; on_done(task_ids)."""
+        self.queue.put(Write(DELETE, list(task_ids), on_done, on_error))
+
+    def _run(self):
+        write = self.queue.get()
+        while write is not None:
+            batch = [write]
+            stop = False
+            while not self.queue.empty():
+                write = self.queue.get()
+                if write is None:
+                    stop = True
+                    break
+                batch.append(write)
+            self._apply(batch)
+            if stop:
+                break
+            write = self.queue.get()
+        self.store.close_connection()
+
+    def _apply(self, batch):
+        results = []
+        try:
+            deleted = {task_id for write in batch if write.kind == DELETE for task_id in write.args}
+            completed = {task_id for write in batch if write.kind == COMPLETE
+                         for task_id in write.args} - deleted
+            with self.store.transaction():
+                for write in batch:
+                    if write.kind == ADD:
+                        results.append(self.store.add_task(write.args))
+                    else:
+                        results.append(write.args)
+                if completed:
+                    self.store.complete_tasks((task_id, task_id) for task_id in sorted(completed))
+                if deleted:
+                    self.store.delete_tasks((task_id, task_id) for task_id in sorted(deleted))
+        except Exception as e:
+            # Any failure, not just sqlite3.Error, must not end the thread:
+            # later writes would queue up forever and close() would time out.
+            self._rollback()
+            for write in batch:
+                self._post(write.on_error, e)
+        else:
+            for write, result in zip(batch, results):
+                self._post(write.on_done, result)
+        self.batches += 1
+
+    def _rollback(self):
+        try:
+            conn = self.store.connection()
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+        except sqlite3.Error:
+            pass
+
+    def _post(self, callback, *args):
+        if callback is None or self._closing:
+            return
+        try:
+            self.root.after(0, callback, *args)
+        except (tk.TclError, RuntimeError):
+            # The window is gone, so there is nothing left to update.
+            pass
+
+    def close(self, timeout=CLOSE_TIMEOUT):
+        """Finish the queued writes without running their callbacks.
+
+        Returns False if they were still running after timeout seconds.
+        """
+        self._closing = True
+        self.queue.put(None)
+        self._thread.join(timeout)
+        return not self._thread.is_alive()